@@ -0,0 +1,20 @@
+# PyInstaller build for TTAutoSetup.exe: `pyinstaller TTAutoSetup.spec`
+# main.py imports requests, wmi, winreg and asyncio lazily inside loader
+# functions; they are listed here as well so the onefile build never drops them.
+
+a = Analysis(
+    ['main.py'],
+    hiddenimports=['requests', 'wmi', 'win32com.client', 'pythoncom', 'winreg', 'asyncio'],
+    excludes=['bench', 'tests', 'pytest'],
+)
+pyz = PYZ(a.pure)
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.datas,
+    [],
+    name='TTAutoSetup',
+    console=True,
+    upx=False,
+)
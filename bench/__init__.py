@@ -0,0 +1,5 @@
+"""Benchmark harness for main.py: simulated Windows tools, a loopback origin and scenario runners.
+
+Not part of the PyInstaller build or autoSetup.zip; run it from a checkout with
+`python -m bench`.
+"""
@@ -0,0 +1,157 @@
+"""Run the setup benchmarks: `python -m bench [--update-baseline] [--download]`."""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import main
+from bench.simulation import SimulatedOrigin, simulated_environment
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+TOLERANCE = 0.15
+# Wall-time changes below this many seconds are timer noise, whatever the ratio.
+WALL_NOISE_SECONDS = 0.05
+
+BENCHMARK_SCENARIOS: Dict[str, Dict] = {
+    'cold': {
+        'description': "Fresh machine, every tool succeeds",
+    },
+    'rerun': {
+        'description': "Second run on an already configured machine",
+        'warm_runs': 1,
+    },
+    'resume': {
+        'description': "Re-run with the checkpoint journal skipping completed steps",
+        'warm_runs': 1,
+        'resume': True,
+    },
+    'flaky': {
+        'description': "30% of wmic/PowerShell/gpupdate calls fail",
+        'failures': {'wmic': 0.3, 'powershell': 0.3, 'gpupdate': 0.3},
+    },
+    'slow-network': {
+        'description': "Origin throttled to 2 MB/s per connection, no Range support",
+        'http': {'throughput': 2 * 1024 * 1024, 'ranges': False},
+    },
+}
+
+def run_benchmark_scenario(name: str, time_scale: float = 0.05) -> Dict[str, float]:
+    """Run the full automatic setup against simulated backends and return its metrics."""
+    scenario = BENCHMARK_SCENARIOS[name]
+    with simulated_environment(scenario, time_scale) as (system, origin):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(scenario.get('warm_runs', 0)):
+                main.run_full_automatic_setup(resume=False)
+            system.spawns = 0
+            origin.bytes_sent = 0
+            mark = main.tracer.mark()
+            started = time.perf_counter()
+            main.run_full_automatic_setup(resume=scenario.get('resume', False))
+            wall = time.perf_counter() - started
+        failed = [s.name for s in main.tracer.since(mark) if s.category == 'step' and not s.attrs.get('ok')]
+    return {'wall_seconds': round(wall, 3), 'spawns': system.spawns,
+            'bytes_downloaded': origin.bytes_sent, 'failed_steps': len(failed)}
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                        tolerance: float) -> List[str]:
+    """Return human-readable regressions of results against baseline."""
+    regressions: List[str] = []
+    for name, metrics in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if metrics['wall_seconds'] > max(reference['wall_seconds'] * (1 + tolerance),
+                                        reference['wall_seconds'] + WALL_NOISE_SECONDS):
+            regressions.append(f"{name}: wall time {reference['wall_seconds']:.2f}s -> {metrics['wall_seconds']:.2f}s")
+        if metrics['spawns'] > reference['spawns']:
+            regressions.append(f"{name}: process spawns {reference['spawns']} -> {metrics['spawns']}")
+        if metrics['bytes_downloaded'] > reference['bytes_downloaded'] * (1 + tolerance):
+            regressions.append(f"{name}: bytes downloaded {reference['bytes_downloaded']} -> {metrics['bytes_downloaded']}")
+    return regressions
+
+def run_benchmarks(scenarios: Optional[List[str]] = None, baseline_path: Optional[str] = None,
+                   update_baseline: bool = False, time_scale: float = 0.05) -> bool:
+    """Run benchmark scenarios, print a table and compare against (or refresh) the stored baseline."""
+    baseline_path = baseline_path or BASELINE_PATH
+    names = scenarios or list(BENCHMARK_SCENARIOS)
+    results = {name: run_benchmark_scenario(name, time_scale) for name in names}
+
+    try:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = {}
+
+    print(f"{'Scenario':<14}{'Wall (s)':>10}{'Base (s)':>10}{'Spawns':>8}{'MB down':>9}{'Failed':>8}")
+    for name, metrics in results.items():
+        reference = baseline.get(name, {}).get('wall_seconds')
+        base = f"{reference:.2f}" if reference is not None else "-"
+        print(f"{name:<14}{metrics['wall_seconds']:>10.2f}{base:>10}{metrics['spawns']:>8}"
+              f"{metrics['bytes_downloaded'] / (1024 * 1024):>9.1f}{metrics['failed_steps']:>8}")
+
+    regressions = compare_to_baseline(results, baseline, TOLERANCE)
+    for regression in regressions:
+        print(f"✗ Regression: {regression}")
+
+    if update_baseline or not baseline:
+        baseline.update(results)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {baseline_path}")
+    elif not regressions:
+        print("✓ No regressions against baseline")
+    return not regressions
+
+def run_download_benchmark(size_mb: int = 64, runs: int = 3) -> Dict[str, float]:
+    """Measure single-stream and segmented download throughput (MB/s) against a loopback origin."""
+    results: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory(prefix="ttas-dl-") as scratch:
+        for name, ranges, segments in (("single-stream", False, 1),
+                                       ("segmented", True, main.CONSTANTS['DOWNLOAD_SEGMENTS'])):
+            origin = SimulatedOrigin(size=size_mb * 1024 * 1024, ranges=ranges)
+            target = os.path.join(scratch, f"{name}.bin")
+            rates: List[float] = []
+            try:
+                for _ in range(runs):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    started = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        result = main.fetch_file(origin.url, target, segments=segments)
+                    elapsed = time.perf_counter() - started
+                    if not result.ok:
+                        print(f"✗ {name} download failed")
+                        break
+                    rates.append(result.size / (1024 * 1024) / elapsed)
+            finally:
+                origin.close()
+            if rates:
+                results[name] = sorted(rates)[len(rates) // 2]
+
+    print(f"{'Mode':<16}{'Median MB/s':>12}")
+    for name, rate in results.items():
+        print(f"{name:<16}{rate:>12.1f}")
+    return results
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("--update-baseline", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--download", action="store_true", help="measure loopback download MB/s instead")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"scenarios to run (default all: {', '.join(BENCHMARK_SCENARIOS)})")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in BENCHMARK_SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+    if args.download:
+        return 0 if len(run_download_benchmark()) == 2 else 1
+    return 0 if run_benchmarks(args.scenarios or None, update_baseline=args.update_baseline) else 1
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
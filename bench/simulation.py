@@ -0,0 +1,242 @@
+"""Simulated command backend and HTTP origin that let the whole setup flow run on any machine."""
+
+import base64
+import contextlib
+import hashlib
+import http.server
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import main
+
+# Nominal per-command latencies (seconds) of the simulated Windows tools, before time_scale.
+SIMULATED_LATENCIES = {
+    'powercfg': 0.15,
+    'sc query': 0.1,
+    'wmic': 0.4,
+    'powershell': 1.5,
+    'gpupdate': 8.0,
+    'rundll32': 4.0,
+    'SepLiveUpdate': 10.0,
+}
+
+class SimulatedWindows:
+    """Command backend that imitates powercfg, sc, wmic, PowerShell, gpupdate, rundll32 and LiveUpdate.
+
+    powercfg keeps real state (schemes, active plan, timeouts) and rundll32 the
+    printer connections, so desired-state probes behave as on a real machine
+    across repeated runs.
+    """
+
+    def __init__(self, time_scale: float = 0.05, failures: Optional[Dict[str, float]] = None,
+                 seed: int = 7) -> None:
+        self.time_scale = time_scale
+        self.failures = failures or {}
+        self.spawns = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        balanced = '381b4222-f694-41f0-9685-ff5bb260df2e'
+        self.schemes = {
+            balanced: 'Balanced',
+            main.CONSTANTS['HIGH_PERFORMANCE_GUID']: 'High performance',
+        }
+        self.active = balanced
+        self.printer_connections: List[str] = []
+        self.timeouts: Dict[str, Dict[str, int]] = {
+            guid: {f'{alias}-{mode}': 600 for alias in main.POWER_SETTING_GUIDS for mode in ('ac', 'dc')}
+            for guid in self.schemes
+        }
+
+    def _tool(self, command: str) -> str:
+        for tool in SIMULATED_LATENCIES:
+            if tool.lower() in command.lower():
+                return tool
+        return ''
+
+    def __call__(self, command: str, timeout: float, encoding: str) -> subprocess.CompletedProcess:
+        tool = self._tool(command)
+        with self._lock:
+            self.spawns += 1
+            failed = self._random.random() < self.failures.get(tool, 0.0)
+        latency = SIMULATED_LATENCIES.get(tool, 0.05) * self.time_scale
+        if latency > timeout:
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired(command, timeout)
+        time.sleep(latency)
+        if failed:
+            return subprocess.CompletedProcess(command, 1, "", f"{tool or 'command'}: simulated failure")
+        with self._lock:
+            return subprocess.CompletedProcess(command, 0, self._respond(tool, command), "")
+
+    def _respond(self, tool: str, command: str) -> str:
+        if tool == 'powercfg':
+            return self._powercfg(command.split()[1:])
+        if tool == 'sc query':
+            return "SERVICE_NAME: ccmexec\n        STATE              : 4  RUNNING\n"
+        if tool == 'wmic':
+            return "Method execution successful.\nOut Parameters:\ninstance of __PARAMETERS\n{\n\tReturnValue = 0;\n};\n"
+        if tool == 'powershell':
+            script = base64.b64decode(command.split()[-1]).decode('utf-16-le')
+            ids = re.findall(r"'(\{[0-9A-Fa-f-]+\})'", script)
+            return json.dumps([{'id': cycle_id, 'ok': True, 'error': '', 'ms': 5} for cycle_id in ids])
+        if tool == 'rundll32':
+            match = re.search(r'/n"([^"]+)"', command)
+            if match and match.group(1) not in self.printer_connections:
+                self.printer_connections.append(match.group(1))
+            return ""
+        if tool == 'gpupdate':
+            return "Computer Policy update has completed successfully.\nUser Policy update has completed successfully.\n"
+        return ""
+
+    def _powercfg(self, args: List[str]) -> str:
+        verb = args[0].lower() if args else ''
+        if verb == '/list':
+            lines = ["Existing Power Schemes (* Active)", "-----------------------------------"]
+            for guid, name in self.schemes.items():
+                lines.append(f"Power Scheme GUID: {guid}  ({name}){' *' if guid == self.active else ''}")
+            return "\n".join(lines) + "\n"
+        if verb == '/query':
+            lines = [f"Power Scheme GUID: {self.active}  ({self.schemes[self.active]})"]
+            for alias, setting_guid in main.POWER_SETTING_GUIDS.items():
+                values = self.timeouts[self.active]
+                lines += [f"    Power Setting GUID: {setting_guid}  ({alias})",
+                          "      Minimum Possible Setting: 0x00000000",
+                          "      Maximum Possible Setting: 0xffffffff",
+                          f"    Current AC Power Setting Index: 0x{values[alias + '-ac']:08x}",
+                          f"    Current DC Power Setting Index: 0x{values[alias + '-dc']:08x}"]
+            return "\n".join(lines) + "\n"
+        if verb == '/duplicatescheme':
+            guid = str(uuid.uuid4())
+            self.schemes[guid] = 'Ultimate Performance'
+            self.timeouts[guid] = {key: 600 for key in self.timeouts[self.active]}
+            return f"Power Scheme GUID: {guid}  (Ultimate Performance)\n"
+        if verb == '/s' and args[1] in self.schemes:
+            self.active = args[1]
+        elif verb == '/delete':
+            self.schemes.pop(args[1], None)
+        elif verb == '/change':
+            self.timeouts[self.active][args[1]] = int(args[2])
+        return ""
+
+class SimulatedOrigin:
+    """Loopback HTTP origin serving one package with ETag/304, optional Range support and throttling."""
+
+    def __init__(self, size: int = 4 * 1024 * 1024, throughput: Optional[int] = None,
+                 ranges: bool = True) -> None:
+        self.payload = random.Random(size).randbytes(size)
+        self.etag = f'"{hashlib.sha256(self.payload).hexdigest()[:16]}"'
+        self.bytes_sent = 0
+        self.requests = 0
+        origin = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _respond(self, with_body: bool) -> None:
+                origin.requests += 1
+                if self.headers.get('If-None-Match') == origin.etag:
+                    self.send_response(304)
+                    self.send_header('ETag', origin.etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                start, end = 0, len(origin.payload) - 1
+                match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', '')) if ranges else None
+                if match:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) if match.group(2) else end
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{len(origin.payload)}')
+                else:
+                    self.send_response(200)
+                if ranges:
+                    self.send_header('Accept-Ranges', 'bytes')
+                self.send_header('ETag', origin.etag)
+                self.send_header('Content-Length', str(end - start + 1))
+                self.end_headers()
+                if not with_body:
+                    return
+                view = memoryview(origin.payload)[start:end + 1]
+                block = 64 * 1024
+                for offset in range(0, len(view), block):
+                    chunk = view[offset:offset + block]
+                    try:
+                        self.wfile.write(chunk)
+                    except ConnectionError:
+                        return  # client went away (cancelled or failed download)
+                    origin.bytes_sent += len(chunk)
+                    if throughput:
+                        time.sleep(len(chunk) / throughput)
+
+            def do_HEAD(self) -> None:
+                self._respond(False)
+
+            def do_GET(self) -> None:
+                self._respond(True)
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/softpaq.exe"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+@contextlib.contextmanager
+def simulated_environment(scenario: Dict, time_scale: float):
+    """Point main.py at fake tools, a loopback origin and a scratch autoSetup folder."""
+    workdir = tempfile.mkdtemp(prefix="ttas-bench-")
+    system = SimulatedWindows(time_scale, scenario.get('failures'))
+    origin = SimulatedOrigin(**scenario.get('http', {}))
+    symantec = os.path.join(workdir, 'SepLiveUpdate.exe')
+    open(symantec, 'wb').close()
+
+    saved_constants = dict(main.CONSTANTS)
+    saved_urls = dict(main.URLS)
+    saved_trace_path = main.tracer.path
+    saved_journal_path = main.journal.path
+    previous_backend = main.set_command_backend(system)
+    saved_printer_connections = main.get_printer_connections
+    main.get_printer_connections = lambda: list(system.printer_connections)
+    main.CONSTANTS.update(AUTO_SETUP_DIR=os.path.join(workdir, 'autoSetup'), SYMANTEC_PATH=symantec,
+                          DNS_SERVER='127.0.0.1', CHROME_TRACE_FILE=os.path.join(workdir, 'trace.json'),
+                          CACHE_REVALIDATE_SECONDS=0, PEER_CACHE_PEERS=[], PEER_DISCOVERY=False)
+    main.URLS.update({key: origin.url for key in main.URLS})
+    main.tracer.path = None
+    main.journal.path = os.path.join(workdir, 'journal')
+    _reset_caches()
+    logging.disable(logging.CRITICAL)
+    try:
+        yield system, origin
+    finally:
+        logging.disable(logging.NOTSET)
+        main.set_command_backend(previous_backend)
+        main.get_printer_connections = saved_printer_connections
+        main.CONSTANTS.clear()
+        main.CONSTANTS.update(saved_constants)
+        main.URLS.update(saved_urls)
+        main.tracer.path = saved_trace_path
+        main.journal.path = saved_journal_path
+        _reset_caches()
+        origin.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def _reset_caches() -> None:
+    main._package_cache = None
+    main._discovered_peers = None
+    main._system_facts = None
+    main._connectivity_cache.clear()
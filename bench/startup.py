@@ -0,0 +1,117 @@
+"""Time-to-first-menu check: `python -m bench.startup [--exe dist/TTAutoSetup.exe]`.
+
+With --exe, each run launches the built executable and is timed until the menu
+prompt appears on its stdout; that is the number the budget applies to, since
+the onefile build also pays for unpacking itself. Without --exe, each run
+starts main.py in a fresh interpreter whose input() is replaced, so the first
+menu prompt also reports the heavy modules already imported. Nothing in
+main.py knows it is being measured.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import main
+
+BUDGET_SECONDS = 2.0
+RUNS = 5
+MAIN_PATH = os.path.abspath(main.__file__)
+MENU_PROMPT = b"Your choice: "
+
+_PROBE = """
+import builtins, runpy, sys
+heavy = {heavy!r}
+
+def first_prompt(prompt=""):
+    loaded = [name for name in heavy if name in sys.modules]
+    sys.stdout.write("\\n[startup-probe] heavy=" + ",".join(loaded) + "\\n")
+    sys.stdout.flush()
+    raise SystemExit(0)
+
+builtins.input = first_prompt
+sys.argv = [{path!r}]
+runpy.run_path({path!r}, run_name="__main__")
+"""
+
+def measure_startup(runs: int) -> Tuple[List[float], List[str]]:
+    """Launch fresh copies of main.py and time each one until the first menu prompt.
+
+    Returns the per-run times and any heavy modules that were already imported
+    when the menu appeared.
+    """
+    probe = _PROBE.format(heavy=main.STARTUP_HEAVY_MODULES, path=MAIN_PATH)
+    timings: List[float] = []
+    heavy: List[str] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-c", probe], stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   cwd=os.path.dirname(MAIN_PATH))
+        for raw in process.stdout:
+            line = raw.decode('utf-8', errors='replace')
+            if line.startswith('[startup-probe]'):
+                timings.append(time.perf_counter() - started)
+                loaded = line.strip().split('heavy=', 1)[-1]
+                heavy.extend(name for name in loaded.split(',') if name and name not in heavy)
+                break
+        process.stdout.close()
+        process.wait(timeout=30)
+    return timings, heavy
+
+def measure_exe_startup(exe: str, runs: int) -> List[float]:
+    """Launch the built executable and time each run until the menu prompt is printed."""
+    timings: List[float] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen([exe], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(exe)))
+        seen = b""
+        try:
+            while True:
+                chunk = process.stdout.read1(4096)
+                if not chunk:
+                    break
+                seen = (seen + chunk)[-4096:]
+                if MENU_PROMPT in seen:
+                    timings.append(time.perf_counter() - started)
+                    break
+        finally:
+            process.kill()
+            process.stdout.close()
+            process.stdin.close()
+            process.wait(timeout=30)
+    return timings
+
+def check_startup_budget(budget: Optional[float] = None, runs: Optional[int] = None,
+                         exe: Optional[str] = None) -> bool:
+    """Fail if the median time to first menu exceeds the budget or heavy modules load eagerly."""
+    budget = budget or BUDGET_SECONDS
+    if exe:
+        timings, heavy = measure_exe_startup(exe, runs or RUNS), []
+    else:
+        timings, heavy = measure_startup(runs or RUNS)
+    if not timings:
+        print("✗ The menu was never rendered.")
+        return False
+
+    median = sorted(timings)[len(timings) // 2]
+    print(f"Time to first menu{f' ({exe})' if exe else ''}: median {median:.3f}s, min {min(timings):.3f}s, "
+          f"max {max(timings):.3f}s over {len(timings)} runs (budget {budget:.3f}s)")
+    ok = median <= budget
+    if heavy:
+        print(f"✗ Imported before the menu: {', '.join(heavy)}")
+        ok = False
+    print("✓ Startup budget met" if ok else "✗ Startup budget exceeded")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m bench.startup", description="Check time-to-first-menu.")
+    parser.add_argument("--budget", type=float, help=f"seconds (default {BUDGET_SECONDS})")
+    parser.add_argument("--runs", type=int, help=f"number of launches (default {RUNS})")
+    parser.add_argument("--exe", help="time the built TTAutoSetup.exe instead of main.py")
+    args = parser.parse_args()
+    sys.exit(0 if check_startup_budget(args.budget, args.runs, args.exe) else 1)
@@ -1,28 +1,188 @@
 import os
 import shutil
 import subprocess
-import requests
 import time
-import winreg
-import wmi
-import win32com.client
 import re
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple, Callable, Iterator
 import sys
 import contextlib
+import io
+import threading
+import json
+import hashlib
+import csv
+import random
+import base64
+import queue
+import uuid
+import codecs
+import struct
+import zlib
+import math
+import atexit
+import logging.handlers
+from collections import deque
+import socket
+from urllib.parse import urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import asdict, dataclass, field, replace
+from abc import ABC, abstractmethod
+
+# ---------------------------
+# Lazy imports
+# ---------------------------
+
+# Import cost per lazily loaded module, in seconds.
+IMPORT_TIMINGS: Dict[str, float] = {}
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    Heavy or Windows-only dependencies are bound through this so the menu
+    appears before they load; code keeps using `requests.get`, `winreg.OpenKey`
+    etc. unchanged. Each loader uses a literal import statement so PyInstaller
+    still bundles the module into TTAutoSetup.exe.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], object]) -> None:
+        self._name = name
+        self._loader = loader
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            started = time.perf_counter()
+            module = self._loader()
+            IMPORT_TIMINGS.setdefault(self._name, time.perf_counter() - started)
+            self._module = module
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def _import_requests():
+    import requests
+    return requests
+
+def _import_winreg():
+    import winreg
+    return winreg
+
+def _import_wmi():
+    import wmi
+    return wmi
+
+def _import_asyncio():
+    import asyncio
+    return asyncio
+
+requests = LazyModule('requests', _import_requests)
+winreg = LazyModule('winreg', _import_winreg)
+wmi = LazyModule('wmi', _import_wmi)
+asyncio = LazyModule('asyncio', _import_asyncio)
+
+# Modules that must not be imported before the first menu render (checked by bench/startup.py).
+STARTUP_HEAVY_MODULES = ('requests', 'urllib3', 'wmi', 'win32com', 'pythoncom', 'asyncio')
 
 CONSTANTS = {
     'DNS_SERVER': '8.8.8.8',
-    'PING_COUNT': 1,
+    'CONNECT_TIMEOUT': 2.0,
+    'CONNECTIVITY_TTL': 30,
     'CHUNK_SIZE': 8192,
+    'DOWNLOAD_MIN_CHUNK': 64 * 1024,
+    'DOWNLOAD_MAX_CHUNK': 1024 * 1024,
+    'PROGRESS_INTERVAL': 0.25,
+    'COPY_WORKERS': 8,
+    'COPY_LARGE_FILE': 64 * 1024 * 1024,
+    'COPY_CHUNK_SIZE': 4 * 1024 * 1024,
+    'COPY_MTIME_SLACK': 2.0,
     'PROGRESS_BAR_LENGTH': 30,
     'WMIC_TIMEOUT': 10,
     'CYCLE_SLEEP_TIME': 0.3,
+    'CCM_LOG_DIR': r"C:\Windows\CCM\Logs",
+    'CYCLE_WAIT': os.environ.get('TTAS_WAIT_CYCLES', '0') == '1',
+    'CYCLE_WAIT_TIMEOUT': 900,
+    'CYCLE_POLL_INTERVAL': 0.5,
     'PRINTER_PATH': r"\\s000rdl01\FollowmeS000RDL01",
+    'PRINTER_QUEUES': [queue.strip() for queue in os.environ.get('TTAS_PRINTERS', '').split(',') if queue.strip()],
+    'PRINTER_WORKERS': 4,
+    'PRINTER_DRIVERS_FILE': 'printer_drivers.json',
     'SYMANTEC_PATH': r"C:\Program Files\Symantec\Symantec Endpoint Protection\SepLiveUpdate.exe",
     'HIGH_PERFORMANCE_GUID': '8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c',
-    'ULTIMATE_PERFORMANCE_GUID': 'e9a42b02-d5df-448d-aa00-03f14749eb61'
+    'ULTIMATE_PERFORMANCE_GUID': 'e9a42b02-d5df-448d-aa00-03f14749eb61',
+    'ULTIMATE_PERFORMANCE_NAMES': ('ultimate performance', 'nihai performans'),
+    'GPUPDATE_FRESH_SECONDS': 1800,
+    'GPUPDATE_TIMEOUT': 120,
+    'GPUPDATE_MAX_TIMEOUT': 600,
+    'SYMANTEC_TIMEOUT': 60,
+    'SYMANTEC_MAX_TIMEOUT': 900,
+    'PRINTER_TIMEOUT': 300,
+    'MAX_PARALLEL_STEPS': 4,
+    'USE_SHELL_WORKER': os.environ.get('TTAS_SHELL_WORKER', '0') == '1',
+    'SHELL_WORKER_POOL_SIZE': 4,
+    'STREAM_TAIL_LINES': 200,
+    'JOB_MAX_CONCURRENT': 3,
+    'JOB_TAIL_LINES': 200,
+    'JOB_VIEW_LINES': 3,
+    'STREAM_MAX_LINE': 64 * 1024,
+    'DOWNLOAD_TIMEOUT': 30,
+    'DOWNLOAD_SEGMENTS': 4,
+    'DOWNLOAD_MIN_SEGMENT_SIZE': 1024 * 1024,
+    'DOWNLOAD_RETRIES': 3,
+    'DOWNLOAD_CHECKPOINT_BYTES': 1024 * 1024,
+    'CACHE_MAX_BYTES': 2 * 1024 * 1024 * 1024,
+    'CACHE_REVALIDATE_SECONDS': 300,
+    'PEER_CACHE_PEERS': [peer.strip() for peer in os.environ.get('TTAS_PEERS', '').split(',') if peer.strip()],
+    'PEER_CACHE_PORT': 8765,
+    'PEER_DISCOVERY': os.environ.get('TTAS_PEER_DISCOVERY', '0') == '1',
+    'PEER_DISCOVERY_PORT': 8766,
+    'PEER_TIMEOUT': 3.0,
+    'PATCH_MANIFEST': os.environ.get('TTAS_PATCH_MANIFEST') or None,
+    'PATCH_MIN_CHUNK': 2 * 1024,
+    'PATCH_MAX_CHUNK': 64 * 1024,
+    'PATCH_CHUNK_BITS': 13,
+    'FLEET_MAX_HOSTS': 10,
+    'FLEET_OP_TIMEOUT': 600,
+    'FLEET_DEFAULT_TRANSPORT': 'winrm',
+    'FLEET_REFRESH_SECONDS': 1.0,
+    'TRACE_FILE': 'auto_setup.trace.jsonl',
+    'CHROME_TRACE_FILE': 'auto_setup.trace.json',
+    'SLOWEST_SPANS_SHOWN': 8,
+    'AUTO_SETUP_DIR': None,
+    'JOURNAL_FILE': 'auto_setup.journal',
+    'JOURNAL_EXPIRY_SECONDS': 6 * 3600,
+    'JOURNAL_OUTPUT_LIMIT': 4096,
+    'LOG_FILE': 'auto_setup.log',
+    'LOG_MAX_BYTES': 5 * 1024 * 1024,
+    'LOG_BACKUP_COUNT': 3,
+    'LOG_FORMAT': os.environ.get('TTAS_LOG_FORMAT', 'text'),
+    'LOG_FLUSH_TIMEOUT': 5.0,
+    'FACTS_FILE': 'facts.json',
+    'FACTS_TTL': 900,
+    'INTERACTIVE': True,
+    'PREFETCH': os.environ.get('TTAS_PREFETCH', '0') == '1',
+    'RUN_BUDGET_SECONDS': float(os.environ['TTAS_BUDGET']) if os.environ.get('TTAS_BUDGET') else None,
+    'BUDGET_PERCENTILE': 0.95,
+    'BUDGET_MARGIN': 0.25,
+    'BUDGET_HISTORY': 20,
+    'BUDGET_MIN_STEP_SECONDS': 5.0,
+    'BUDGET_DEFAULT_STEP_SECONDS': 600.0
+}
+
+DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+# powercfg setting GUIDs behind the /change aliases (VIDEOIDLE, DISKIDLE, STANDBYIDLE).
+POWER_SETTING_GUIDS = {
+    'monitor-timeout': '3c0bc021-c8a8-4e07-a973-6b14cbcb2b7e',
+    'disk-timeout': '6738e2c4-e8a5-4a42-b16a-e040e769756e',
+    'standby-timeout': '29f6c1db-86da-48c5-9fdb-f2b67b1f44da',
 }
 
 URLS = {
@@ -47,20 +207,306 @@ CYCLE_IDS = {
     "Windows Installer Source List Update Cycle": "{00000000-0000-0000-0000-000000000032}"
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('auto_setup.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Client log (under CCM_LOG_DIR) and the record that marks each cycle as finished.
+CYCLE_COMPLETION_MARKERS = {
+    "{00000000-0000-0000-0000-000000000121}": ("AppEval.log", r"(?i)evaluation.*(?:completed|finished)"),
+    "{00000000-0000-0000-0000-000000000003}": ("InventoryAgent.log", r"Destination:mp:MP_DdrEndpoint"),
+    "{00000000-0000-0000-0000-000000000010}": ("InventoryAgent.log", r"Destination:mp:MP_SinvCollFileEndpoint"),
+    "{00000000-0000-0000-0000-000000000001}": ("InventoryAgent.log", r"Destination:mp:MP_HinvEndpoint"),
+    "{00000000-0000-0000-0000-000000000022}": ("PolicyAgent.log", r"(?s)PolicyEvaluationComplete.*?policy\W+Machine"),
+    "{00000000-0000-0000-0000-000000000002}": ("InventoryAgent.log", r"Destination:mp:MP_SinvEndpoint"),
+    "{00000000-0000-0000-0000-000000000031}": ("SWMTRReportGen.log", r"(?i)report.*(?:generated|sent|complete)"),
+    "{00000000-0000-0000-0000-000000000108}": ("UpdatesDeployment.log", r"(?i)assignment.*evaluat.*complete"),
+    "{00000000-0000-0000-0000-000000000113}": ("WUAHandler.log", r"(?i)successfully completed scan"),
+    "{00000000-0000-0000-0000-000000000026}": ("PolicyAgent.log", r"(?s)PolicyEvaluationComplete.*?policy\W+S-1-5-"),
+    "{00000000-0000-0000-0000-000000000032}": ("SrcUpdateMgr.log", r"(?i)(?:finished|completed).*source"),
+}
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the writer thread without formatting them on the caller's thread.
+
+    ERROR and above wait (up to LOG_FLUSH_TIMEOUT) until the writer has flushed
+    everything queued so far, so the records explaining a crash are on disk
+    before it happens. Once the writer is stopped nobody drains the queue, so
+    there is nothing to wait for.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        if record.levelno >= logging.ERROR and _log_listener is not None:
+            with self.queue.all_tasks_done:
+                self.queue.all_tasks_done.wait_for(lambda: not self.queue.unfinished_tasks,
+                                                   CONSTANTS['LOG_FLUSH_TIMEOUT'])
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging() -> None:
+    """Route all logging through a queue to a background writer with a rotating file and the console."""
+    global _log_listener
+    if CONSTANTS['LOG_FORMAT'] == 'json':
+        formatter: logging.Formatter = JsonLogFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler = logging.handlers.RotatingFileHandler(
+        CONSTANTS['LOG_FILE'], maxBytes=CONSTANTS['LOG_MAX_BYTES'],
+        backupCount=CONSTANTS['LOG_BACKUP_COUNT'], encoding='utf-8', delay=True)
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.handlers[:] = [_DeferredQueueHandler(log_queue)]
+    _log_listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler,
+                                                   respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Drain queued records to their handlers and stop the writer thread.
+
+    Records logged afterwards (e.g. from other atexit hooks) go to logging's
+    last-resort stderr handler instead of a queue nobody reads.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        root = logging.getLogger()
+        root.handlers[:] = [h for h in root.handlers if not isinstance(h, _DeferredQueueHandler)]
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
+
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# ---------------------------
+# Instrumentation
+# ---------------------------
+
+@dataclass
+class Span:
+    """A timed unit of work: a setup step, an external command, a download..."""
+    name: str
+    category: str
+    start: float
+    duration: float = 0.0
+    thread: str = ""
+    attrs: Dict[str, object] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {'name': self.name, 'category': self.category, 'start': self.start,
+                'duration': self.duration, 'thread': self.thread, **self.attrs}
+
+class Tracer:
+    """Collects spans in memory and appends each finished span to a JSON-lines file."""
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **attrs):
+        """Time the enclosed block; the yielded dict can be filled with exit_code, bytes, etc."""
+        record = Span(name, category, time.time(), thread=threading.current_thread().name, attrs=dict(attrs))
+        started = time.perf_counter()
+        try:
+            yield record.attrs
+        except BaseException as e:
+            record.attrs.setdefault('error', str(e) or e.__class__.__name__)
+            raise
+        finally:
+            record.duration = time.perf_counter() - started
+            self._finish(record)
+
+    def _finish(self, record: Span) -> None:
+        with self._lock:
+            self.spans.append(record)
+            if not self.path:
+                return
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record.to_dict(), ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                logger.debug(f"Could not write span: {e}")
+
+    def mark(self) -> int:
+        """Position to pass to export/slowest so they only cover spans recorded after it."""
+        with self._lock:
+            return len(self.spans)
+
+    def since(self, mark: int = 0) -> List[Span]:
+        with self._lock:
+            return list(self.spans[mark:])
+
+    def export_chrome_trace(self, path: str, mark: int = 0) -> str:
+        """Write spans as a Chrome trace / Perfetto JSON file (complete 'X' events)."""
+        threads: Dict[str, int] = {}
+        events: List[Dict[str, object]] = []
+        for record in self.since(mark):
+            tid = threads.setdefault(record.thread, len(threads) + 1)
+            events.append({'name': record.name, 'cat': record.category, 'ph': 'X',
+                           'ts': int(record.start * 1_000_000), 'dur': int(record.duration * 1_000_000),
+                           'pid': os.getpid(), 'tid': tid,
+                           'args': {k: str(v) for k, v in record.attrs.items()}})
+        for thread_name, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                           'args': {'name': thread_name}})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def print_slowest(self, mark: int = 0, limit: Optional[int] = None) -> None:
+        """Print the slowest spans recorded since mark."""
+        spans = sorted((record for record in self.since(mark) if record.category != 'run'),
+                       key=lambda record: record.duration, reverse=True)
+        spans = spans[:limit or CONSTANTS['SLOWEST_SPANS_SHOWN']]
+        if not spans:
+            return
+        print("\nSlowest operations:")
+        for record in spans:
+            extra = []
+            if 'exit_code' in record.attrs:
+                extra.append(f"exit {record.attrs['exit_code']}")
+            if record.attrs.get('bytes'):
+                extra.append(f"{int(record.attrs['bytes']) / (1024 * 1024):.1f}MB")
+            name = record.name if len(record.name) <= 48 else record.name[:45] + "..."
+            print(f"  {record.duration:8.2f}s  {record.category:<8} {name:<48} {', '.join(extra)}")
+
+tracer = Tracer(CONSTANTS['TRACE_FILE'])
+
+# ---------------------------
+# Deadlines
+# ---------------------------
+
+_deadline_local = threading.local()
+
+def current_deadline() -> Optional[float]:
+    """The time.monotonic() deadline of the step running on this thread, if any."""
+    return getattr(_deadline_local, 'at', None)
+
+@contextlib.contextmanager
+def deadline_scope(at: Optional[float]):
+    """Apply a monotonic deadline to timeouts chosen on this thread (see cap_timeout)."""
+    previous = current_deadline()
+    _deadline_local.at = at if previous is None or at is None else min(at, previous)
+    try:
+        yield
+    finally:
+        _deadline_local.at = previous
+
+def cap_timeout(timeout: float) -> float:
+    """Shorten a configured timeout so it ends by the current step's deadline (never below one second)."""
+    deadline = current_deadline()
+    if deadline is None:
+        return timeout
+    return max(1.0, min(timeout, deadline - time.monotonic()))
+
+# ---------------------------
+# Cancellation
+# ---------------------------
+
+class OperationCancelled(Exception):
+    """Raised when work notices that the cancel event of its scope has been set."""
+
+_cancel_local = threading.local()
+
+def current_cancel() -> Optional[threading.Event]:
+    """The cancel event of the background job running on this thread, if any."""
+    return getattr(_cancel_local, 'event', None)
+
+@contextlib.contextmanager
+def cancel_scope(event: Optional[threading.Event]):
+    """Let long waits on this thread (commands, downloads, cycle polling) stop when event is set."""
+    previous = current_cancel()
+    _cancel_local.event = event
+    try:
+        yield
+    finally:
+        _cancel_local.event = previous
+
+def check_cancelled() -> None:
+    """Raise OperationCancelled if this thread's work has been cancelled."""
+    event = current_cancel()
+    if event is not None and event.is_set():
+        raise OperationCancelled("cancelled")
+
 # ---------------------------
 # Console helpers
 # ---------------------------
 
+_output_local = threading.local()
+
+def current_output():
+    """Where download and package-cache messages on this thread go: the output_scope writer, else stdout."""
+    return getattr(_output_local, 'writer', None) or sys.stdout
+
+@contextlib.contextmanager
+def output_scope(writer):
+    """Send this thread's download and package-cache messages to writer instead of the console."""
+    previous = getattr(_output_local, 'writer', None)
+    _output_local.writer = writer
+    try:
+        yield
+    finally:
+        _output_local.writer = previous
+
+def inherit_output(fn: Callable) -> Callable:
+    """Wrap fn so that, on another thread, it prints where the calling thread prints.
+
+    Carries this thread's output_scope writer and its capture buffer in every
+    stdout router (jobs, parallel steps), so prints from pool workers a job
+    starts land in the job's output instead of over the menu.
+    """
+    writer = getattr(_output_local, 'writer', None)
+    captures = []
+    stream = sys.stdout
+    while isinstance(stream, _StepOutputRouter):
+        captures.append((stream, getattr(stream._local, 'buffer', None)))
+        stream = stream._target
+    if writer is None and all(buffer is None for _, buffer in captures):
+        return fn
+
+    def run(*args, **kwargs):
+        previous = [(router, getattr(router._local, 'buffer', None)) for router, _ in captures]
+        for router, buffer in captures:
+            router.share_capture(buffer)
+        try:
+            with output_scope(writer):
+                return fn(*args, **kwargs)
+        finally:
+            for router, buffer in previous:
+                router.share_capture(buffer)
+    return run
+
+class OutputThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks print where the submitting thread prints (see inherit_output)."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(inherit_output(fn), *args, **kwargs)
+
 def print_separator(title: Optional[str] = None, width: int = 70) -> None:
     """Print a visual separator to the console."""
     bar = "-" * width
@@ -79,18 +525,265 @@ def wait_for_enter() -> None:
 # Subprocess & networking
 # ---------------------------
 
-def safe_subprocess_run(command: str, timeout: int = 30, encoding: str = 'cp857', **kwargs) -> subprocess.CompletedProcess:
-    """Run a subprocess command safely with timeout and consistent encoding."""
-    try:
-        return subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            encoding=encoding,
-            timeout=timeout,
-            **kwargs
+def kill_process_tree(process: subprocess.Popen) -> None:
+    """Kill a child and everything it started (it must own a new session on POSIX)."""
+    with contextlib.suppress(Exception):
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, 9)
+    with contextlib.suppress(Exception):
+        process.kill()
+        process.wait(timeout=5)
+
+class ShellWorkerDied(Exception):
+    """The persistent shell exited or its pipes broke.
+
+    `sent` is False only when the command never reached the shell, so it is
+    safe to run it again in a fresh process.
+    """
+
+    def __init__(self, message: str, sent: bool = True) -> None:
+        super().__init__(message)
+        self.sent = sent
+
+# cmd.exe has no cheap subshell, so commands that change the worker's own state
+# (directory, environment, or the shell itself) always get a fresh process.
+_CMD_STATEFUL = re.compile(r'(^|[&|(])\s*@?(cd|chdir|pushd|popd|set|setlocal|endlocal|path|prompt|exit|call)\b',
+                           re.IGNORECASE)
+
+class ShellWorker:
+    """A long-lived shell that runs one command at a time over a framed stdin/stdout protocol.
+
+    Each command is wrapped so the shell prints a start marker, the command's
+    output, then an end marker carrying the exit code on stdout (and an end
+    marker on stderr). Markers carry a random token so command output cannot
+    forge them. Stdin of the command is redirected from the null device so it
+    never consumes the protocol stream; on POSIX the command runs in a subshell
+    so `cd`, `export` or `exit` cannot change the worker. The cmd backend has no
+    such isolation and refuses those commands (see `accepts`).
+    """
+
+    def __init__(self, backend: Optional[str] = None) -> None:
+        self.backend = backend or ('cmd' if os.name == 'nt' else 'posix')
+        if self.backend == 'cmd':
+            argv = ['cmd.exe', '/Q', '/D', '/K', 'prompt $S']
+        else:
+            argv = ['/bin/sh']
+        self.process = subprocess.Popen(
+            argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=(os.name != 'nt'),
+        )
+        self._stdout: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._stderr: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        for pipe, sink in ((self.process.stdout, self._stdout), (self.process.stderr, self._stderr)):
+            threading.Thread(target=self._pump, args=(pipe, sink), daemon=True).start()
+
+    @staticmethod
+    def _pump(pipe, sink: "queue.Queue[Optional[bytes]]") -> None:
+        for line in iter(pipe.readline, b''):
+            sink.put(line)
+        sink.put(None)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def accepts(self, command: str) -> bool:
+        """Whether `command` can run here without changing state later commands would see."""
+        return self.backend != 'cmd' or not _CMD_STATEFUL.search(command)
+
+    def _frame(self, command: str, token: str) -> str:
+        if self.backend == 'cmd':
+            return (f"echo S{token}& echo S{token} 1>&2\r\n"
+                    f"({command}) < nul\r\n"
+                    f"echo.& echo E{token} %errorlevel%& echo.1>&2& echo E{token} 1>&2\r\n")
+        return (f"printf 'S{token}\\n'; printf 'S{token}\\n' >&2\n"
+                f"( {command}\n) </dev/null; __rc=$?\n"
+                f"printf '\\nE{token} %d\\n' $__rc; printf '\\nE{token}\\n' >&2\n")
+
+    @staticmethod
+    def _collect(sink: "queue.Queue[Optional[bytes]]", token: str, deadline: float) -> Tuple[bytes, bytes]:
+        """Return (output between markers, end-marker line)."""
+        start, end = f"S{token}".encode(), f"E{token}".encode()
+        started = False
+        chunks: List[bytes] = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired("shell worker", 0)
+            try:
+                line = sink.get(timeout=remaining)
+            except queue.Empty:
+                raise subprocess.TimeoutExpired("shell worker", 0)
+            if line is None:
+                raise ShellWorkerDied("shell worker exited")
+            if not started:
+                started = line.strip() == start
+                continue
+            if line.startswith(end):
+                data = b''.join(chunks)
+                # Drop the separator newline the framing adds before the end marker.
+                for newline in (b'\r\n', b'\n'):
+                    if data.endswith(newline):
+                        data = data[:-len(newline)]
+                        break
+                return data, line
+            chunks.append(line)
+
+    def run(self, command: str, timeout: float, encoding: str) -> subprocess.CompletedProcess:
+        token = uuid.uuid4().hex
+        if not self.alive():
+            raise ShellWorkerDied("shell worker exited", sent=False)
+        try:
+            self.process.stdin.write(self._frame(command, token).encode(encoding, errors='replace'))
+            self.process.stdin.flush()
+        except (OSError, ValueError) as e:
+            # A broken pipe means the shell was already gone and read nothing.
+            raise ShellWorkerDied(str(e), sent=False)
+
+        deadline = time.monotonic() + timeout
+        try:
+            stdout, end_line = self._collect(self._stdout, token, deadline)
+            stderr, _ = self._collect(self._stderr, token, deadline)
+        except subprocess.TimeoutExpired:
+            self.close()
+            raise subprocess.TimeoutExpired(command, timeout)
+
+        try:
+            returncode = int(end_line.split()[1])
+        except (IndexError, ValueError):
+            returncode = -1
+        return subprocess.CompletedProcess(
+            command, returncode,
+            stdout.decode(encoding, errors='replace'),
+            stderr.decode(encoding, errors='replace'),
         )
+
+    def close(self) -> None:
+        """Kill the shell and anything it is still running."""
+        if self.alive():
+            kill_process_tree(self.process)
+
+class ShellWorkerPool:
+    """Hands each caller an idle persistent shell, growing up to `size`; beyond that callers get None."""
+
+    def __init__(self, size: int, backend: Optional[str] = None) -> None:
+        self.size = size
+        self.backend = backend
+        self._idle: List[ShellWorker] = []
+        self._count = 0
+        self._lock = threading.Lock()
+        self.disabled = False
+
+    def acquire(self) -> Optional[ShellWorker]:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive():
+                    return worker
+                self._count -= 1
+            if self.disabled or self._count >= self.size:
+                return None
+            self._count += 1
+        try:
+            return ShellWorker(self.backend)
+        except OSError as e:
+            logger.warning(f"Shell worker unavailable, using fresh processes: {e}")
+            with self._lock:
+                self._count -= 1
+                self.disabled = True
+            return None
+
+    def release(self, worker: ShellWorker) -> None:
+        with self._lock:
+            if worker.alive():
+                self._idle.append(worker)
+            else:
+                self._count -= 1
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._idle = self._idle, []
+            self._count -= len(workers)
+        for worker in workers:
+            worker.close()
+
+_shell_pool: Optional[ShellWorkerPool] = None
+
+# Replaces real process execution when set (used by the benchmark harness in bench/).
+CommandBackend = Callable[[str, float, str], subprocess.CompletedProcess]
+_command_backend: Optional[CommandBackend] = None
+
+def set_command_backend(backend: Optional[CommandBackend]) -> Optional[CommandBackend]:
+    """Route safe_subprocess_run to `backend(command, timeout, encoding)`; returns the previous one."""
+    global _command_backend
+    previous, _command_backend = _command_backend, backend
+    return previous
+
+def enable_shell_worker(enabled: bool = True, backend: Optional[str] = None) -> None:
+    """Route safe_subprocess_run through persistent shells (or go back to fresh processes)."""
+    global _shell_pool
+    if _shell_pool:
+        _shell_pool.close()
+    _shell_pool = ShellWorkerPool(CONSTANTS['SHELL_WORKER_POOL_SIZE'], backend) if enabled else None
+
+def _run_in_shell_worker(command: str, timeout: float, encoding: str) -> Optional[subprocess.CompletedProcess]:
+    """Run through a pooled worker; None means the caller should start a fresh process.
+
+    A worker that dies after the command was sent reports a failure instead:
+    the command may already have run, and running it twice is not safe.
+    """
+    if _shell_pool is None:
+        return None
+    worker = _shell_pool.acquire()
+    if worker is None:
+        return None
+    try:
+        if not worker.accepts(command):
+            return None
+        return worker.run(command, timeout, encoding)
+    except ShellWorkerDied as e:
+        worker.close()
+        if not e.sent:
+            logger.warning(f"Shell worker died, falling back to a fresh process: {e}")
+            return None
+        logger.warning(f"Shell worker died mid-command, not retrying: {command} - {e}")
+        return subprocess.CompletedProcess(command, -1, "", f"shell worker exited mid-command: {e}")
+    finally:
+        _shell_pool.release(worker)
+
+def safe_subprocess_run(command: str, timeout: int = 30, encoding: str = 'cp857', **kwargs) -> subprocess.CompletedProcess:
+    """Run a subprocess command safely with timeout and consistent encoding.
+
+    Plain commands (no extra Popen kwargs) reuse a persistent shell when the
+    shell worker is enabled; everything else starts a fresh process.
+    """
+    timeout = cap_timeout(timeout)
+    check_cancelled()
+    try:
+        with tracer.span(command, 'command', command=command) as span_attrs:
+            if _command_backend is not None:
+                result = _command_backend(command, timeout, encoding)
+                span_attrs['backend'] = 'simulated'
+            else:
+                result = _run_in_shell_worker(command, timeout, encoding) if not kwargs else None
+                span_attrs['backend'] = 'shell-worker' if result is not None else 'process'
+            if result is None:
+                result = subprocess.run(
+                    command,
+                    shell=True,
+                    capture_output=True,
+                    text=True,
+                    encoding=encoding,
+                    timeout=timeout,
+                    **kwargs
+                )
+            span_attrs['exit_code'] = result.returncode
+            span_attrs['bytes'] = len(result.stdout or '') + len(result.stderr or '')
+            return result
     except subprocess.TimeoutExpired:
         logger.warning(f"Command timed out: {command}")
         raise
@@ -98,43 +791,329 @@ def safe_subprocess_run(command: str, timeout: int = 30, encoding: str = 'cp857'
         logger.error(f"Command execution error: {command} - {e}")
         raise
 
+if CONSTANTS['USE_SHELL_WORKER']:
+    enable_shell_worker()
+
+# ---------------------------
+# Streaming subprocess output
+# ---------------------------
+
+@dataclass
+class OutputMatcher:
+    """Reacts to a line of live output.
+
+    action is 'success' or 'failure' (finish early with that verdict) or
+    'progress' (push the deadline out by `extend` seconds).
+    """
+    pattern: str
+    action: str
+    extend: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.regex = re.compile(self.pattern)
+
+@dataclass
+class StreamResult:
+    """Outcome of run_streaming; status is 'exited', 'success', 'failure', 'timeout' or 'cancelled'."""
+    command: str
+    status: str
+    returncode: Optional[int] = None
+    matched: str = ""
+    stdout_tail: List[str] = field(default_factory=list)
+    stderr_tail: List[str] = field(default_factory=list)
+    lines: int = 0
+    bytes: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'success' or (self.status == 'exited' and self.returncode == 0)
+
+def _pump_decoded(pipe, name: str, encoding: str, sink: "queue.Queue", detached: threading.Event) -> None:
+    """Decode a pipe incrementally and emit complete lines (\n or \r terminated) to sink."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ""
+    while True:
+        data = pipe.read1(4096) if hasattr(pipe, 'read1') else pipe.read(4096)
+        text = decoder.decode(data, final=not data)
+        pending += text
+        # Hold back a trailing \r: it may be the first half of a \r\n split across two reads.
+        held = "\r" if data and pending.endswith("\r") else ""
+        parts = re.split(r'\r\n|\r|\n', pending[:len(pending) - len(held)])
+        pending = parts.pop()
+        if len(pending) > CONSTANTS['STREAM_MAX_LINE']:
+            parts.append(pending)
+            pending = ""
+        pending += held
+        if not detached.is_set():
+            for line in parts:
+                sink.put((name, line, len(line.encode(encoding, errors='replace')) + 1))
+        if not data:
+            if pending and not detached.is_set():
+                sink.put((name, pending, len(pending)))
+            sink.put((name, None, 0))
+            return
+
+def _apply_matchers(line: str, matchers: List[OutputMatcher]) -> Optional[OutputMatcher]:
+    for matcher in matchers:
+        if matcher.regex.search(line):
+            return matcher
+    return None
+
+def _stream_simulated(command: str, timeout: float, encoding: str, matchers: List[OutputMatcher],
+                      echo: bool) -> StreamResult:
+    """Run through the command backend and replay its output through the matchers."""
+    completed = safe_subprocess_run(command, timeout=timeout, encoding=encoding)
+    result = StreamResult(command, 'exited', completed.returncode)
+    for name, text in (('stdout', completed.stdout), ('stderr', completed.stderr)):
+        for line in (text or "").splitlines():
+            result.lines += 1
+            (result.stdout_tail if name == 'stdout' else result.stderr_tail).append(line)
+            if echo and line.strip():
+                print(f"  {line}")
+            matcher = _apply_matchers(line, matchers)
+            if matcher and matcher.action in ('success', 'failure') and not result.matched:
+                result.status, result.matched = matcher.action, line
+    return result
+
+def run_streaming(command: str, timeout: float, matchers: Optional[List[OutputMatcher]] = None,
+                  max_timeout: Optional[float] = None, encoding: str = 'cp857',
+                  echo: bool = True) -> StreamResult:
+    """Run a shell command, showing its output live and letting matchers end or extend the wait.
+
+    Only the last STREAM_TAIL_LINES lines of each stream are kept. When a
+    success/failure matcher fires the call returns immediately; the process is
+    left to finish on its own while its pipes keep being drained. When the
+    (possibly extended) deadline passes or the job is cancelled, the process
+    tree is killed.
+    """
+    matchers = matchers or []
+    max_timeout = cap_timeout(max(timeout, max_timeout or timeout))
+    timeout = cap_timeout(timeout)
+    if _command_backend is not None:
+        return _stream_simulated(command, timeout, encoding, matchers, echo)
+
+    with tracer.span(command, 'command', command=command, streaming=True) as span_attrs:
+        process = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, start_new_session=(os.name != 'nt'))
+        sink: "queue.Queue" = queue.Queue()
+        detached = threading.Event()
+        for pipe, name in ((process.stdout, 'stdout'), (process.stderr, 'stderr')):
+            threading.Thread(target=_pump_decoded, args=(pipe, name, encoding, sink, detached),
+                             daemon=True).start()
+
+        result = StreamResult(command, 'exited')
+        tails = {'stdout': deque(maxlen=CONSTANTS['STREAM_TAIL_LINES']),
+                 'stderr': deque(maxlen=CONSTANTS['STREAM_TAIL_LINES'])}
+        started = time.monotonic()
+        deadline = started + timeout
+        cancel = current_cancel()
+        open_streams = 2
+        while open_streams:
+            remaining = deadline - time.monotonic()
+            if cancel is not None and cancel.is_set():
+                result.status = 'cancelled'
+                kill_process_tree(process)
+                break
+            if remaining <= 0:
+                result.status = 'timeout'
+                logger.warning(f"Command timed out: {command}")
+                kill_process_tree(process)
+                break
+            try:
+                name, line, size = sink.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+            if line is None:
+                open_streams -= 1
+                continue
+
+            result.lines += 1
+            result.bytes += size
+            tails[name].append(line)
+            if echo and line.strip():
+                print(f"  {line}", flush=True)
+
+            matcher = _apply_matchers(line, matchers)
+            if matcher is None:
+                continue
+            if matcher.action == 'progress':
+                deadline = min(max(deadline, time.monotonic() + matcher.extend), started + max_timeout)
+            else:
+                result.status, result.matched = matcher.action, line
+                break
+
+        if result.status == 'exited':
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                process.wait(timeout=max(0.0, deadline - time.monotonic()) or 1)
+        else:
+            # Keep draining so a chatty child never blocks on a full pipe, but stop buffering.
+            detached.set()
+        result.returncode = process.poll()
+        result.stdout_tail = list(tails['stdout'])
+        result.stderr_tail = list(tails['stderr'])
+        span_attrs.update(exit_code=result.returncode, status=result.status, bytes=result.bytes)
+        return result
+
+GPUPDATE_MATCHERS = [
+    OutputMatcher(r'(?i)user policy update has completed successfully'
+                  r'|kullanıcı ilkesi güncelleştirmesi başarıyla tamamlandı', 'success'),
+    OutputMatcher(r'(?i)(computer|user) policy could not be updated successfully'
+                  r'|ilkesi başarıyla güncelleştirilemedi', 'failure'),
+    OutputMatcher(r'(?i)updating policy|ilke güncelleştiriliyor', 'progress', extend=60),
+]
+
+SYMANTEC_MATCHERS = [
+    OutputMatcher(r'(?i)liveupdate (failed|error)', 'failure'),
+    OutputMatcher(r'(?i)download|install|updat|\d+\s*%', 'progress', extend=60),
+]
+
 def get_network_info() -> Dict[str, str]:
-    """Retrieve basic network information safely."""
+    """Retrieve basic network information without spawning processes."""
     network_info: Dict[str, str] = {}
     try:
-        import socket
-        hostname = socket.gethostname()
-        local_ip = socket.gethostbyname(hostname)
-        network_info['hostname'] = hostname
-        network_info['local_ip'] = local_ip
-
-        result = safe_subprocess_run('ipconfig', timeout=10)
-        if result.returncode == 0:
-            lines = result.stdout.split('\n')
-            for line in lines:
-                if 'IPv4' in line and ('192.168' in line or '10.' in line):
-                    network_info['adapter_ip'] = line.strip()
-                    break
+        network_info['hostname'] = socket.gethostname()
+        # Connecting a UDP socket sends nothing but selects the outbound interface.
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.connect((CONSTANTS['DNS_SERVER'], 53))
+            network_info['local_ip'] = probe.getsockname()[0]
     except Exception as e:
         logger.warning(f"Could not retrieve network info: {e}")
 
     return network_info
 
+@dataclass
+class EndpointProbe:
+    """DNS + TCP reachability of one host:port, with timings in milliseconds."""
+    host: str
+    port: int
+    ok: bool = False
+    address: str = ""
+    dns_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    error: str = ""
+
+@dataclass
+class ConnectivityReport:
+    """Result of one concurrent probe pass."""
+    endpoints: List[EndpointProbe]
+    checked_at: float
+
+    @property
+    def ok(self) -> bool:
+        return any(endpoint.ok for endpoint in self.endpoints)
+
+    def reachable(self, host: str) -> bool:
+        return any(endpoint.ok for endpoint in self.endpoints if endpoint.host == host)
+
+    def best_latency_ms(self) -> Optional[float]:
+        latencies = [e.connect_ms for e in self.endpoints if e.ok and e.connect_ms is not None]
+        return min(latencies) if latencies else None
+
+def connectivity_targets() -> List[Tuple[str, int]]:
+    """The DNS server (TCP/53) plus every distinct download host in URLS."""
+    targets = [(CONSTANTS['DNS_SERVER'], 53)]
+    for url in URLS.values():
+        parts = urlsplit(url)
+        target = (parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        if parts.hostname and target not in targets:
+            targets.append(target)
+    return targets
+
+def resolve_endpoint(host: str, port: int, timeout: float) -> Tuple:
+    """First getaddrinfo() entry for host:port, or socket.timeout after `timeout` seconds.
+
+    getaddrinfo has no timeout of its own, so it runs on a daemon thread; a lookup
+    stuck on a dead DNS server is abandoned there and cannot hold up exit either.
+    """
+    outcome: Dict[str, object] = {}
+    done = threading.Event()
+
+    def lookup() -> None:
+        try:
+            outcome['address'] = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+        except OSError as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=lookup, name=f"resolve {host}", daemon=True).start()
+    if not done.wait(timeout):
+        raise socket.timeout(f"DNS lookup timed out after {timeout:g}s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['address']
+
+def probe_endpoint(host: str, port: int, timeout: Optional[float] = None) -> EndpointProbe:
+    """Resolve host and open (then close) a TCP connection, timing both phases (each bounded by timeout)."""
+    timeout = timeout or CONSTANTS['CONNECT_TIMEOUT']
+    result = EndpointProbe(host, port)
+    try:
+        started = time.perf_counter()
+        family, socktype, proto, _, address = resolve_endpoint(host, port, timeout)
+        result.dns_ms = (time.perf_counter() - started) * 1000
+        result.address = address[0]
+
+        started = time.perf_counter()
+        with socket.socket(family, socktype, proto) as sock:
+            sock.settimeout(timeout)
+            sock.connect(address)
+        result.connect_ms = (time.perf_counter() - started) * 1000
+        result.ok = True
+    except OSError as e:
+        result.error = str(e) or e.__class__.__name__
+    return result
+
+_connectivity_lock = threading.Lock()
+_connectivity_cache: Dict[Tuple[Tuple[str, int], ...], ConnectivityReport] = {}
+_connectivity_inflight: Dict[Tuple[Tuple[str, int], ...], Future] = {}
+
+def probe_connectivity(targets: Optional[List[Tuple[str, int]]] = None, max_age: Optional[float] = None,
+                       timeout: Optional[float] = None) -> ConnectivityReport:
+    """Probe all targets concurrently, reusing a cached report younger than max_age seconds.
+
+    The lock only guards the cache: callers asking for the same targets while a
+    probe is running wait for that probe's report instead of starting their own,
+    and nobody else waits on the network.
+    """
+    targets = targets or connectivity_targets()
+    max_age = CONSTANTS['CONNECTIVITY_TTL'] if max_age is None else max_age
+    key = tuple(targets)
+
+    with _connectivity_lock:
+        cached = _connectivity_cache.get(key)
+        if cached and time.monotonic() - cached.checked_at < max_age:
+            return cached
+        pending = _connectivity_inflight.get(key)
+        if pending is None:
+            pending = _connectivity_inflight[key] = Future()
+            owner = True
+        else:
+            owner = False
+    if not owner:
+        return pending.result()
+
+    try:
+        with OutputThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="probe") as pool:
+            endpoints = list(pool.map(lambda target: probe_endpoint(*target, timeout=timeout), targets))
+        report = ConnectivityReport(endpoints, time.monotonic())
+        with _connectivity_lock:
+            _connectivity_cache[key] = report
+        pending.set_result(report)
+        return report
+    except BaseException as e:
+        pending.set_exception(e)
+        raise
+    finally:
+        with _connectivity_lock:
+            _connectivity_inflight.pop(key, None)
+
 def measure_ping_time() -> Optional[str]:
-    """Measure ping time to the configured DNS server."""
-    try:
-        ping_result = safe_subprocess_run(f'ping -n 1 {CONSTANTS["DNS_SERVER"]}', timeout=10)
-        if ping_result.returncode == 0:
-            for line in ping_result.stdout.split('\n'):
-                if 'Zaman=' in line or 'time=' in line:
-                    time_part = line.split('Zaman=')[-1].split('ms')[0] if 'Zaman=' in line else line.split('time=')[-1].split('ms')[0]
-                    return f"{time_part}ms"
-    except Exception as e:
-        logger.warning(f"Ping time could not be measured: {e}")
-    return None
+    """Return the fastest TCP connect latency from the latest connectivity probe."""
+    latency = probe_connectivity().best_latency_ms()
+    return f"{latency:.0f}ms" if latency is not None else None
 
-def check_internet_connection(verbose: bool = False) -> bool:
-    """Check internet connectivity by pinging a DNS server."""
+def check_internet_connection(verbose: bool = False, max_age: Optional[float] = None) -> bool:
+    """Check internet connectivity via concurrent DNS/TCP probes of the DNS server and download hosts."""
     if verbose:
         print_separator("INTERNET CONNECTIVITY CHECK")
 
@@ -143,25 +1122,27 @@ def check_internet_connection(verbose: bool = False) -> bool:
             print(f"Host Name: {network_info['hostname']}")
         if network_info.get('local_ip'):
             print(f"Local IP: {network_info['local_ip']}")
-        if network_info.get('adapter_ip'):
-            print(f"Adapter: {network_info['adapter_ip']}")
 
     try:
-        response = os.system(f"ping -n {CONSTANTS['PING_COUNT']} {CONSTANTS['DNS_SERVER']} > nul")
-        connection_ok = (response == 0)
+        # The interactive test always probes afresh; other callers share the cached result.
+        report = probe_connectivity(max_age=0 if verbose and max_age is None else max_age)
+        connection_ok = report.ok
 
         if verbose:
+            for endpoint in report.endpoints:
+                if endpoint.ok:
+                    print(f"✓ {endpoint.host}:{endpoint.port} reachable "
+                          f"(DNS {endpoint.dns_ms:.0f}ms, connect {endpoint.connect_ms:.0f}ms)")
+                else:
+                    print(f"✗ {endpoint.host}:{endpoint.port} not reachable ({endpoint.error})")
+
             if connection_ok:
                 print("✓ Internet connection is available")
-                print(f"✓ DNS server ({CONSTANTS['DNS_SERVER']}) is reachable")
-                print("✓ Network link appears active")
-
                 ping_time = measure_ping_time()
                 if ping_time:
                     print(f"Ping: {ping_time}")
             else:
                 print("✗ No internet connection detected")
-                print(f"✗ DNS server ({CONSTANTS['DNS_SERVER']}) is not reachable")
                 print("✗ Network connectivity issue detected")
                 print("  Please check your internet connection.")
 
@@ -181,25 +1162,175 @@ def check_internet_connection(verbose: bool = False) -> bool:
 # Filesystem utilities
 # ---------------------------
 
-def copy_file(src: str, dst: str) -> bool:
-    """Copy a file from src to dst."""
+@dataclass
+class CopyStats:
+    """Totals for one copy_file run."""
+    copied: int = 0
+    skipped: int = 0
+    bytes_copied: int = 0
+    bytes_skipped: int = 0
+    failed: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+def plan_copy(src: str, dst: str) -> Tuple[List[Tuple[str, str, os.stat_result]], List[str]]:
+    """List (source, target, source stat) for every file under src, mirrored under dst.
+
+    Also returns every target directory, so empty ones are recreated too.
+    Symlinked directories are not followed (they could loop); each is logged.
+    """
+    if os.path.isfile(src):
+        return [(src, dst, os.stat(src))], []
+    plan: List[Tuple[str, str, os.stat_result]] = []
+    directories: List[str] = []
+    pending = [(src, dst)]
+    while pending:
+        source_dir, target_dir = pending.pop()
+        directories.append(target_dir)
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                target = os.path.join(target_dir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, target))
+                elif entry.is_symlink() and entry.is_dir():
+                    logger.warning(f"Not copying symlinked directory {entry.path}")
+                    print(f"  - Skipped symlinked directory: {entry.path}")
+                elif entry.is_file():
+                    plan.append((entry.path, target, entry.stat()))
+    return plan, directories
+
+def _file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb', buffering=0) as f:
+        buffer = bytearray(CONSTANTS['COPY_CHUNK_SIZE'])
+        view = memoryview(buffer)
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                return hasher.hexdigest()
+            hasher.update(view[:count])
+
+def is_unchanged(src: str, dst: str, src_stat: os.stat_result, verify_hash: bool = False) -> bool:
+    """True when dst matches src by size and mtime (and, optionally, content hash)."""
+    try:
+        dst_stat = os.stat(dst)
+    except OSError:
+        return False
+    if dst_stat.st_size != src_stat.st_size:
+        return False
+    if abs(dst_stat.st_mtime - src_stat.st_mtime) > CONSTANTS['COPY_MTIME_SLACK']:
+        return False
+    return not verify_hash or _file_sha256(src) == _file_sha256(dst)
+
+def _copy_one(src: str, dst: str, size: int, on_bytes: Callable[[int], None]) -> None:
+    """Copy src to dst through a temporary file so an interrupted copy never looks complete.
+
+    Small files use the OS fast path; large ones are streamed in chunks so
+    progress can be reported while they copy.
+    """
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    tmp_path = dst + '.ttcopy'
+    try:
+        if size < CONSTANTS['COPY_LARGE_FILE']:
+            shutil.copy2(src, tmp_path)
+            os.replace(tmp_path, dst)
+            on_bytes(size)
+            return
+        with open(src, 'rb', buffering=0) as fsrc, open(tmp_path, 'wb', buffering=0) as fdst:
+            buffer = bytearray(CONSTANTS['COPY_CHUNK_SIZE'])
+            view = memoryview(buffer)
+            while True:
+                count = fsrc.readinto(buffer)
+                if not count:
+                    break
+                fdst.write(view[:count])
+                on_bytes(count)
+        shutil.copystat(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+def copy_file(src: str, dst: str, verify_hash: bool = False, workers: Optional[int] = None) -> bool:
+    """Copy a file or directory tree from src into dst, skipping targets that are already identical.
+
+    A directory dst receives src under its own name, as with a plain file copy.
+    Files are copied in parallel; large ones stream in chunks so the progress
+    bar keeps moving.
+    """
     try:
         if not os.path.exists(src):
             print(f"Source file not found: {src}")
             return False
+        if os.path.isdir(dst):
+            dst = os.path.join(dst, os.path.basename(os.path.normpath(src)))
 
-        dst_dir = os.path.dirname(dst)
-        if dst_dir and not os.path.exists(dst_dir):
-            os.makedirs(dst_dir)
+        with tracer.span(f"copy {src}", 'copy', src=src, dst=dst) as span_attrs:
+            stats = _copy_tree(src, dst, verify_hash, workers or CONSTANTS['COPY_WORKERS'])
+            span_attrs.update(copied=stats.copied, skipped=stats.skipped, bytes=stats.bytes_copied,
+                              failed=len(stats.failed))
 
-        shutil.copy2(src, dst)
-        print(f"File copied successfully: {src} -> {dst}")
-        return True
+        rate = stats.bytes_copied / (1024 * 1024) / max(stats.seconds, 1e-6)
+        print(f"{'✓' if not stats.failed else '✗'} Copied {stats.copied} file(s), "
+              f"{stats.bytes_copied / (1024 * 1024):.1f}MB in {stats.seconds:.1f}s ({rate:.1f}MB/s); "
+              f"skipped {stats.skipped} unchanged ({stats.bytes_skipped / (1024 * 1024):.1f}MB)")
+        for path in stats.failed:
+            print(f"  ✗ {path}")
+        logger.info(f"Copy {src} -> {dst}: {stats.copied} copied, {stats.skipped} skipped, "
+                    f"{len(stats.failed)} failed, {rate:.1f}MB/s")
+        return not stats.failed
     except Exception as e:
         logger.error(f"File copy error: {e}")
         print(f"Error: {e}")
         return False
 
+def _copy_tree(src: str, dst: str, verify_hash: bool, workers: int) -> CopyStats:
+    started = time.monotonic()
+    stats = CopyStats()
+    plan, directories = plan_copy(src, dst)
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    with OutputThreadPoolExecutor(max_workers=workers, thread_name_prefix="copy") as pool:
+        todo = []
+        for item, unchanged in zip(plan, pool.map(lambda item: is_unchanged(*item, verify_hash), plan)):
+            if unchanged:
+                stats.skipped += 1
+                stats.bytes_skipped += item[2].st_size
+            else:
+                todo.append(item)
+        # Largest first, so big files are not left running alone at the end.
+        todo.sort(key=lambda item: item[2].st_size, reverse=True)
+
+        lock = threading.Lock()
+        copied = [0]
+
+        def on_bytes(count: int) -> None:
+            with lock:
+                copied[0] += count
+
+        total = sum(item[2].st_size for item in todo)
+        progress = DownloadProgress(total, label="Copying")
+        futures = {pool.submit(_copy_one, source, target, stat.st_size, on_bytes): source
+                   for source, target, stat in todo}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=CONSTANTS['PROGRESS_INTERVAL'])
+            for future in done:
+                try:
+                    future.result()
+                    stats.copied += 1
+                except OSError as e:
+                    logger.error(f"Copy failed for {futures[future]}: {e}")
+                    stats.failed.append(futures[future])
+            progress.update(copied[0])
+        if todo:
+            progress.finish(copied[0])
+
+    stats.bytes_copied = copied[0]
+    stats.seconds = time.monotonic() - started
+    return stats
+
 # ---------------------------
 # OEM / Manufacturer
 # ---------------------------
@@ -215,122 +1346,1563 @@ def get_manufacturer() -> str:
         return ""
 
 # ---------------------------
-# Download helper
+# System facts
 # ---------------------------
 
-def download_with_progress(url: str, file_path: str) -> bool:
-    """Download a file with a simple progress bar."""
-    try:
-        import urllib3
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+@dataclass
+class SystemFacts:
+    """Machine facts the setup steps branch on, gathered once and cached for FACTS_TTL.
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
+    None means the fact could not be determined; steps then fall back to
+    checking for themselves. Collectors that failed are listed in `missing` and
+    retried on the next call instead of being cached as empty.
+    """
+    manufacturer: str = ""
+    model: str = ""
+    sccm_client: Optional[bool] = None
+    symantec: Optional[bool] = None
+    hostname: str = ""
+    local_ip: str = ""
+    adapters: List[str] = field(default_factory=list)
+    power_scheme: Optional[str] = None
+    collected_at: float = 0.0
+    missing: List[str] = field(default_factory=list)
 
-        if 'drive.google.com' in url:
-            print("Downloading from Google Drive...")
-            session = requests.Session()
-            session.headers.update(headers)
+def _read_registry_value(path: str, name: str):
+    with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, path) as key:
+        return winreg.QueryValueEx(key, name)[0]
 
-            response = session.get(url, stream=True, verify=False, timeout=30)
+_SYSTEM_INFORMATION_KEY = r"SYSTEM\CurrentControlSet\Control\SystemInformation"
 
-            for key, value in response.cookies.items():
-                if key.startswith('download_warning'):
-                    url = url + '&confirm=' + value
-                    break
+def _fact_manufacturer() -> Dict:
+    return {'manufacturer': str(_read_registry_value(_SYSTEM_INFORMATION_KEY, "SystemManufacturer")).lower()}
 
-            response = session.get(url, stream=True, verify=False, timeout=30)
-        else:
-            response = requests.get(url, stream=True, verify=False, timeout=30, headers=headers)
-
-        response.raise_for_status()
-
-        total_size = int(response.headers.get('content-length', 0))
-        if total_size == 0:
-            print("Unable to determine file size; downloading...")
-
-        downloaded = 0
-        with open(file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=CONSTANTS['CHUNK_SIZE']):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-
-                    if total_size > 0:
-                        percent = (downloaded / total_size) * 100
-                        mb_downloaded = downloaded / (1024 * 1024)
-                        mb_total = total_size / (1024 * 1024)
-                        filled_length = int(CONSTANTS['PROGRESS_BAR_LENGTH'] * downloaded // total_size)
-                        bar = '█' * filled_length + '-' * (CONSTANTS['PROGRESS_BAR_LENGTH'] - filled_length)
-                        print(f'\rDownloading: [{bar}] {percent:.1f}% ({mb_downloaded:.1f}MB/{mb_total:.1f}MB)', end='', flush=True)
-                    else:
-                        mb_downloaded = downloaded / (1024 * 1024)
-                        print(f'\rDownloading: {mb_downloaded:.1f}MB', end='', flush=True)
+def _fact_model() -> Dict:
+    return {'model': str(_read_registry_value(_SYSTEM_INFORMATION_KEY, "SystemProductName")).strip()}
 
-        print()
-        return True
+def _fact_sccm_client() -> Dict:
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SYSTEM\CurrentControlSet\Services\CcmExec"):
+            return {'sccm_client': True}
+    except FileNotFoundError:
+        return {'sccm_client': False}
 
-    except requests.RequestException as e:
-        logger.error(f"Download error: {e}")
-        print(f"Download error: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"Unexpected download error: {e}")
-        print(f"Unexpected error: {e}")
-        return False
+def _fact_symantec() -> Dict:
+    return {'symantec': os.path.exists(CONSTANTS['SYMANTEC_PATH'])}
 
-# ---------------------------
-# Support Assistant installer
-# ---------------------------
+def _fact_network() -> Dict:
+    info = get_network_info()
+    return {'hostname': info.get('hostname', ''), 'local_ip': info.get('local_ip', ''),
+            'adapters': [name for _, name in socket.if_nameindex()]}
 
-def install_support_assistant() -> None:
-    """Download and open the Support Assistant installer (OEM-dependent)."""
-    print_separator("SUPPORT ASSISTANT INSTALLER")
+def _fact_power_scheme() -> Dict:
+    path = r"SYSTEM\CurrentControlSet\Control\Power\User\PowerSchemes"
+    return {'power_scheme': str(_read_registry_value(path, "ActivePowerScheme")).lower()}
 
-    if not check_internet_connection():
-        print("No internet connection. Please check your network and try again.")
-        print_separator()
-        return
+FACT_COLLECTORS: Dict[str, Callable[[], Dict]] = {
+    "manufacturer": _fact_manufacturer,
+    "model": _fact_model,
+    "sccm": _fact_sccm_client,
+    "symantec": _fact_symantec,
+    "network": _fact_network,
+    "power": _fact_power_scheme,
+}
 
-    print("Downloading and preparing Support Assistant...")
+def collect_system_facts(names: Optional[List[str]] = None, facts: Optional[SystemFacts] = None) -> SystemFacts:
+    """Run the named fact collectors (default all) concurrently into facts; none of them starts a process."""
+    names = [name for name in (names or FACT_COLLECTORS) if name in FACT_COLLECTORS]
+    facts = replace(facts, missing=[]) if facts else SystemFacts(collected_at=time.time())
+    with tracer.span("collect system facts", 'facts', collectors=len(names)):
+        with OutputThreadPoolExecutor(max_workers=max(1, len(names)), thread_name_prefix="facts") as pool:
+            futures = {pool.submit(FACT_COLLECTORS[name]): name for name in names}
+            for future, name in futures.items():
+                try:
+                    for key, value in future.result().items():
+                        setattr(facts, key, value)
+                except Exception as e:
+                    logger.warning(f"Could not collect {name} facts: {e}")
+                    facts.missing.append(name)
+    return facts
 
-    try:
-        manufacturer = get_manufacturer()
-        if "dell" in manufacturer:
-            print("Dell system detected. Downloading Dell Support Assistant package...")
-            url = URLS['DELL_SUPPORT']
-        elif "lenovo" in manufacturer:
-            print("Lenovo system detected. Downloading Lenovo Support Assistant package...")
-            url = URLS['LENOVO_SUPPORT']
-        else:
-            print("HP/Generic system detected. Downloading HP Support Assistant package...")
-            url = URLS['HP_SUPPORT']
+_system_facts: Optional[SystemFacts] = None
+# Held while facts are collected and saved, so the prefetch thread and the main
+# thread never collect twice or race on the facts file.
+_system_facts_lock = threading.Lock()
 
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        auto_setup_dir = os.path.join(current_dir, "autoSetup")
-        os.makedirs(auto_setup_dir, exist_ok=True)
-        download_path = os.path.join(auto_setup_dir, "Support_Assistant.exe")
+def _facts_path() -> str:
+    return os.path.join(get_auto_setup_dir(), CONSTANTS['FACTS_FILE'])
 
-        print("Starting download...")
-        if download_with_progress(url, download_path):
-            print("\nDownload completed. Opening download folder...")
+def get_system_facts(refresh: bool = False) -> SystemFacts:
+    """Return machine facts from memory, the facts file (if younger than FACTS_TTL) or a fresh collection.
+
+    Cached facts are kept field by field: when some collectors failed last time,
+    only those run again and the facts already read stay.
+    """
+    global _system_facts
+    with _system_facts_lock:
+        now = time.time()
+        cached = None if refresh else _system_facts
+        if not refresh and cached is None:
             try:
-                folder_path = os.path.dirname(download_path)
-                subprocess.run(['explorer', folder_path], check=True)
-            except Exception as e:
-                logger.warning(f"Could not open Explorer: {e}")
-                print(f"Could not open Explorer: {e}")
-                print(f"File path: {download_path}")
-                print("Please navigate to the folder and run the installer manually.")
-        else:
-            print("Download failed.")
+                with open(_facts_path(), 'r', encoding='utf-8') as f:
+                    cached = SystemFacts(**json.load(f))
+            except (OSError, ValueError, TypeError):
+                pass
+        if cached and not 0 <= now - cached.collected_at < CONSTANTS['FACTS_TTL']:
+            cached = None
+        if cached and not cached.missing:
+            _system_facts = cached
+            return cached
 
-    except Exception as e:
-        logger.error(f"Support Assistant install error: {e}")
-        print(f"Support Assistant install error: {e}")
+        _system_facts = collect_system_facts(cached.missing, cached) if cached else collect_system_facts()
+        try:
+            tmp_path = _facts_path() + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(asdict(_system_facts), f, indent=2)
+            os.replace(tmp_path, _facts_path())
+        except OSError as e:
+            logger.warning(f"Could not save system facts: {e}")
+        return _system_facts
+
+# ---------------------------
+# Download helper
+# ---------------------------
+
+def print_download_progress(downloaded: int, total_size: int, rate: Optional[float] = None,
+                            eta: Optional[float] = None, label: str = "Downloading") -> None:
+    """Redraw the single-line download progress bar."""
+    mb_downloaded = downloaded / (1024 * 1024)
+    speed = f" {rate / (1024 * 1024):.1f}MB/s" if rate else ""
+    remaining = f" ETA {int(eta) // 60}:{int(eta) % 60:02d}" if eta is not None else ""
+    if total_size > 0:
+        percent = (downloaded / total_size) * 100
+        mb_total = total_size / (1024 * 1024)
+        filled_length = int(CONSTANTS['PROGRESS_BAR_LENGTH'] * downloaded // total_size)
+        bar = '█' * filled_length + '-' * (CONSTANTS['PROGRESS_BAR_LENGTH'] - filled_length)
+        print(f'\r{label}: [{bar}] {percent:.1f}% ({mb_downloaded:.1f}MB/{mb_total:.1f}MB){speed}{remaining}  ',
+              end='', flush=True, file=current_output())
+    else:
+        print(f'\r{label}: {mb_downloaded:.1f}MB{speed}  ', end='', flush=True, file=current_output())
+
+class DownloadProgress:
+    """Time-throttled progress bar with smoothed throughput and ETA."""
+
+    def __init__(self, total_size: int, initial: int = 0, interval: Optional[float] = None,
+                 label: str = "Downloading") -> None:
+        self.total_size = total_size
+        self.label = label
+        self.interval = CONSTANTS['PROGRESS_INTERVAL'] if interval is None else interval
+        self.started = time.monotonic()
+        self.initial = initial
+        self.rate: Optional[float] = None
+        self._last_time = 0.0
+        self._last_bytes = initial
+
+    def update(self, downloaded: int, force: bool = False) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if not force and elapsed < self.interval:
+            return
+        if self._last_time:
+            sample = (downloaded - self._last_bytes) / max(elapsed, 1e-6)
+            self.rate = sample if self.rate is None else 0.7 * self.rate + 0.3 * sample
+        self._last_time, self._last_bytes = now, downloaded
+        eta = None
+        if self.rate and self.total_size > 0:
+            eta = max(0.0, (self.total_size - downloaded) / self.rate)
+        print_download_progress(downloaded, self.total_size, self.rate, eta, self.label)
+
+    def finish(self, downloaded: int) -> float:
+        """Draw the final state, end the line and return the average throughput in bytes/s."""
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.rate = (downloaded - self.initial) / elapsed
+        print_download_progress(downloaded, self.total_size, self.rate, label=self.label)
+        print(file=current_output())
+        return self.rate
+
+def iter_response_views(response, limit: Optional[int] = None):
+    """Yield memoryviews of the body, read into one reusable buffer.
+
+    Each view is only valid until the next iteration. The read size starts at
+    DOWNLOAD_MIN_CHUNK and doubles while reads come back full, up to
+    DOWNLOAD_MAX_CHUNK, and halves again when the link slows down.
+    Compressed bodies fall back to requests' decoding iterator. Read errors
+    are raised as the same requests exceptions iter_content would raise, so
+    callers' retry handling sees a dropped connection either way.
+    """
+    encoding = response.headers.get('content-encoding', 'identity').lower()
+    if encoding not in ('', 'identity') or not hasattr(response.raw, 'readinto'):
+        for chunk in response.iter_content(chunk_size=CONSTANTS['DOWNLOAD_MIN_CHUNK']):
+            if limit is not None:
+                chunk = chunk[:limit]
+                limit -= len(chunk)
+            if chunk:
+                yield memoryview(chunk)
+            if limit is not None and limit <= 0:
+                return
+        return
+
+    from urllib3.exceptions import HTTPError, ProtocolError, ReadTimeoutError
+
+    buffer = bytearray(CONSTANTS['DOWNLOAD_MAX_CHUNK'])
+    view = memoryview(buffer)
+    size = CONSTANTS['DOWNLOAD_MIN_CHUNK']
+    while limit is None or limit > 0:
+        want = size if limit is None else min(size, limit)
+        try:
+            count = response.raw.readinto(view[:want])
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except (ReadTimeoutError, HTTPError) as e:
+            raise requests.exceptions.ConnectionError(e)
+        if not count:
+            return
+        if limit is not None:
+            limit -= count
+        yield view[:count]
+        if count == want:
+            size = min(size * 2, CONSTANTS['DOWNLOAD_MAX_CHUNK'])
+        elif count < want // 4:
+            size = max(size // 2, CONSTANTS['DOWNLOAD_MIN_CHUNK'])
+
+def new_download_session(pool_size: int = 1) -> "requests.Session":
+    """Create a requests session whose connection pool can serve `pool_size` parallel requests."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(DOWNLOAD_HEADERS)
+    session.verify = False
+    return session
+
+class RangeNotSupported(Exception):
+    """Raised when the server ignores HTTP Range requests."""
+
+class DownloadCancelled(OperationCancelled):
+    """Raised inside a download when its cancel event is set; partial data is kept for resume."""
+
+class SegmentedDownload:
+    """Fetch a file as parallel HTTP Range segments into a preallocated file, resumable via a sidecar state file."""
+
+    def __init__(self, session: "requests.Session", url: str, file_path: str, total_size: int,
+                 validator: str = "", segments: Optional[int] = None,
+                 cancel: Optional[threading.Event] = None) -> None:
+        self.session = session
+        self.cancel = cancel
+        self.url = url
+        self.file_path = file_path
+        self.part_path = file_path + '.part'
+        self.state_path = file_path + '.part.json'
+        self.total_size = total_size
+        self.validator = validator
+        self.segment_count = segments or CONSTANTS['DOWNLOAD_SEGMENTS']
+        # Segment workers are pool threads, so they carry the caller's deadline explicitly.
+        self.deadline = current_deadline()
+        self.segments: List[Dict[str, int]] = []
+        self.downloaded = 0
+        self.sha256 = ""
+        self._hasher = hashlib.sha256()
+        self._hash_pos = 0
+        self._hash_lock = threading.Lock()
+        self._written: Dict[int, int] = {}  # segment start -> end of bytes written this session
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def _plan_segments(self) -> List[Dict[str, int]]:
+        count = max(1, min(self.segment_count, self.total_size // CONSTANTS['DOWNLOAD_MIN_SEGMENT_SIZE'] or 1))
+        size = -(-self.total_size // count)
+        return [
+            {'start': start, 'end': min(start + size, self.total_size) - 1, 'done': 0}
+            for start in range(0, self.total_size, size)
+        ]
+
+    def _load_state(self) -> bool:
+        """Restore segment progress from a previous attempt if it matches this download.
+
+        Without an ETag or Last-Modified there is no way to tell whether the
+        origin changed since, so the partial file is never reused.
+        """
+        if not self.validator:
+            return False
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if (state.get('url') != self.url or state.get('size') != self.total_size
+                    or state.get('validator') != self.validator
+                    or os.path.getsize(self.part_path) != self.total_size):
+                return False
+            self.segments = state['segments']
+            self.downloaded = sum(segment['done'] for segment in self.segments)
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def save_state(self) -> None:
+        """Atomically persist committed segment progress to the sidecar file."""
+        with self._lock:
+            state = {'url': self.url, 'size': self.total_size, 'validator': self.validator,
+                     'segments': [dict(segment) for segment in self.segments]}
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _prepare(self) -> None:
+        if self._load_state():
+            logger.info(f"Resuming download of {self.url} at {self.downloaded} / {self.total_size} bytes")
+            return
+        self.segments = self._plan_segments()
+        self.downloaded = 0
+        with open(self.part_path, 'wb') as f:
+            f.truncate(self.total_size)
+        self.save_state()
+
+    def _fetch_segment(self, segment: Dict[str, int]) -> None:
+        """Download one segment with retries, committing progress after each flushed checkpoint."""
+        last_error: Optional[Exception] = None
+        for attempt in range(CONSTANTS['DOWNLOAD_RETRIES']):
+            start = segment['start'] + segment['done']
+            if start > segment['end'] or self._cancelled.is_set():
+                return
+            with deadline_scope(self.deadline):
+                timeout = cap_timeout(CONSTANTS['DOWNLOAD_TIMEOUT'])
+            try:
+                headers = {'Range': f"bytes={start}-{segment['end']}"}
+                with self.session.get(self.url, headers=headers, stream=True,
+                                      timeout=timeout) as response:
+                    if response.status_code != 206:
+                        raise RangeNotSupported(f"HTTP {response.status_code} for ranged request")
+                    with open(self.part_path, 'r+b', buffering=0) as f:
+                        f.seek(start)
+                        pending = 0
+                        position = start
+                        remaining = segment['end'] - start + 1
+                        for chunk in iter_response_views(response, remaining):
+                            if self._cancelled.is_set():
+                                break
+                            f.write(chunk)
+                            self._hash_chunk(position, chunk)
+                            position += len(chunk)
+                            with self._lock:
+                                self._written[segment['start']] = position
+                            remaining -= len(chunk)
+                            pending += len(chunk)
+                            with self._lock:
+                                self.downloaded += len(chunk)
+                            if pending >= CONSTANTS['DOWNLOAD_CHECKPOINT_BYTES'] or remaining <= 0:
+                                f.flush()
+                                with self._lock:
+                                    segment['done'] += pending
+                                pending = 0
+                            if remaining <= 0:
+                                break
+                        f.flush()
+                        with self._lock:
+                            segment['done'] += pending
+                if segment['start'] + segment['done'] > segment['end'] or self._cancelled.is_set():
+                    return
+                last_error = IOError(f"Segment {segment['start']}-{segment['end']} ended early")
+            except RangeNotSupported:
+                raise
+            except requests.RequestException as e:
+                last_error = e
+            # Bytes that were written but not committed are fetched again on retry.
+            with self._lock:
+                self.downloaded = sum(s['done'] for s in self.segments)
+            logger.warning(f"Segment {segment['start']}-{segment['end']} attempt {attempt + 1} failed: {last_error}")
+            if attempt + 1 < CONSTANTS['DOWNLOAD_RETRIES']:
+                time.sleep(min(2 ** attempt, 5))
+        raise last_error or IOError("Segment download failed")
+
+    def _hash_chunk(self, offset: int, chunk: memoryview) -> None:
+        """Feed freshly received bytes to the hash if they continue the hashed prefix."""
+        with self._hash_lock:
+            skip = self._hash_pos - offset
+            if 0 <= skip < len(chunk):
+                self._hasher.update(chunk[skip:])
+                self._hash_pos += len(chunk) - skip
+
+    def _advance_hash(self, reader) -> None:
+        """Catch the hash up over bytes that reached the disk ahead of the hashed prefix.
+
+        Bytes arriving exactly at the end of the prefix are hashed in memory by
+        the segment worker (_hash_chunk). Only data that landed further ahead,
+        typically the start of a segment whose predecessor was still running,
+        is read back here, from the OS page cache. The hash is ready as soon
+        as the last segment lands.
+        """
+        for segment in self.segments:
+            with self._lock:
+                done_end = segment['start'] + segment['done']
+                available_end = max(done_end, self._written.get(segment['start'], 0))
+            with self._hash_lock:
+                while segment['start'] <= self._hash_pos < available_end:
+                    reader.seek(self._hash_pos)
+                    block = reader.read(min(CONSTANTS['DOWNLOAD_CHECKPOINT_BYTES'], available_end - self._hash_pos))
+                    if not block:
+                        return
+                    self._hasher.update(block)
+                    self._hash_pos += len(block)
+                if self._hash_pos <= segment['end']:
+                    break
+
+    def run(self) -> bool:
+        """Download all segments in parallel; keep .part + state for resume on failure."""
+        self._prepare()
+        pending = [segment for segment in self.segments if segment['start'] + segment['done'] <= segment['end']]
+        with open(self.part_path, 'rb') as reader:
+            if pending:
+                self._download_pending(pending, reader)
+            self._advance_hash(reader)
+        if self._hash_pos != self.total_size:
+            raise IOError(f"Hashed {self._hash_pos} of {self.total_size} bytes; download incomplete")
+        self.sha256 = self._hasher.hexdigest()
+
+        os.replace(self.part_path, self.file_path)
+        with contextlib.suppress(OSError):
+            os.remove(self.state_path)
+        return True
+
+    def _download_pending(self, pending: List[Dict[str, int]], reader) -> None:
+        progress = DownloadProgress(self.total_size, self.downloaded)
+        try:
+            with OutputThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="download") as pool:
+                futures = [pool.submit(self._fetch_segment, segment) for segment in pending]
+                last_saved = time.monotonic()
+                try:
+                    while True:
+                        done, not_done = wait(futures, timeout=CONSTANTS['PROGRESS_INTERVAL'])
+                        progress.update(self.downloaded)
+                        self._advance_hash(reader)
+                        if any(f.exception() for f in done):
+                            self._cancelled.set()
+                        if not not_done:
+                            break
+                        if self.cancel is not None and self.cancel.is_set():
+                            raise DownloadCancelled(f"Download of {self.url} cancelled")
+                        if time.monotonic() - last_saved >= 1.0:
+                            self.save_state()
+                            last_saved = time.monotonic()
+                except BaseException:
+                    self._cancelled.set()
+                    raise
+        finally:
+            # Workers commit their last flushed bytes as they stop, so save after the pool drains.
+            self.save_state()
+        progress.finish(self.downloaded)
+        for future in futures:
+            if future.exception():
+                raise future.exception()
+
+def discard_partial_download(file_path: str) -> None:
+    """Remove leftover .part data and resume state for a download target."""
+    for path in (file_path + '.part', file_path + '.part.json'):
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+@dataclass
+class DownloadResult:
+    """Outcome of fetch_file: whether it succeeded, or the server reported the cached copy is current."""
+    ok: bool
+    not_modified: bool = False
+    size: int = 0
+    sha256: str = ""
+    etag: str = ""
+    last_modified: str = ""
+
+def _download_single_stream(response, file_path: str,
+                            cancel: Optional[threading.Event] = None) -> Tuple[int, str]:
+    """Stream an already-opened response into file_path, hashing as it goes; return (size, sha256)."""
+    total_size = int(response.headers.get('content-length', 0))
+    if total_size == 0:
+        print("Unable to determine file size; downloading...", file=current_output())
+
+    hasher = hashlib.sha256()
+    downloaded = 0
+    progress = DownloadProgress(total_size)
+    with open(file_path, 'wb', buffering=0) as f:
+        if total_size:
+            # Reserve the whole file up front to avoid repeated extension of the file.
+            f.truncate(total_size)
+        for chunk in iter_response_views(response):
+            if cancel is not None and cancel.is_set():
+                raise DownloadCancelled(f"Download of {response.url} cancelled")
+            f.write(chunk)
+            hasher.update(chunk)
+            downloaded += len(chunk)
+            progress.update(downloaded)
+        f.truncate(downloaded)
+
+    progress.finish(downloaded)
+    if total_size and downloaded != total_size:
+        raise IOError(f"Expected {total_size} bytes, received {downloaded}")
+    return downloaded, hasher.hexdigest()
+
+def _validators(response) -> Dict[str, str]:
+    return {'etag': response.headers.get('etag', ''), 'last_modified': response.headers.get('last-modified', '')}
+
+def fetch_file(url: str, file_path: str, segments: Optional[int] = None,
+               conditional_headers: Optional[Dict[str, str]] = None,
+               cancel: Optional[threading.Event] = None) -> DownloadResult:
+    """Download url into file_path, using parallel resumable Range segments when the server allows it.
+
+    `conditional_headers` (If-None-Match / If-Modified-Since) let the server answer
+    304, in which case nothing is written and `not_modified` is set. Setting
+    `cancel` stops the download and reports failure.
+    """
+    cancel = cancel or current_cancel()
+    with tracer.span(f"download {url}", 'download', url=url) as span_attrs:
+        result = _fetch_file(url, file_path, segments, conditional_headers, cancel)
+        span_attrs.update(ok=result.ok, bytes=result.size, not_modified=result.not_modified)
+        return result
+
+def _fetch_file(url: str, file_path: str, segments: Optional[int],
+                conditional_headers: Optional[Dict[str, str]],
+                cancel: Optional[threading.Event] = None) -> DownloadResult:
+    try:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        segment_count = segments or CONSTANTS['DOWNLOAD_SEGMENTS']
+        read_timeout = cap_timeout(CONSTANTS['DOWNLOAD_TIMEOUT'])
+        conditional_headers = conditional_headers or {}
+
+        with new_download_session(segment_count) as session:
+            if 'drive.google.com' in url:
+                print("Downloading from Google Drive...", file=current_output())
+
+                response = session.get(url, stream=True, timeout=read_timeout)
+
+                for key, value in response.cookies.items():
+                    if key.startswith('download_warning'):
+                        url = url + '&confirm=' + value
+                        break
+
+                response = session.get(url, stream=True, timeout=read_timeout)
+                response.raise_for_status()
+                size, digest = _download_single_stream(response, file_path, cancel)
+                return DownloadResult(True, size=size, sha256=digest)
+
+            probe = session.head(url, allow_redirects=True, headers=conditional_headers,
+                                 timeout=read_timeout)
+            if probe.status_code == 304:
+                return DownloadResult(True, not_modified=True)
+
+            total_size = int(probe.headers.get('content-length', 0)) if probe.ok else 0
+            accepts_ranges = probe.ok and probe.headers.get('accept-ranges', '').lower() == 'bytes'
+
+            if accepts_ranges and total_size >= CONSTANTS['DOWNLOAD_MIN_SEGMENT_SIZE']:
+                validators = _validators(probe)
+                try:
+                    download = SegmentedDownload(session, probe.url, file_path, total_size,
+                                                 validators['etag'] or validators['last_modified'], segment_count,
+                                                 cancel)
+                    download.run()
+                    return DownloadResult(True, size=total_size, sha256=download.sha256, **validators)
+                except RangeNotSupported as e:
+                    logger.info(f"Range requests rejected, using single stream: {e}")
+                    discard_partial_download(file_path)
+
+            with session.get(url, stream=True, headers=conditional_headers,
+                             timeout=read_timeout) as response:
+                if response.status_code == 304:
+                    return DownloadResult(True, not_modified=True)
+                response.raise_for_status()
+                size, digest = _download_single_stream(response, file_path, cancel)
+                return DownloadResult(True, size=size, sha256=digest, **_validators(response))
+
+    except DownloadCancelled as e:
+        print(file=current_output())
+        logger.info(str(e))
+        return DownloadResult(False)
+    except requests.RequestException as e:
+        print(file=current_output())
+        logger.error(f"Download error: {e}")
+        print(f"Download error: {e}", file=current_output())
+        return DownloadResult(False)
+    except Exception as e:
+        print(file=current_output())
+        logger.error(f"Unexpected download error: {e}")
+        print(f"Unexpected error: {e}", file=current_output())
+        return DownloadResult(False)
+
+def download_with_progress(url: str, file_path: str, segments: Optional[int] = None) -> bool:
+    """Download a file with a progress bar (segmented and resumable when supported)."""
+    return fetch_file(url, file_path, segments).ok
+
+# ---------------------------
+# Package cache
+# ---------------------------
+
+def get_auto_setup_dir() -> str:
+    """Return (and create) the autoSetup working folder next to this script (or AUTO_SETUP_DIR)."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    auto_setup_dir = CONSTANTS['AUTO_SETUP_DIR'] or os.path.join(current_dir, "autoSetup")
+    os.makedirs(auto_setup_dir, exist_ok=True)
+    return auto_setup_dir
+
+class PackageCache:
+    """Content-addressed installer store: blobs named by SHA-256, indexed by URL and HTTP validators.
+
+    Blobs live in `objects/<sha256>`; `index.json` maps each URL to its blob,
+    ETag/Last-Modified, blob mtime and last-use time. Unpinned entries are
+    evicted in LRU order once the store exceeds `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None) -> None:
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_path = os.path.join(root, 'index.json')
+        self.max_bytes = CONSTANTS['CACHE_MAX_BYTES'] if max_bytes is None else max_bytes
+        self._lock = threading.RLock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            index.setdefault('entries', {})
+            index.setdefault('pinned', [])
+            return index
+        except (OSError, ValueError):
+            return {'entries': {}, 'pinned': []}
+
+    def _save_index(self) -> None:
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256)
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Return the index entry for url if its blob is still intact.
+
+        A blob whose size and mtime match the index is trusted; one whose mtime
+        changed is hashed again, and dropped if it no longer matches its name.
+        """
+        with self._lock:
+            entry = self._index['entries'].get(url)
+            if not entry:
+                return None
+            blob = self.object_path(entry['sha256'])
+            try:
+                stat = os.stat(blob)
+                if stat.st_size == entry['size'] and stat.st_mtime_ns == entry.get('mtime_ns'):
+                    return entry
+                if stat.st_size == entry['size'] and _file_sha256(blob) == entry['sha256']:
+                    entry['mtime_ns'] = stat.st_mtime_ns
+                    self._save_index()
+                    return entry
+            except OSError:
+                pass
+            logger.warning(f"Cached package for {url} is missing or corrupt; it will be downloaded again")
+            self.discard_blob(entry['sha256'])
+            return None
+
+    def discard_blob(self, sha256: str) -> None:
+        """Delete a blob that failed verification along with every index entry pointing at it."""
+        with self._lock:
+            entries = self._index['entries']
+            for url in [url for url, entry in entries.items() if entry['sha256'] == sha256]:
+                del entries[url]
+            with contextlib.suppress(OSError):
+                os.remove(self.object_path(sha256))
+            self._save_index()
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def touch(self, url: str, revalidated: bool = False) -> None:
+        with self._lock:
+            entry = self._index['entries'].get(url)
+            if entry:
+                entry['last_used'] = time.time()
+                if revalidated:
+                    entry['checked'] = entry['last_used']
+                self._save_index()
+
+    def store(self, url: str, tmp_path: str, result: DownloadResult) -> str:
+        """Move a verified download into the store (deduplicating by hash) and index it under url."""
+        with self._lock:
+            blob = self.object_path(result.sha256)
+            # Always take the fresh, verified bytes, even over an existing blob of that name.
+            os.replace(tmp_path, blob)
+            previous = self._index['entries'].get(url)
+            now = time.time()
+            self._index['entries'][url] = {
+                'sha256': result.sha256,
+                'size': result.size,
+                'mtime_ns': os.stat(blob).st_mtime_ns,
+                'etag': result.etag,
+                'last_modified': result.last_modified,
+                'last_used': now,
+                'checked': now,
+            }
+            if previous and previous['sha256'] != result.sha256:
+                self._drop_unreferenced(previous['sha256'])
+            self.evict()
+            self._save_index()
+            return blob
+
+    def pin(self, url: str, pinned: bool = True) -> None:
+        """Protect (or release) a URL's package from LRU eviction."""
+        with self._lock:
+            pins = set(self._index['pinned'])
+            if pinned:
+                pins.add(url)
+            else:
+                pins.discard(url)
+            self._index['pinned'] = sorted(pins)
+            self._save_index()
+
+    def _drop_unreferenced(self, sha256: str) -> None:
+        if all(entry['sha256'] != sha256 for entry in self._index['entries'].values()):
+            with contextlib.suppress(OSError):
+                os.remove(self.object_path(sha256))
+
+    def evict(self) -> List[str]:
+        """Drop least-recently-used unpinned entries until the store fits in max_bytes."""
+        with self._lock:
+            entries = self._index['entries']
+            pins = set(self._index['pinned'])
+
+            def blob_sizes() -> Dict[str, int]:
+                return {entry['sha256']: entry['size'] for entry in entries.values()}
+
+            evicted: List[str] = []
+            candidates = sorted((url for url in entries if url not in pins),
+                                key=lambda url: entries[url].get('last_used', 0))
+            for url in candidates:
+                if sum(blob_sizes().values()) <= self.max_bytes:
+                    break
+                evicted.append(url)
+                self._drop_unreferenced(entries.pop(url)['sha256'])
+            if evicted:
+                logger.info(f"Package cache evicted: {', '.join(evicted)}")
+            return evicted
+
+    def materialize(self, sha256: str, dest_path: str) -> bool:
+        """Copy a cached blob to dest_path, checking its hash on the way; False if the blob was corrupt.
+
+        A copy rather than a link, so whatever happens to the installer at
+        dest_path cannot alter the cache.
+        """
+        tmp_path = dest_path + '.tmp'
+        hasher = hashlib.sha256()
+        with open(self.object_path(sha256), 'rb', buffering=0) as src, open(tmp_path, 'wb', buffering=0) as dst:
+            buffer = bytearray(CONSTANTS['COPY_CHUNK_SIZE'])
+            view = memoryview(buffer)
+            while True:
+                count = src.readinto(buffer)
+                if not count:
+                    break
+                hasher.update(view[:count])
+                dst.write(view[:count])
+        if hasher.hexdigest() != sha256:
+            os.remove(tmp_path)
+            logger.warning(f"Cached blob {sha256} is corrupt; it will be downloaded again")
+            self.discard_blob(sha256)
+            return False
+        os.replace(tmp_path, dest_path)
+        return True
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def fetch(self, url: str, dest_path: Optional[str] = None, cancel: Optional[threading.Event] = None) -> bool:
+        """Place the package for url at dest_path, downloading only when the origin copy changed.
+
+        Without dest_path the package is only brought into the cache. Fetches of
+        the same URL run one at a time (they share the download temp file); the
+        later one then finds the package already cached.
+        """
+        with self._url_lock(url):
+            return self._fetch(url, dest_path, cancel or current_cancel())
+
+    def _fetch(self, url: str, dest_path: Optional[str], cancel: Optional[threading.Event]) -> bool:
+        entry = self.lookup(url)
+        if entry and time.time() - entry.get('checked', 0) < CONSTANTS['CACHE_REVALIDATE_SECONDS']:
+            print("Using cached package (recently verified).", file=current_output())
+            self.touch(url)
+            if not dest_path or self.materialize(entry['sha256'], dest_path):
+                return True
+            entry = None
+
+        tmp_path = os.path.join(self.root, f"download-{hashlib.sha256(url.encode()).hexdigest()[:16]}.tmp")
+        result = fetch_from_peers(url, tmp_path, entry, cancel)
+        if result is None and entry:
+            result = fetch_delta(url, self.object_path(entry['sha256']), entry['sha256'], tmp_path, cancel)
+        if result is None:
+            result = fetch_file(url, tmp_path, conditional_headers=self.conditional_headers(entry), cancel=cancel)
+        if not result.ok:
+            return False
+
+        if result.not_modified and entry:
+            print("Cached package is up to date; nothing downloaded.", file=current_output())
+            self.touch(url, revalidated=True)
+            if not dest_path or self.materialize(entry['sha256'], dest_path):
+                return True
+        if result.not_modified:
+            # 304 without a usable cached copy: fetch unconditionally.
+            result = fetch_file(url, tmp_path, cancel=cancel)
+            if not result.ok or result.not_modified:
+                return False
+
+        logger.info(f"Cached {url} as {result.sha256} ({result.size} bytes)")
+        self.store(url, tmp_path, result)
+        return not dest_path or self.materialize(result.sha256, dest_path)
+
+_package_cache: Optional[PackageCache] = None
+
+def get_package_cache() -> PackageCache:
+    """Return the process-wide package cache under autoSetup/cache."""
+    global _package_cache
+    if _package_cache is None:
+        _package_cache = PackageCache(os.path.join(get_auto_setup_dir(), "cache"))
+    return _package_cache
+
+def pin_package(name: str, pinned: bool = True) -> bool:
+    """Protect (or release) a package from cache eviction, by URLS key (e.g. HP_SUPPORT) or URL."""
+    url = URLS.get(name.upper(), name)
+    if not re.match(r'(?i)https?://', url):
+        print(f"✗ Unknown package '{name}'. Use a URL or one of: {', '.join(URLS)}")
+        return False
+    get_package_cache().pin(url, pinned)
+    print(f"✓ {'Pinned' if pinned else 'Unpinned'}: {url}")
+    return True
+
+# ---------------------------
+# LAN peer cache
+# ---------------------------
+
+_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+_PEER_BEACON = b"TTAS-PEER?"
+
+class PeerCacheServer:
+    """Serve a PackageCache to other machines on the LAN.
+
+    `GET /lookup?url=<origin url>` returns the index entry (hash, size and origin
+    validators) and `GET /objects/<sha256>` returns the blob, honouring Range so
+    peers can use segmented downloads. A UDP responder answers discovery beacons
+    with the HTTP port.
+
+    Both listen on the LAN interface only (`host` defaults to the address of the
+    outbound interface), never on every interface. There is no authentication:
+    the cache holds public vendor installers, and clients only accept a copy
+    whose hash matches the patch manifest or the origin.
+    """
+
+    def __init__(self, cache: PackageCache, port: Optional[int] = None, host: Optional[str] = None,
+                 discovery_port: Optional[int] = None) -> None:
+        import http.server
+        from urllib.parse import parse_qs
+
+        if host is None:
+            host = get_network_info().get('local_ip')
+            if not host:
+                raise OSError("no LAN interface address found")
+        self.host = host
+        self.cache = cache
+        self.requests_served = 0
+        self.bytes_served = 0
+        self._stats_lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(f"Peer cache {self.client_address[0]}: {format % args}")
+
+            def _send_json(self, status: int, payload: Dict) -> None:
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_object(self, sha256: str, with_body: bool) -> None:
+                blob = server.cache.object_path(sha256)
+                try:
+                    f = open(blob, 'rb')
+                except OSError:
+                    self._send_json(404, {'error': 'not cached'})
+                    return
+                with f:
+                    size = os.fstat(f.fileno()).st_size
+                    start, end = 0, size - 1
+                    match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+                    if match and int(match.group(1)) < size:
+                        start = int(match.group(1))
+                        end = min(int(match.group(2)), size - 1) if match.group(2) else end
+                        self.send_response(206)
+                        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+                    else:
+                        self.send_response(200)
+                    self.send_header('Accept-Ranges', 'bytes')
+                    self.send_header('ETag', f'"{sha256}"')
+                    self.send_header('Content-Length', str(end - start + 1))
+                    self.end_headers()
+                    if not with_body:
+                        return
+                    f.seek(start)
+                    remaining = end - start + 1
+                    buffer = bytearray(CONSTANTS['DOWNLOAD_MAX_CHUNK'])
+                    view = memoryview(buffer)
+                    while remaining > 0:
+                        count = f.readinto(view[:min(remaining, len(buffer))])
+                        if not count:
+                            break
+                        self.wfile.write(view[:count])
+                        remaining -= count
+                        server._count(0, count)
+
+            def _route(self, with_body: bool) -> None:
+                server._count(1, 0)
+                parts = urlsplit(self.path)
+                if parts.path == '/lookup':
+                    url = parse_qs(parts.query).get('url', [''])[0]
+                    entry = server.cache.lookup(url) if url else None
+                    if entry:
+                        self._send_json(200, {key: entry.get(key, '') for key in
+                                              ('sha256', 'size', 'etag', 'last_modified')})
+                    else:
+                        self._send_json(404, {'error': 'not cached'})
+                elif parts.path.startswith('/objects/') and _SHA256_PATTERN.match(parts.path[9:]):
+                    self._send_object(parts.path[9:], with_body)
+                else:
+                    self._send_json(404, {'error': 'unknown path'})
+
+            def do_HEAD(self) -> None:
+                self._route(False)
+
+            def do_GET(self) -> None:
+                self._route(True)
+
+        port = CONSTANTS['PEER_CACHE_PORT'] if port is None else port
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+        discovery_port = CONSTANTS['PEER_DISCOVERY_PORT'] if discovery_port is None else discovery_port
+        self.beacon = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.beacon.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.beacon.bind((host, discovery_port))
+        self.discovery_port = self.beacon.getsockname()[1]
+        self._threads = [threading.Thread(target=self.httpd.serve_forever, daemon=True),
+                         threading.Thread(target=self._answer_beacons, daemon=True)]
+
+    def _count(self, requests_served: int, bytes_served: int) -> None:
+        with self._stats_lock:
+            self.requests_served += requests_served
+            self.bytes_served += bytes_served
+
+    def _answer_beacons(self) -> None:
+        while True:
+            try:
+                data, address = self.beacon.recvfrom(512)
+            except OSError:
+                return
+            if data == _PEER_BEACON:
+                with contextlib.suppress(OSError):
+                    self.beacon.sendto(f"TTAS-PEER {self.port}".encode('ascii'), address)
+
+    def start(self) -> 'PeerCacheServer':
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.beacon.close()
+
+def discover_peers(timeout: Optional[float] = None, address: Optional[Tuple[str, int]] = None) -> List[str]:
+    """Broadcast a discovery beacon and return 'host:port' for every peer cache that answers."""
+    timeout = CONSTANTS['PEER_TIMEOUT'] if timeout is None else timeout
+    address = address or ('255.255.255.255', CONSTANTS['PEER_DISCOVERY_PORT'])
+    peers: List[str] = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        try:
+            sock.sendto(_PEER_BEACON, address)
+        except OSError as e:
+            logger.warning(f"Peer discovery failed: {e}")
+            return peers
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, (host, _) = sock.recvfrom(512)
+            except (socket.timeout, OSError):
+                break
+            match = re.match(rb'TTAS-PEER (\d+)$', data)
+            if match and f"{host}:{int(match.group(1))}" not in peers:
+                peers.append(f"{host}:{int(match.group(1))}")
+    logger.info(f"Discovered peer caches: {', '.join(peers) or 'none'}")
+    return peers
+
+_discovered_peers: Optional[List[str]] = None
+
+def cache_peers() -> List[str]:
+    """Configured peers followed by (once per run) any discovered on the LAN."""
+    global _discovered_peers
+    peers = list(CONSTANTS['PEER_CACHE_PEERS'])
+    if CONSTANTS['PEER_DISCOVERY']:
+        if _discovered_peers is None:
+            _discovered_peers = discover_peers()
+        peers += [peer for peer in _discovered_peers if peer not in peers]
+    return peers
+
+def _header_sha256(headers) -> Optional[str]:
+    """SHA-256 from a Repr-Digest (RFC 9530) or Digest (RFC 3230) response header, if any."""
+    for name in ('repr-digest', 'digest'):
+        for item in headers.get(name, '').split(','):
+            algorithm, _, value = item.strip().partition('=')
+            if algorithm.lower() != 'sha-256':
+                continue
+            try:
+                digest = base64.b64decode(value.strip().strip(':'), validate=True)
+            except ValueError:
+                continue
+            if len(digest) == 32:
+                return digest.hex()
+    return None
+
+def trusted_package_sha256(session, url: str) -> Optional[str]:
+    """SHA-256 of url's current package from a source other than a peer, or None.
+
+    The patch manifest entry wins; otherwise the origin must announce the hash in a
+    digest header. A peer's own claim is never enough to trust its copy.
+    """
+    package = load_patch_manifest().get('packages', {}).get(url, {})
+    if _SHA256_PATTERN.match(str(package.get('sha256', '')).lower()):
+        return package['sha256'].lower()
+    try:
+        probe = session.head(url, allow_redirects=True, timeout=CONSTANTS['PEER_TIMEOUT'],
+                             headers={'Want-Repr-Digest': 'sha-256=10', 'Want-Digest': 'SHA-256'})
+    except requests.RequestException as e:
+        logger.info(f"Origin unreachable ({e}); cannot verify a peer copy of {url}")
+        return None
+    if not probe.ok:
+        logger.info(f"Origin answered HTTP {probe.status_code}; cannot verify a peer copy of {url}")
+        return None
+    return _header_sha256(probe.headers)
+
+def fetch_from_peers(url: str, tmp_path: str, local_entry: Optional[Dict] = None,
+                     cancel: Optional[threading.Event] = None) -> Optional[DownloadResult]:
+    """Try to fetch url's package from a LAN peer cache into tmp_path.
+
+    Peer copies are only used when trusted_package_sha256 supplies the expected
+    hash independently of the peer. Returns None when no peer holds a copy with
+    that hash (the caller then goes to the origin). When `local_entry` already
+    has that hash the result is `not_modified` and nothing is downloaded.
+    """
+    peers = cache_peers()
+    if not peers:
+        return None
+    from urllib.parse import quote
+
+    session = requests.Session()
+    expected = trusted_package_sha256(session, url)
+    if expected is None:
+        logger.warning(f"No trusted hash for {url} (set TTAS_PATCH_MANIFEST, see --write-manifest); "
+                       f"skipping LAN peers")
+        return None
+    for peer in peers:
+        try:
+            response = session.get(f"http://{peer}/lookup?url={quote(url, safe='')}",
+                                   timeout=CONSTANTS['PEER_TIMEOUT'])
+            if response.status_code != 200:
+                continue
+            entry = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.info(f"Peer {peer} unavailable: {e}")
+            continue
+        if entry.get('sha256') != expected:
+            logger.info(f"Peer {peer} holds a different version of {url}")
+            continue
+        validators = {'etag': entry.get('etag', ''), 'last_modified': entry.get('last_modified', '')}
+        if local_entry and local_entry['sha256'] == entry['sha256']:
+            return DownloadResult(True, not_modified=True)
+
+        print(f"Fetching package from LAN peer {peer}...", file=current_output())
+        result = fetch_file(f"http://{peer}/objects/{entry['sha256']}", tmp_path, cancel=cancel)
+        if cancel is not None and cancel.is_set():
+            return DownloadResult(False)
+        if result.ok and result.sha256 == expected and result.size == entry.get('size'):
+            logger.info(f"Fetched {url} from peer {peer} ({result.size} bytes, hash verified)")
+            return DownloadResult(True, size=result.size, sha256=result.sha256, **validators)
+        logger.warning(f"Peer {peer} copy of {url} failed verification; discarding")
+        print(f"✗ Peer {peer} copy failed verification", file=current_output())
+        discard_partial_download(tmp_path)
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+    return None
+
+def serve_package_cache(port: Optional[int] = None) -> None:
+    """Share this machine's package cache with LAN peers until Ctrl+C."""
+    print_separator("PEER CACHE SERVER")
+    cache = get_package_cache()
+    try:
+        server = PeerCacheServer(cache, port).start()
+    except OSError as e:
+        logger.error(f"Cannot start peer cache server: {e}")
+        print(f"✗ Cannot start peer cache server: {e}")
+        return
+    print(f"Serving {len(cache._index['entries'])} cached package(s) at http://{server.host}:{server.port}/")
+    print(f"Other machines: set TTAS_PEERS={server.host}:{server.port} or TTAS_PEER_DISCOVERY=1, "
+          f"plus TTAS_PATCH_MANIFEST to a manifest written with --write-manifest")
+    print("Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    print(f"\n✓ Served {server.requests_served} request(s), {server.bytes_served / (1024 * 1024):.1f}MB")
+
+def write_package_manifest(path: str) -> bool:
+    """Record the hash and size of every cached package in the manifest at path.
+
+    Run on a machine whose cache was filled from the origin and publish the file
+    on a share; clients that point TTAS_PATCH_MANIFEST at it trust peer copies
+    with those hashes. Patch entries already in the manifest are kept.
+    """
+    cache = get_package_cache()
+    with cache._lock:
+        entries = {url: dict(entry) for url, entry in cache._index['entries'].items()}
+    manifest: Dict = {}
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        packages = manifest.setdefault('packages', {})
+        for url, entry in entries.items():
+            packages.setdefault(url, {}).update({'sha256': entry['sha256'], 'size': entry['size']})
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError) as e:
+        print(f"✗ Could not write manifest {path}: {e}")
+        return False
+    print(f"✓ Manifest {path} lists {len(entries)} cached package(s)")
+    return True
+
+# ---------------------------
+# Binary delta patches
+# ---------------------------
+
+# Patch file: PATCH_MAGIC, old size, new size and new SHA-256, then a zlib stream of
+# operations: b'C' + offset/length (copy from the old file) or b'I' + length + bytes.
+PATCH_MAGIC = b"TTDELTA1"
+_PATCH_HEADER = struct.Struct('<8sQQ32s')
+_PATCH_COPY = struct.Struct('<QI')
+_PATCH_INSERT = struct.Struct('<I')
+_GEAR = random.Random(0x7474).choices(range(1 << 32), k=256)
+
+def content_chunks(f) -> Iterator[Tuple[int, bytes]]:
+    """Split a stream into content-defined chunks (gear rolling hash), yielding (offset, chunk).
+
+    Boundaries depend only on nearby bytes, so an insertion early in a file
+    leaves the chunks after it unchanged and matchable.
+    """
+    minimum, maximum = CONSTANTS['PATCH_MIN_CHUNK'], CONSTANTS['PATCH_MAX_CHUNK']
+    mask = (1 << CONSTANTS['PATCH_CHUNK_BITS']) - 1
+    buffer = bytearray()
+    position = offset = 0
+    eof = False
+    while True:
+        if len(buffer) - position < maximum and not eof:
+            del buffer[:position]
+            position = 0
+            data = f.read(1024 * 1024)
+            eof = not data
+            buffer += data
+            continue
+        available = len(buffer) - position
+        if not available:
+            return
+        cut = min(available, maximum)
+        if available > minimum:
+            h = 0
+            for i, byte in enumerate(buffer[position + minimum:position + cut], minimum):
+                h = ((h << 1) + _GEAR[byte]) & 0xFFFFFFFF
+                if not h & mask:
+                    cut = i + 1
+                    break
+        yield offset, bytes(buffer[position:position + cut])
+        position += cut
+        offset += cut
+
+def make_patch(old_path: str, new_path: str, patch_path: str) -> Dict[str, int]:
+    """Write a patch turning old_path into new_path; return byte counts copied and inserted."""
+    index: Dict[bytes, int] = {}
+    with open(old_path, 'rb') as f:
+        for offset, chunk in content_chunks(f):
+            index.setdefault(hashlib.blake2b(chunk, digest_size=16).digest(), offset)
+
+    stats = {'copied': 0, 'inserted': 0}
+    new_hash = hashlib.sha256()
+    compressor = zlib.compressobj(6)
+    tmp_path = patch_path + '.tmp'
+    with open(new_path, 'rb') as fnew, open(tmp_path, 'wb') as out:
+        out.write(_PATCH_HEADER.pack(PATCH_MAGIC, os.path.getsize(old_path), os.path.getsize(new_path), bytes(32)))
+        copy: Optional[List[int]] = None
+        literal = bytearray()
+
+        def flush() -> None:
+            nonlocal copy
+            if copy:
+                out.write(compressor.compress(b'C' + _PATCH_COPY.pack(*copy)))
+                stats['copied'] += copy[1]
+                copy = None
+            if literal:
+                out.write(compressor.compress(b'I' + _PATCH_INSERT.pack(len(literal)) + literal))
+                stats['inserted'] += len(literal)
+                literal.clear()
+
+        for _, chunk in content_chunks(fnew):
+            new_hash.update(chunk)
+            source = index.get(hashlib.blake2b(chunk, digest_size=16).digest())
+            if source is not None:
+                if copy and copy[0] + copy[1] == source and not literal:
+                    copy[1] += len(chunk)
+                else:
+                    flush()
+                    copy = [source, len(chunk)]
+            else:
+                if copy:
+                    flush()
+                literal += chunk
+                if len(literal) >= 1024 * 1024:
+                    flush()
+        flush()
+        out.write(compressor.flush())
+        out.seek(0)
+        out.write(_PATCH_HEADER.pack(PATCH_MAGIC, os.path.getsize(old_path), os.path.getsize(new_path),
+                                     new_hash.digest()))
+    os.replace(tmp_path, patch_path)
+    return stats
+
+class _InflatingReader:
+    """Read exact byte counts from a zlib stream while holding at most a few blocks in memory."""
+
+    def __init__(self, f) -> None:
+        self._f = f
+        self._inflater = zlib.decompressobj()
+        self._buffer = bytearray()
+
+    def read(self, count: int) -> bytes:
+        while len(self._buffer) < count:
+            if self._inflater.unconsumed_tail:
+                data = self._inflater.unconsumed_tail
+            else:
+                data = self._f.read(64 * 1024)
+                if not data:
+                    break
+            try:
+                self._buffer += self._inflater.decompress(data, max(count - len(self._buffer), 64 * 1024))
+            except zlib.error as e:
+                raise ValueError(f"Corrupt patch data: {e}") from e
+        chunk = bytes(self._buffer[:count])
+        del self._buffer[:count]
+        return chunk
+
+def apply_patch(old_path: str, patch_path: str, out_path: str) -> Tuple[int, str]:
+    """Rebuild the new file from old_path and a patch, streaming; return (size, sha256).
+
+    Raises ValueError when the patch is malformed, made for a different base,
+    or does not reproduce the hash recorded in it.
+    """
+    tmp_path = out_path + '.tmp'
+    try:
+        written, sha256 = _apply_patch(old_path, patch_path, tmp_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, out_path)
+    return written, sha256
+
+def _apply_patch(old_path: str, patch_path: str, out_path: str) -> Tuple[int, str]:
+    hasher = hashlib.sha256()
+    written = 0
+    with open(patch_path, 'rb') as fpatch, open(old_path, 'rb') as fold, open(out_path, 'wb') as out:
+        magic, old_size, new_size, expected = _PATCH_HEADER.unpack(fpatch.read(_PATCH_HEADER.size))
+        if magic != PATCH_MAGIC:
+            raise ValueError("Not a delta patch")
+        if os.fstat(fold.fileno()).st_size != old_size:
+            raise ValueError("Patch was made for a different base file")
+        reader = _InflatingReader(fpatch)
+        buffer = bytearray(CONSTANTS['COPY_CHUNK_SIZE'])
+        view = memoryview(buffer)
+        while True:
+            op = reader.read(1)
+            if not op:
+                break
+            if op == b'C':
+                offset, length = _PATCH_COPY.unpack(reader.read(_PATCH_COPY.size))
+                if offset + length > old_size:
+                    raise ValueError("Patch copies beyond the end of the base file")
+                fold.seek(offset)
+                while length:
+                    count = fold.readinto(view[:min(length, len(buffer))])
+                    out.write(view[:count])
+                    hasher.update(view[:count])
+                    written += count
+                    length -= count
+            elif op == b'I':
+                (length,) = _PATCH_INSERT.unpack(reader.read(_PATCH_INSERT.size))
+                data = reader.read(length)
+                if len(data) != length:
+                    raise ValueError("Patch ends inside an insert")
+                out.write(data)
+                hasher.update(data)
+                written += length
+            else:
+                raise ValueError(f"Unknown patch operation {op!r}")
+    if written != new_size or hasher.digest() != expected:
+        raise ValueError("Patched file does not match the hash recorded in the patch")
+    return written, hasher.hexdigest()
+
+def load_patch_manifest(location: Optional[str] = None) -> Dict:
+    """Load the patch manifest (URL or local path, default PATCH_MANIFEST); {} when absent.
+
+    Format: {"packages": {"<package url>": {"sha256": ..., "size": ...,
+    "patches": [{"from": "<old sha256>", "url": "<patch url or path>", "sha256": ...}]}}}
+    """
+    location = location or CONSTANTS['PATCH_MANIFEST']
+    if not location:
+        return {}
+    try:
+        if location.startswith(('http://', 'https://')):
+            response = requests.get(location, timeout=CONSTANTS['PEER_TIMEOUT'])
+            response.raise_for_status()
+            manifest = response.json()
+        else:
+            with open(location, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+    except (requests.RequestException, OSError, ValueError) as e:
+        logger.warning(f"Patch manifest unavailable ({location}): {e}")
+        return {}
+    manifest['_location'] = location
+    return manifest
+
+def _fetch_patch(location: str, patch_path: str, cancel: Optional[threading.Event]) -> Optional[str]:
+    """Download (or copy, for local paths) a patch; return its SHA-256, or None on failure."""
+    if location.startswith(('http://', 'https://')):
+        result = fetch_file(location, patch_path, cancel=cancel)
+        return result.sha256 if result.ok and not result.not_modified else None
+    try:
+        shutil.copyfile(location, patch_path)
+        return _file_sha256(patch_path)
+    except OSError as e:
+        logger.warning(f"Could not read patch {location}: {e}")
+        return None
+
+def fetch_delta(url: str, base_path: str, base_sha256: str, tmp_path: str,
+                cancel: Optional[threading.Event] = None) -> Optional[DownloadResult]:
+    """Build url's new version at tmp_path from the cached base plus a patch offered by the manifest.
+
+    Returns None (the caller downloads the full package) when there is no
+    manifest, no patch from this base, or anything fails to verify.
+    """
+    manifest = load_patch_manifest()
+    package = manifest.get('packages', {}).get(url)
+    if not package or package.get('sha256') == base_sha256:
+        return None
+    patch = next((p for p in package.get('patches', []) if p.get('from') == base_sha256), None)
+    if not patch:
+        return None
+
+    location = patch['url']
+    base_location = manifest['_location']
+    if not location.startswith(('http://', 'https://')):
+        if base_location.startswith(('http://', 'https://')):
+            from urllib.parse import urljoin
+            location = urljoin(base_location, location)
+        else:
+            location = os.path.join(os.path.dirname(os.path.abspath(base_location)), location)
+
+    patch_path = tmp_path + '.patch'
+    try:
+        with tracer.span(f"delta {url}", 'download', url=url, patch=location) as span_attrs:
+            print("Fetching delta patch against the cached version...", file=current_output())
+            digest = _fetch_patch(location, patch_path, cancel)
+            if digest is None or (patch.get('sha256') and digest != patch['sha256']):
+                raise ValueError("patch download failed or its hash does not match the manifest")
+            size, sha256 = apply_patch(base_path, patch_path, tmp_path)
+            if sha256 != package.get('sha256'):
+                raise ValueError("patched package hash does not match the manifest")
+            patch_size = os.path.getsize(patch_path)
+            span_attrs.update(patch_bytes=patch_size, bytes=size)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Delta update of {url} failed, downloading the full package: {e}")
+        print(f"✗ Delta update failed ({e}); downloading the full package", file=current_output())
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        return None
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(patch_path)
+
+    validators = {'etag': '', 'last_modified': ''}
+    with contextlib.suppress(requests.RequestException):
+        probe = requests.head(url, allow_redirects=True, timeout=CONSTANTS['DOWNLOAD_TIMEOUT'])
+        if probe.ok:
+            validators = _validators(probe)
+    print(f"✓ Rebuilt {size / (1024 * 1024):.1f}MB package from a {patch_size / (1024 * 1024):.1f}MB delta patch",
+          file=current_output())
+    logger.info(f"Applied delta patch to {url}: {size} bytes, sha256 {sha256}")
+    return DownloadResult(True, size=size, sha256=sha256, **validators)
+
+# ---------------------------
+# Support Assistant installer
+# ---------------------------
+
+def support_package_url(manufacturer: str) -> Tuple[str, str]:
+    """Return (vendor label, Support Assistant package URL) for a manufacturer string."""
+    if "dell" in manufacturer:
+        return "Dell", URLS['DELL_SUPPORT']
+    if "lenovo" in manufacturer:
+        return "Lenovo", URLS['LENOVO_SUPPORT']
+    return "HP/Generic", URLS['HP_SUPPORT']
+
+class SupportPrefetch:
+    """Opt-in warm-up started with the menu: resolve the OEM package, probe connectivity and
+    download the Support Assistant into the package cache while the user is still choosing.
+
+    Its download messages go to its own buffer (output_scope on the prefetch
+    thread) so they never draw over the menu. Option 1 or 2 then finds the
+    package cached, or waits for the download already in flight.
+    """
+
+    def __init__(self) -> None:
+        self.cancelled = threading.Event()
+        self.url: Optional[str] = None
+        self.status = "starting"
+        self._output = io.StringIO()
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+
+    @property
+    def output(self) -> str:
+        return self._output.getvalue()
+
+    def start(self) -> 'SupportPrefetch':
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            with output_scope(self._output), \
+                    tracer.span("prefetch support assistant", 'prefetch') as span_attrs:
+                _, self.url = support_package_url(get_system_facts().manufacturer)
+                if not check_internet_connection():
+                    self.status = "offline"
+                elif self.cancelled.is_set():
+                    self.status = "cancelled"
+                else:
+                    self.status = "downloading"
+                    ok = get_package_cache().fetch(self.url, cancel=self.cancelled)
+                    self.status = "ready" if ok else ("cancelled" if self.cancelled.is_set() else "failed")
+                span_attrs['status'] = self.status
+        except Exception as e:
+            self.status = "failed"
+            logger.warning(f"Background prefetch failed: {e}")
+        finally:
+            logger.info(f"Background prefetch {self.status}: {self.url}")
+
+    def wait_for(self, url: str) -> None:
+        """Block until an in-flight prefetch of url finishes, showing how long we have waited."""
+        if url != self.url and self.url is not None:
+            return
+        started = time.monotonic()
+        while self._thread.is_alive():
+            print(f"\rWaiting for the background download to finish... {time.monotonic() - started:.0f}s",
+                  end='', flush=True)
+            self._thread.join(CONSTANTS['PROGRESS_INTERVAL'])
+        if time.monotonic() - started > CONSTANTS['PROGRESS_INTERVAL']:
+            print()
+
+    def cancel(self, timeout: float = 2.0) -> None:
+        """Stop the download; its partial data stays resumable."""
+        self.cancelled.set()
+        self._thread.join(timeout)
+
+_prefetch: Optional[SupportPrefetch] = None
+
+def start_prefetch() -> None:
+    global _prefetch
+    if _prefetch is None:
+        _prefetch = SupportPrefetch().start()
+
+def stop_prefetch() -> None:
+    global _prefetch
+    if _prefetch is not None:
+        _prefetch.cancel()
+        _prefetch = None
+
+def install_support_assistant(facts: Optional[SystemFacts] = None) -> bool:
+    """Download and open the Support Assistant installer (OEM-dependent); True once it is downloaded."""
+    print_separator("SUPPORT ASSISTANT INSTALLER")
+
+    if not check_internet_connection():
+        print("No internet connection. Please check your network and try again.")
+        print_separator()
+        return False
+
+    print("Downloading and preparing Support Assistant...")
+
+    try:
+        vendor, url = support_package_url((facts or get_system_facts()).manufacturer)
+        print(f"{vendor} system detected. Downloading {vendor.split('/')[0]} Support Assistant package...")
+
+        download_path = os.path.join(get_auto_setup_dir(), "Support_Assistant.exe")
+        if _prefetch is not None:
+            _prefetch.wait_for(url)
+
+        print("Starting download...")
+        if get_package_cache().fetch(url, download_path):
+            if not CONSTANTS['INTERACTIVE']:
+                print(f"\nDownload completed: {download_path}")
+                print_separator()
+                return True
+            print("\nDownload completed. Opening download folder...")
+            try:
+                folder_path = os.path.dirname(download_path)
+                subprocess.run(['explorer', folder_path], check=True)
+            except Exception as e:
+                logger.warning(f"Could not open Explorer: {e}")
+                print(f"Could not open Explorer: {e}")
+                print(f"File path: {download_path}")
+                print("Please navigate to the folder and run the installer manually.")
+            print_separator()
+            return True
+        print("Download failed.")
+
+    except Exception as e:
+        logger.error(f"Support Assistant install error: {e}")
+        print(f"Support Assistant install error: {e}")
 
     print_separator()
+    return False
 
 # ---------------------------
 # SCCM client cycles
@@ -345,250 +2917,2036 @@ def check_sccm_service() -> bool:
         logger.warning(f"SCCM service check error: {e}")
         return False
 
-def trigger_single_cycle(cycle_name: str, cycle_id: str) -> bool:
-    """Trigger a single SCCM client schedule cycle."""
+@dataclass
+class CycleResult:
+    """Structured outcome of one TriggerSchedule call."""
+    name: str
+    cycle_id: str
+    ok: bool
+    method: str
+    error: str = ""
+    duration: float = 0.0
+
+_BATCH_TRIGGER_SCRIPT = """
+$client = [wmiclass]'root\\ccm:SMS_Client'
+$out = foreach ($id in @(%s)) {
+    $sw = [Diagnostics.Stopwatch]::StartNew()
+    try {
+        $rv = [int]$client.TriggerSchedule($id).ReturnValue
+        $err = if ($rv -eq 0) { '' } else { "ReturnValue $rv" }
+        [pscustomobject]@{ id = $id; ok = ($rv -eq 0); error = $err; ms = $sw.ElapsedMilliseconds }
+    } catch {
+        [pscustomobject]@{ id = $id; ok = $false; error = $_.Exception.Message; ms = $sw.ElapsedMilliseconds }
+    }
+}
+ConvertTo-Json -InputObject @($out) -Compress
+"""
+
+def _trigger_cycles_wmi(cycles: Dict[str, str]) -> List[CycleResult]:
+    """Invoke every TriggerSchedule over one in-process WMI connection (no child processes)."""
+    import pythoncom
+    pythoncom.CoInitialize()
     try:
-        wmic_command = f'wmic /namespace:\\\\root\\ccm path sms_client CALL TriggerSchedule "{cycle_id}"'
-        result = safe_subprocess_run(wmic_command, timeout=CONSTANTS['WMIC_TIMEOUT'])
+        client = wmi.WMI(namespace=r"root\ccm").SMS_Client
+        results: List[CycleResult] = []
+        for name, cycle_id in cycles.items():
+            started = time.perf_counter()
+            with tracer.span(f"TriggerSchedule {name}", 'wmi', cycle_id=cycle_id) as span_attrs:
+                try:
+                    # The wmi module returns the out parameters as a tuple: (ReturnValue,).
+                    outcome = client.TriggerSchedule(cycle_id)
+                    return_value = outcome[0] if isinstance(outcome, tuple) and outcome else outcome
+                    ok = return_value == 0
+                    results.append(CycleResult(name, cycle_id, ok, "wmi", "" if ok else f"ReturnValue {return_value}",
+                                               time.perf_counter() - started))
+                except Exception as e:
+                    results.append(CycleResult(name, cycle_id, False, "wmi", str(e), time.perf_counter() - started))
+                span_attrs['exit_code'] = 0 if results[-1].ok else 1
+        return results
+    finally:
+        pythoncom.CoUninitialize()
 
-        if result.returncode == 0 and "ReturnValue = 0" in result.stdout:
-            return True
+def _trigger_cycles_powershell(cycles: Dict[str, str]) -> List[CycleResult]:
+    """Invoke every TriggerSchedule from a single PowerShell session and parse its JSON report."""
+    ids = ", ".join(f"'{cycle_id}'" for cycle_id in cycles.values())
+    script = _BATCH_TRIGGER_SCRIPT % ids
+    encoded = base64.b64encode(script.encode('utf-16-le')).decode('ascii')
+    result = safe_subprocess_run(f'powershell -NoProfile -NonInteractive -EncodedCommand {encoded}',
+                                 timeout=CONSTANTS['WMIC_TIMEOUT'] * max(1, len(cycles)))
+    if result.returncode != 0 or not result.stdout.strip():
+        raise RuntimeError(result.stderr.strip() or f"PowerShell exited with {result.returncode}")
 
-        ps_command = f'powershell -Command "Invoke-WmiMethod -Namespace root\\ccm -Class SMS_CLIENT -Name TriggerSchedule -ArgumentList \\"{cycle_id}\\""'
-        alt_result = safe_subprocess_run(ps_command, timeout=CONSTANTS['WMIC_TIMEOUT'])
-        return alt_result.returncode == 0
+    names = {cycle_id: name for name, cycle_id in cycles.items()}
+    return [
+        CycleResult(names.get(item['id'], item['id']), item['id'], bool(item['ok']), "powershell",
+                    item.get('error') or "", (item.get('ms') or 0) / 1000)
+        for item in json.loads(result.stdout)
+    ]
 
-    except subprocess.TimeoutExpired:
-        logger.warning(f"SCCM cycle timeout: {cycle_name}")
-        return False
+def trigger_cycles_batched(cycles: Dict[str, str]) -> List[CycleResult]:
+    """Trigger cycles in one WMI session (in-process, else one PowerShell process).
+
+    A cycle counts as triggered only when TriggerSchedule returns 0. Failed
+    cycles are retried once after CYCLE_SLEEP_TIME, the only place a pause
+    helps: the client rejects triggers while it is busy. When neither backend
+    can open a session every cycle is reported failed; there is no per-cycle
+    process fallback.
+    """
+    results: List[CycleResult] = []
+    error = ""
+    for backend in (_trigger_cycles_wmi, _trigger_cycles_powershell):
+        try:
+            results = backend(cycles)
+            break
+        except Exception as e:
+            logger.warning(f"Batched SCCM trigger via {backend.__name__} unavailable: {e}")
+            error = str(e)
+
+    if not results:
+        return [CycleResult(name, cycle_id, False, "none", error or "no WMI session")
+                for name, cycle_id in cycles.items()]
+
+    failed = {r.name: r.cycle_id for r in results if not r.ok}
+    if failed:
+        time.sleep(CONSTANTS['CYCLE_SLEEP_TIME'])
+        retried = {r.cycle_id: r for r in _retry_cycles_batched(failed, results[0].method)}
+        results = [retried.get(r.cycle_id, r) if not r.ok else r for r in results]
+    return results
+
+def _retry_cycles_batched(cycles: Dict[str, str], method: str) -> List[CycleResult]:
+    """Single attempt with a known-working batch backend (used for the retry pass)."""
+    try:
+        return _trigger_cycles_wmi(cycles) if method == "wmi" else _trigger_cycles_powershell(cycles)
     except Exception as e:
-        logger.error(f"SCCM cycle trigger error - {cycle_name}: {e}")
-        return False
+        logger.warning(f"SCCM retry batch failed: {e}")
+        return []
+
+_CMTRACE_RECORD = re.compile(r'<!\[LOG\[(.*?)\]LOG\]!><([^>]*)>', re.S)
+
+class LogTailer:
+    """Incremental reader for one client log: returns only records appended since the saved offset.
+
+    CMTrace records (`<![LOG[...]LOG]!><time=... date=...>`) may span several
+    lines and are returned whole; other files are read line by line. The format
+    is decided once per file from its first bytes, so a read that happens to
+    hold only the tail of a record is never parsed as plain lines. When the
+    client rotates the log (renames it to .lo_ and starts a new file) the new
+    file is read from the start; rotation is recognised by file identity, not
+    only by the file getting shorter.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.offset = 0
+        self._identity: Optional[Tuple] = None
+        self._cmtrace: Optional[bool] = None
+        self._partial = ""
+        # UTF-8 sequences can be split across reads; the decoder keeps the incomplete bytes.
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    @staticmethod
+    def _file_identity(stat: os.stat_result) -> Tuple:
+        # st_ino is 0 on filesystems without file IDs; on Windows st_ctime is then the creation time.
+        return (stat.st_dev, stat.st_ino or getattr(stat, 'st_birthtime', stat.st_ctime))
+
+    def _restart(self, stat: Optional[os.stat_result], offset: int) -> None:
+        self.offset = offset
+        self._identity = self._file_identity(stat) if stat else None
+        self._cmtrace = None
+        self._partial = ""
+        self._decoder.reset()
+
+    def _detect_cmtrace(self) -> bool:
+        with open(self.path, 'rb') as f:
+            return b'<![LOG[' in f.read(4096)
+
+    def seek_end(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self._restart(None, 0)
+            return
+        self._restart(stat, stat.st_size)
+
+    def read_records(self) -> List[Tuple[str, Optional[float]]]:
+        """Return (message, timestamp or None) for each complete record appended since the last call."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return []
+        if self._file_identity(stat) != self._identity or stat.st_size < self.offset:
+            self._restart(stat, 0)
+        if stat.st_size == self.offset:
+            return []
+        if self._cmtrace is None:
+            self._cmtrace = self._detect_cmtrace()
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        self.offset += len(data)
+        text = self._partial + self._decoder.decode(data)
+
+        records: List[Tuple[str, Optional[float]]] = []
+        if self._cmtrace:
+            end = 0
+            for match in _CMTRACE_RECORD.finditer(text):
+                records.append((match.group(1), _cmtrace_timestamp(match.group(2))))
+                end = match.end()
+            self._partial = text[end:]
+        else:
+            lines = text.split('\n')
+            self._partial = lines.pop()
+            records = [(line.rstrip('\r'), None) for line in lines]
+        return records
+
+def _cmtrace_timestamp(attributes: str) -> Optional[float]:
+    """Epoch seconds from a CMTrace record's local time="HH:MM:SS.mmm+bias" date="MM-DD-YYYY"."""
+    match = re.search(r'time="(\d+):(\d+):(\d+)(?:\.(\d+))?[^"]*"\s+date="(\d+)-(\d+)-(\d+)"', attributes)
+    if not match:
+        return None
+    hour, minute, second, fraction, month, day, year = match.groups()
+    try:
+        stamp = time.mktime((int(year), int(month), int(day), int(hour), int(minute), int(second), 0, 0, -1))
+    except (OverflowError, ValueError):
+        return None
+    return stamp + (int(fraction) / 10 ** len(fraction) if fraction else 0.0)
+
+@dataclass
+class CycleCompletion:
+    """When a triggered cycle was seen finishing in the client logs."""
+    name: str
+    cycle_id: str
+    log: str
+    triggered_at: float
+    completed_at: Optional[float] = None
+
+    @property
+    def latency(self) -> Optional[float]:
+        return None if self.completed_at is None else max(0.0, self.completed_at - self.triggered_at)
+
+class CycleWatcher:
+    """Follow triggered cycles to completion by tailing the client logs that record them.
+
+    Call `arm()` before triggering so only records written afterwards count.
+    Each log is read once per poll from its saved offset, however many cycles
+    share it. Cycles without a known marker are not tracked.
+    """
+
+    def __init__(self, cycles: Dict[str, str], log_dir: Optional[str] = None,
+                 markers: Optional[Dict[str, Tuple[str, str]]] = None) -> None:
+        self.log_dir = log_dir or CONSTANTS['CCM_LOG_DIR']
+        markers = CYCLE_COMPLETION_MARKERS if markers is None else markers
+        self.untracked = [name for name, cycle_id in cycles.items() if cycle_id not in markers]
+        self.pending: Dict[str, CycleCompletion] = {}
+        self.completed: Dict[str, CycleCompletion] = {}
+        self._patterns: Dict[str, re.Pattern] = {}
+        self._tailers: Dict[str, LogTailer] = {}
+        for name, cycle_id in cycles.items():
+            if cycle_id in markers:
+                log, pattern = markers[cycle_id]
+                self.pending[name] = CycleCompletion(name, cycle_id, log, 0.0)
+                self._patterns[name] = re.compile(pattern)
+                self._tailers.setdefault(log, LogTailer(os.path.join(self.log_dir, log)))
+
+    def arm(self) -> None:
+        now = time.time()
+        for tailer in self._tailers.values():
+            tailer.seek_end()
+        for completion in self.pending.values():
+            completion.triggered_at = now
+
+    def discard(self, names: List[str]) -> None:
+        """Stop waiting for cycles whose trigger failed."""
+        for name in names:
+            self.pending.pop(name, None)
+
+    def poll(self) -> List[CycleCompletion]:
+        """Read new records from every watched log and return the cycles they complete."""
+        finished: List[CycleCompletion] = []
+        for log, tailer in self._tailers.items():
+            waiting = [c for c in self.pending.values() if c.log == log]
+            if not waiting:
+                continue
+            for message, stamp in tailer.read_records():
+                for completion in list(waiting):
+                    if self._patterns[completion.name].search(message):
+                        completion.completed_at = stamp if stamp and stamp >= completion.triggered_at \
+                            else time.time()
+                        waiting.remove(completion)
+                        finished.append(self.pending.pop(completion.name))
+                        self.completed[completion.name] = completion
+        return finished
+
+    def wait(self, timeout: float, on_complete: Optional[Callable[[CycleCompletion], None]] = None,
+             poll_interval: Optional[float] = None) -> bool:
+        """Poll until every tracked cycle completes (True) or timeout seconds pass (False)."""
+        interval = CONSTANTS['CYCLE_POLL_INTERVAL'] if poll_interval is None else poll_interval
+        deadline = time.monotonic() + timeout
+        cancel = current_cancel() or threading.Event()
+        while True:
+            for completion in self.poll():
+                if on_complete:
+                    on_complete(completion)
+            if not self.pending:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or cancel.wait(min(interval, remaining)):
+                return False
+
+def wait_for_cycle_completion(watcher: CycleWatcher, timeout: Optional[float] = None) -> bool:
+    """Print each cycle as it finishes, then a latency report; True when all tracked cycles finished."""
+    timeout = cap_timeout(CONSTANTS['CYCLE_WAIT_TIMEOUT'] if timeout is None else timeout)
+    if not watcher.pending:
+        print("\nNo triggered cycle can be tracked in the client logs.")
+        return True
+    print(f"\nWaiting up to {timeout:.0f}s for {len(watcher.pending)} cycle(s) to complete...")
+
+    def report(completion: CycleCompletion) -> None:
+        print(f"  ✓ {completion.name} completed after {completion.latency:.1f}s ({completion.log})")
 
-def trigger_sccm_client_cycles() -> None:
-    """Trigger all common SCCM client action cycles."""
+    with tracer.span("wait for SCCM cycles", 'sccm', cycles=len(watcher.pending)) as span_attrs:
+        done = watcher.wait(timeout, report)
+        span_attrs.update(completed=len(watcher.completed), pending=len(watcher.pending))
+
+    for completion in watcher.pending.values():
+        print(f"  ⧗ {completion.name} not seen finishing within {timeout:.0f}s ({completion.log})")
+    for name in watcher.untracked:
+        print(f"  - {name}: no completion marker known")
+    latencies = [c.latency for c in watcher.completed.values() if c.latency is not None]
+    if latencies:
+        print(f"Completed {len(latencies)} cycle(s); slowest {max(latencies):.1f}s, "
+              f"mean {sum(latencies) / len(latencies):.1f}s")
+    return done
+
+def select_cycles(selection: str) -> Dict[str, str]:
+    """Map a comma-separated list of 1-based cycle numbers to CYCLE_IDS entries."""
+    names = list(CYCLE_IDS)
+    chosen: Dict[str, str] = {}
+    for token in selection.replace(' ', '').split(','):
+        if token.isdigit() and 1 <= int(token) <= len(names):
+            name = names[int(token) - 1]
+            chosen[name] = CYCLE_IDS[name]
+    return chosen
+
+def trigger_sccm_client_cycles(cycles: Optional[Dict[str, str]] = None,
+                               facts: Optional[SystemFacts] = None, wait: Optional[bool] = None) -> bool:
+    """Trigger SCCM client action cycles (all by default) and print a per-cycle report.
+
+    With `wait` (default CYCLE_WAIT) it then follows the client logs until the
+    triggered cycles finish and reports how long each took.
+    """
+    cycles = cycles or CYCLE_IDS
     print_separator("TRIGGER SCCM CLIENT CYCLES")
     print("Starting Microsoft Configuration Manager (SCCM) client cycles...")
-    print(f"Total cycles to trigger: {len(CYCLE_IDS)}\n")
+    print(f"Total cycles to trigger: {len(cycles)}\n")
 
-    if not check_sccm_service():
+    installed = (facts or get_system_facts()).sccm_client
+    if installed is None:
+        installed = check_sccm_service()
+    if not installed:
         print("❌ SCCM client not found on this system.")
         print_separator()
-        return
+        return False
 
-    success_count = 0
-    failure_count = 0
+    wait = CONSTANTS['CYCLE_WAIT'] if wait is None else wait
+    watcher = CycleWatcher(cycles) if wait else None
+    if watcher:
+        watcher.arm()
 
-    for cycle_name, cycle_id in CYCLE_IDS.items():
-        if trigger_single_cycle(cycle_name, cycle_id):
-            success_count += 1
-        else:
-            failure_count += 1
-        time.sleep(CONSTANTS['CYCLE_SLEEP_TIME'])
+    results = trigger_cycles_batched(cycles)
+
+    for result in results:
+        mark = "✓" if result.ok else "✗"
+        detail = f" - {result.error}" if result.error else ""
+        print(f"  {mark} {result.name} ({result.duration * 1000:.0f} ms, {result.method}){detail}")
+
+    success_count = sum(1 for r in results if r.ok)
+    failure_count = len(results) - success_count
 
     print("\nSummary:")
     print(f"  ✓ Success:   {success_count}")
     print(f"  ✗ Failed:    {failure_count}")
-    print(f"  ■ Total:     {len(CYCLE_IDS)}")
+    print(f"  ■ Total:     {len(cycles)}")
 
-    if success_count > 0:
+    if success_count > 0 and watcher:
+        watcher.discard([r.name for r in results if not r.ok])
+        wait_for_cycle_completion(watcher)
+    elif success_count > 0:
         print("\nClient cycles have been triggered in the background.")
     else:
         print("\nNo cycles could be triggered.")
 
     print_separator()
+    return success_count > 0
+
+def trigger_selected_sccm_cycles() -> None:
+    """Prompt for a subset of cycles and trigger them over one WMI session."""
+    for i, name in enumerate(CYCLE_IDS, 1):
+        print(f"{i:>2}. {name}")
+    cycles = select_cycles(input("Cycle numbers (comma-separated): "))
+    if cycles:
+        wait = input("Wait for the cycles to finish? (y/N): ").strip().lower() == 'y'
+        trigger_sccm_client_cycles(cycles, wait=wait)
+    else:
+        print("No valid cycles selected.")
+
+# ---------------------------
+# Desired state
+# ---------------------------
+
+@dataclass
+class StateItem:
+    """A setting with a cheap probe (is it already in place?) and the action that applies it."""
+    name: str
+    probe: Callable[[], bool]
+    apply: Callable[[], Optional[bool]]
+
+def converge(items: List[StateItem]) -> Dict[str, str]:
+    """Apply only the items whose probe reports they are not in place yet.
+
+    Returns name -> 'unchanged' | 'applied' | 'failed'. A probe that errors is
+    treated as "not in place" so the item is still applied.
+    """
+    outcome: Dict[str, str] = {}
+    for item in items:
+        try:
+            in_place = item.probe()
+        except Exception as e:
+            logger.warning(f"State probe failed - {item.name}: {e}")
+            in_place = False
+
+        if in_place:
+            print(f"  = {item.name}: already in place")
+            outcome[item.name] = 'unchanged'
+            continue
+
+        try:
+            ok = item.apply() is not False
+        except Exception as e:
+            logger.error(f"State apply failed - {item.name}: {e}")
+            ok = False
+        print(f"  {'✓' if ok else '✗'} {item.name}: {'applied' if ok else 'failed'}")
+        outcome[item.name] = 'applied' if ok else 'failed'
+    return outcome
 
 # ---------------------------
 # Power configuration
 # ---------------------------
 
+_GUID_PATTERN = r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'
+
+def probe_power_state() -> Dict:
+    """Read power schemes, the active scheme and current AC/DC timeouts with two powercfg calls.
+
+    Parsing relies only on GUIDs and hex values, so localized output works too.
+    """
+    state: Dict = {'schemes': {}, 'active': None, 'timeouts': {}}
+
+    listing = safe_subprocess_run('powercfg /LIST')
+    for match in re.finditer(rf'({_GUID_PATTERN})\s+\((.*?)\)[ \t]*(\*)?', listing.stdout):
+        guid = match.group(1).lower()
+        state['schemes'][guid] = match.group(2).strip()
+        if match.group(3):
+            state['active'] = guid
+
+    query = safe_subprocess_run('powercfg /QUERY SCHEME_CURRENT')
+    text = query.stdout.lower()
+    for alias, setting_guid in POWER_SETTING_GUIDS.items():
+        start = text.find(setting_guid)
+        if start < 0:
+            continue
+        following = re.search(_GUID_PATTERN, text[start + len(setting_guid):])
+        section = text[start:start + len(setting_guid) + following.start()] if following else text[start:]
+        # The last two hex values of a setting block are the current AC and DC indexes.
+        values = re.findall(r':\s*0x([0-9a-f]+)', section)
+        if len(values) >= 2:
+            state['timeouts'][f'{alias}-ac'] = int(values[-2], 16)
+            state['timeouts'][f'{alias}-dc'] = int(values[-1], 16)
+
+    return state
+
+def find_ultimate_schemes(state: Dict) -> List[str]:
+    """Return GUIDs of Ultimate Performance plans, active one first."""
+    names = CONSTANTS['ULTIMATE_PERFORMANCE_NAMES']
+    guids = [guid for guid, name in state['schemes'].items()
+             if name.lower() in names or guid == CONSTANTS['ULTIMATE_PERFORMANCE_GUID']]
+    return sorted(guids, key=lambda guid: guid != state['active'])
+
+
 def create_ultimate_performance_plan() -> Optional[str]:
     """Create the 'Ultimate Performance' power plan and return its GUID."""
     try:
-        result = subprocess.run(
-            ['powercfg', '/DUPLICATESCHEME', CONSTANTS['ULTIMATE_PERFORMANCE_GUID']],
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        result = safe_subprocess_run(f"powercfg /DUPLICATESCHEME {CONSTANTS['ULTIMATE_PERFORMANCE_GUID']}")
+        if result.returncode != 0:
+            logger.warning(f"Could not create Ultimate Performance plan: exit code {result.returncode}")
+            return None
         match = re.search(r'Power Scheme GUID:\s+([a-fA-F0-9\-]+)', result.stdout)
         if match:
             return match.group(1)
-    except subprocess.CalledProcessError as e:
-        logger.warning(f"Could not create Ultimate Performance plan: {e}")
     except Exception as e:
         logger.error(f"Power plan creation error: {e}")
 
     return None
 
-def set_power_scheme(guid: str) -> bool:
-    """Activate the given power scheme GUID."""
+def set_power_scheme(guid: str) -> bool:
+    """Activate the given power scheme GUID."""
+    try:
+        result = safe_subprocess_run(f"powercfg /S {guid}")
+        if result.returncode != 0:
+            logger.error(f"Power scheme activation failed: exit code {result.returncode}")
+        return result.returncode == 0
+    except Exception as e:
+        logger.error(f"Power scheme activation error: {e}")
+        return False
+
+def _set_power_timeout(setting: str) -> bool:
+    command = f'powercfg /change {setting} 0'
+    try:
+        result = safe_subprocess_run(command)
+        if result.returncode != 0:
+            logger.warning(f"Power setting command failed - {command}: exit code {result.returncode}")
+        return result.returncode == 0
+    except Exception as e:
+        logger.warning(f"Power setting command failed - {command}: {e}")
+        return False
+
+def configure_power_settings(current: Optional[Dict[str, int]] = None) -> Dict[str, str]:
+    """Apply no-sleep / high-availability power settings, skipping timeouts already at 0."""
+    current = current or {}
+    items = [
+        StateItem(setting, lambda setting=setting: current.get(setting) == 0,
+                  lambda setting=setting: _set_power_timeout(setting))
+        for alias in POWER_SETTING_GUIDS
+        for setting in (f'{alias}-ac', f'{alias}-dc')
+    ]
+    return converge(items)
+
+def _apply_power_plan(state: Dict) -> bool:
+    """Activate an existing Ultimate Performance plan, creating one only if none exists."""
+    existing = find_ultimate_schemes(state)
+    if existing:
+        ultimate_guid = existing[0]
+        print(f"[=] Reusing Ultimate Performance plan: {ultimate_guid}")
+    else:
+        ultimate_guid = create_ultimate_performance_plan()
+        if ultimate_guid:
+            print(f"[+] New plan GUID: {ultimate_guid}")
+
+    if ultimate_guid:
+        if set_power_scheme(ultimate_guid):
+            print("[✓] Ultimate Performance plan activated.")
+            return True
+        print("[!] Could not activate Ultimate Performance. Falling back to High Performance.")
+    else:
+        print("[!] Could not create Ultimate Performance. Using High Performance.")
+    return set_power_scheme(CONSTANTS['HIGH_PERFORMANCE_GUID'])
+
+def _remove_duplicate_ultimate_plans(state: Dict) -> bool:
+    """Delete extra Ultimate Performance copies left behind by earlier runs."""
+    ok = True
+    for guid in find_ultimate_schemes(state)[1:]:
+        if guid == state['active'] or guid == CONSTANTS['ULTIMATE_PERFORMANCE_GUID']:
+            continue
+        result = safe_subprocess_run(f'powercfg /DELETE {guid}')
+        if result.returncode == 0:
+            print(f"[-] Removed duplicate plan: {guid}")
+        else:
+            ok = False
+    return ok
+
+def optimize_power_settings_and_sleep() -> bool:
+    """Ensure Ultimate (or High) Performance is active and sleep is disabled, changing only what differs."""
+    print_separator("POWER PROFILE & SLEEP SETTINGS")
+    print("Optimizing power configuration and disabling sleep...")
+
+    ok = False
+    try:
+        state = probe_power_state()
+        outcome = converge([
+            StateItem("Ultimate Performance power plan",
+                      lambda: state['active'] in find_ultimate_schemes(state),
+                      lambda: _apply_power_plan(state)),
+        ])
+        if outcome.get("Ultimate Performance power plan") != 'unchanged':
+            # Timeouts are per scheme, so read them again from the newly active plan.
+            state = probe_power_state()
+        outcome.update(converge([
+            StateItem("Duplicate Ultimate Performance plans",
+                      lambda: len(find_ultimate_schemes(state)) <= 1,
+                      lambda: _remove_duplicate_ultimate_plans(state)),
+        ]))
+        outcome.update(configure_power_settings(state['timeouts']))
+
+        ok = 'failed' not in outcome.values()
+        if 'applied' in outcome.values():
+            print("Power settings applied. Sleep disabled (Ultimate/High Performance active).")
+        else:
+            print("Power settings already in place; nothing changed.")
+
+    except Exception as e:
+        logger.error(f"Power settings error: {e}")
+        print(f"Power settings error: {e}")
+
+    print_separator()
+    return ok
+
+# ---------------------------
+# Printer connection
+# ---------------------------
+
+def get_printer_connections() -> List[str]:
+    """List the current user's network printer connections from the registry (no process spawn)."""
+    connections: List[str] = []
+    try:
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Printers\Connections") as key:
+            index = 0
+            while True:
+                try:
+                    name = winreg.EnumKey(key, index)
+                except OSError:
+                    break
+                # Stored as ",,server,queue" for \\server\queue.
+                connections.append(name.replace(',', '\\'))
+                index += 1
+    except OSError:
+        pass
+    return connections
+
+def is_printer_connected(printer_path: str) -> bool:
+    return printer_path.lower() in (c.lower() for c in get_printer_connections())
+
+def printer_queues() -> List[str]:
+    """Queues to provision: PRINTER_QUEUES (TTAS_PRINTERS) or the single default PRINTER_PATH."""
+    return list(CONSTANTS['PRINTER_QUEUES']) or [CONSTANTS['PRINTER_PATH']]
+
+class PrinterBackend(ABC):
+    """Talks to the print spooler; subclass to provision against something other than this machine."""
+
+    name = "base"
+
+    @abstractmethod
+    def connections(self) -> List[str]:
+        """Queues the current user is already connected to."""
+
+    @abstractmethod
+    def installed_drivers(self) -> List[str]:
+        """Driver names already in the local driver store."""
+
+    @abstractmethod
+    def queue_drivers(self, queues: List[str]) -> Dict[str, str]:
+        """Ask the print servers which driver each queue uses (queue -> driver name)."""
+
+    @abstractmethod
+    def connect(self, queue: str, timeout: float) -> None:
+        """Add one connection; raise on failure or subprocess.TimeoutExpired after `timeout`."""
+
+_GET_PRINTERS_SCRIPT = (
+    "Get-Printer -ComputerName '%s' -ErrorAction Stop | "
+    "Select-Object Name, DriverName | ConvertTo-Json -Compress"
+)
+
+class SpoolerBackend(PrinterBackend):
+    """The local Windows spooler: registry reads for state, printui for connections."""
+
+    name = "spooler"
+
+    def connections(self) -> List[str]:
+        return get_printer_connections()
+
+    def installed_drivers(self) -> List[str]:
+        drivers: List[str] = []
+        path = r"SYSTEM\CurrentControlSet\Control\Print\Environments\Windows x64\Drivers\Version-3"
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, path) as key:
+                index = 0
+                while True:
+                    try:
+                        drivers.append(winreg.EnumKey(key, index))
+                    except OSError:
+                        break
+                    index += 1
+        except OSError:
+            pass
+        return drivers
+
+    def queue_drivers(self, queues: List[str]) -> Dict[str, str]:
+        servers: Dict[str, List[str]] = {}
+        for queue in queues:
+            server = queue.lstrip('\\').split('\\', 1)[0]
+            servers.setdefault(server, []).append(queue)
+
+        drivers: Dict[str, str] = {}
+        for server, wanted in servers.items():
+            # One PowerShell call per print server, however many of its queues we need.
+            encoded = base64.b64encode((_GET_PRINTERS_SCRIPT % server).encode('utf-16-le')).decode('ascii')
+            try:
+                result = safe_subprocess_run(f'powershell -NoProfile -NonInteractive -EncodedCommand {encoded}',
+                                             timeout=CONSTANTS['WMIC_TIMEOUT'])
+                listed = json.loads(result.stdout) if result.returncode == 0 and result.stdout.strip() else []
+            except (subprocess.TimeoutExpired, ValueError) as e:
+                logger.warning(f"Could not list printers on {server}: {e}")
+                continue
+            if isinstance(listed, dict):
+                listed = [listed]
+            by_name = {str(item.get('Name', '')).lower(): item.get('DriverName') for item in listed
+                       if isinstance(item, dict)}
+            for queue in wanted:
+                driver = by_name.get(queue.rsplit('\\', 1)[-1].lower())
+                if driver:
+                    drivers[queue] = driver
+        return drivers
+
+    def connect(self, queue: str, timeout: float) -> None:
+        # /q keeps printui from raising error dialogs, which would block unattended and parallel runs,
+        # but printui exits 0 whatever happens, so the connection list is what tells us it worked.
+        result = safe_subprocess_run(f'rundll32 printui.dll,PrintUIEntry /in /q /n"{queue}"', timeout=timeout)
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+        if not is_printer_connected(queue):
+            raise RuntimeError(f"printui did not add a connection to {queue}")
+
+# Replaces the local spooler when set (tests and simulations).
+_printer_backend: Optional[PrinterBackend] = None
+
+def set_printer_backend(backend: Optional[PrinterBackend]) -> Optional[PrinterBackend]:
+    """Route printer provisioning to `backend`; returns the previous one."""
+    global _printer_backend
+    previous, _printer_backend = _printer_backend, backend
+    return previous
+
+@dataclass
+class PrinterResult:
+    """Outcome of provisioning one queue: 'present', 'connected', 'failed' or 'timeout'."""
+    queue: str
+    status: str
+    driver: Optional[str] = None
+    seconds: float = 0.0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ('present', 'connected')
+
+def _printer_drivers_path() -> str:
+    return os.path.join(get_auto_setup_dir(), CONSTANTS['PRINTER_DRIVERS_FILE'])
+
+def resolve_queue_drivers(queues: List[str], backend: PrinterBackend) -> Dict[str, str]:
+    """Queue -> driver, from the local drivers file first and the print servers for the rest."""
     try:
-        subprocess.run(['powercfg', '/S', guid], check=True)
-        return True
-    except Exception as e:
-        logger.error(f"Power scheme activation error: {e}")
-        return False
+        with open(_printer_drivers_path(), 'r', encoding='utf-8') as f:
+            known = {queue.lower(): driver for queue, driver in json.load(f).items()}
+    except (OSError, ValueError, AttributeError):
+        known = {}
 
-def configure_power_settings() -> None:
-    """Apply no-sleep / high-availability power settings."""
-    power_commands = [
-        'powercfg /change monitor-timeout-ac 0',
-        'powercfg /change monitor-timeout-dc 0',
-        'powercfg /change disk-timeout-ac 0',
-        'powercfg /change disk-timeout-dc 0',
-        'powercfg /change standby-timeout-ac 0',
-        'powercfg /change standby-timeout-dc 0'
-    ]
-    for command in power_commands:
+    missing = [queue for queue in queues if queue.lower() not in known]
+    if missing:
         try:
-            subprocess.run(command, shell=True, check=True)
+            found = backend.queue_drivers(missing)
         except Exception as e:
-            logger.warning(f"Power setting command failed - {command}: {e}")
-
-def optimize_power_settings_and_sleep() -> None:
-    """Create/enable Ultimate Performance (or High Performance) and disable sleep."""
-    print_separator("POWER PROFILE & SLEEP SETTINGS")
-    print("Optimizing power configuration and disabling sleep...")
+            logger.warning(f"Printer driver lookup failed: {e}")
+            found = {}
+        if found:
+            known.update({queue.lower(): driver for queue, driver in found.items()})
+            try:
+                tmp_path = _printer_drivers_path() + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(known, f, indent=2)
+                os.replace(tmp_path, _printer_drivers_path())
+            except OSError as e:
+                logger.warning(f"Could not save printer drivers: {e}")
+    return {queue: known[queue.lower()] for queue in queues if queue.lower() in known}
 
-    try:
-        ultimate_guid = create_ultimate_performance_plan()
+def _connect_queue(backend: PrinterBackend, queue: str, driver: Optional[str], timeout: float,
+                   deadline: Optional[float]) -> PrinterResult:
+    started = time.perf_counter()
+    with deadline_scope(deadline), tracer.span(f"printer {queue}", 'printer', driver=driver) as span_attrs:
+        try:
+            backend.connect(queue, cap_timeout(timeout))
+            status, error = 'connected', ""
+        except subprocess.TimeoutExpired:
+            status, error = 'timeout', f"no answer after {timeout:g}s"
+        except Exception as e:
+            status, error = 'failed', str(e)
+        span_attrs['exit_code'] = 0 if status == 'connected' else 1
+    if error:
+        logger.error(f"Printer connection failed - {queue}: {error}")
+    return PrinterResult(queue, status, driver, time.perf_counter() - started, error)
 
-        if ultimate_guid:
-            print(f"[+] New plan GUID: {ultimate_guid}")
-            if set_power_scheme(ultimate_guid):
-                print("[✓] Ultimate Performance plan activated.")
-            else:
-                print("[!] Could not activate Ultimate Performance. Falling back to High Performance.")
-                set_power_scheme(CONSTANTS['HIGH_PERFORMANCE_GUID'])
-        else:
-            print("[!] Could not create Ultimate Performance. Using High Performance.")
-            set_power_scheme(CONSTANTS['HIGH_PERFORMANCE_GUID'])
+def provision_printers(queues: Optional[List[str]] = None, backend: Optional[PrinterBackend] = None,
+                       timeout: Optional[float] = None,
+                       max_workers: Optional[int] = None) -> List[PrinterResult]:
+    """Connect every queue that is not connected yet, several at a time.
 
-        configure_power_settings()
-        print("Power settings applied. Sleep disabled (Ultimate/High Performance active).")
+    Existing connections are read once up front. Point and Print downloads a
+    driver from the print server the first time it is needed, so when several
+    queues share a driver that is not installed yet, one of them connects
+    first and the others follow once the driver is in the local store.
+    """
+    backend = backend or _printer_backend or SpoolerBackend()
+    timeout = timeout or CONSTANTS['PRINTER_TIMEOUT']
+    queues = list(dict.fromkeys(queues or printer_queues()))
 
+    try:
+        existing = {connection.lower() for connection in backend.connections()}
     except Exception as e:
-        logger.error(f"Power settings error: {e}")
-        print(f"Power settings error: {e}")
+        logger.warning(f"Could not enumerate printer connections: {e}")
+        existing = set()
+    results = {queue: PrinterResult(queue, 'present') for queue in queues if queue.lower() in existing}
+    pending = [queue for queue in queues if queue not in results]
 
-    print_separator()
+    drivers: Dict[str, str] = {}
+    installed = set()
+    if len(pending) > 1:
+        drivers = resolve_queue_drivers(pending, backend)
+        try:
+            installed = {driver.lower() for driver in backend.installed_drivers()}
+        except Exception as e:
+            logger.warning(f"Could not list installed printer drivers: {e}")
 
-# ---------------------------
-# Printer connection
-# ---------------------------
+    # Queues waiting for the first queue of their driver to bring the driver in.
+    followers: Dict[str, List[str]] = {}
+    leaders: Dict[str, str] = {}
+    ready: List[str] = []
+    for queue in pending:
+        driver = drivers.get(queue)
+        if driver and driver.lower() not in installed:
+            if driver.lower() in leaders:
+                followers[leaders[driver.lower()]].append(queue)
+                continue
+            leaders[driver.lower()] = queue
+            followers[queue] = []
+        ready.append(queue)
 
-def connect_printer() -> None:
-    """Connect the shared printer."""
-    print_separator("PRINTER CONNECTION - s000rdl01")
-    print("Connecting to printer...")
+    deadline = current_deadline()
+    workers = max(1, min(max_workers or CONSTANTS['PRINTER_WORKERS'], len(pending) or 1))
+    with OutputThreadPoolExecutor(max_workers=workers, thread_name_prefix="printer") as executor:
+        running = {executor.submit(_connect_queue, backend, queue, drivers.get(queue), timeout, deadline): queue
+                   for queue in ready}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                queue = running.pop(future)
+                results[queue] = future.result()
+                # Followers go even if the leader failed; each then downloads the driver itself.
+                for follower in followers.pop(queue, []):
+                    running[executor.submit(_connect_queue, backend, follower, drivers.get(follower),
+                                            timeout, deadline)] = follower
+    return [results[queue] for queue in queues]
 
+def connect_printer(queues: Optional[List[str]] = None) -> bool:
+    """Connect the configured printer queues, skipping connections that already exist."""
+    print_separator("PRINTER CONNECTION")
+    queues = queues or printer_queues()
+    print(f"Connecting {len(queues)} printer queue(s)...")
+
+    ok = True
     try:
-        subprocess.run(
-            [
-                "rundll32",
-                "printui.dll,PrintUIEntry",
-                "/in",
-                f"/n{CONSTANTS['PRINTER_PATH']}"
-            ],
-            check=True,
-            shell=True
-        )
-        print(f"✅ Printer connected: {CONSTANTS['PRINTER_PATH']}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Printer connection error: {e}")
-        print(f"❌ Printer connection failed. Error: {e}")
+        for result in provision_printers(queues):
+            if result.status == 'present':
+                print(f"  = {result.queue}: already connected")
+            elif result.ok:
+                print(f"  ✓ {result.queue}: connected in {result.seconds:.1f}s")
+            else:
+                print(f"  ✗ {result.queue}: {result.status} - {result.error}")
+            ok = ok and result.ok
     except Exception as e:
         logger.error(f"Unexpected printer error: {e}")
         print(f"❌ Unexpected error: {e}")
+        ok = False
 
     print_separator()
+    return ok
 
 # ---------------------------
 # Symantec update
 # ---------------------------
 
-def update_symantec() -> None:
+def update_symantec(facts: Optional[SystemFacts] = None) -> bool:
     """Run Symantec LiveUpdate if installed."""
     print_separator("SYMANTEC DEFINITION UPDATE")
     print("Starting Symantec update...")
 
+    ok = False
     try:
-        if not os.path.exists(CONSTANTS['SYMANTEC_PATH']):
+        installed = (facts or get_system_facts()).symantec
+        if installed is None:
+            installed = os.path.exists(CONSTANTS['SYMANTEC_PATH'])
+        if not installed:
             print("Symantec not found.")
             print_separator()
-            return
+            return True
 
         cmd_command = f'"{CONSTANTS["SYMANTEC_PATH"]}" /u'
-        result = safe_subprocess_run(cmd_command, timeout=60)
+        result = run_streaming(cmd_command, CONSTANTS['SYMANTEC_TIMEOUT'], SYMANTEC_MATCHERS,
+                               max_timeout=CONSTANTS['SYMANTEC_MAX_TIMEOUT'])
 
-        if result.returncode == 0:
+        ok = result.ok
+        if ok:
             print("Symantec update completed.")
+        elif result.status == 'timeout':
+            print("Symantec update timed out.")
+        elif result.status == 'cancelled':
+            print("Symantec update cancelled.")
         else:
             print("Symantec update failed.")
-            if result.stderr:
-                print(result.stderr)
+            for line in result.stderr_tail[-10:]:
+                print(line)
 
     except Exception as e:
         logger.error(f"Symantec update error: {e}")
         print(f"Symantec update error: {e}")
 
     print_separator()
+    return ok
 
 # ---------------------------
 # Group policy update
 # ---------------------------
 
-def update_group_policy() -> None:
-    """Force a Group Policy update."""
-    print_separator("GROUP POLICY UPDATE")
-    print("Updating Group Policy...")
+def get_last_group_policy_refresh() -> Optional[float]:
+    """Return the epoch time of the last machine Group Policy refresh, read from the registry."""
+    try:
+        path = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Group Policy\State\Machine\Extension-List\{00000000-0000-0000-0000-000000000000}"
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, path) as key:
+            high = winreg.QueryValueEx(key, "EndTimeHi")[0]
+            low = winreg.QueryValueEx(key, "EndTimeLo")[0]
+        # FILETIME: 100 ns ticks since 1601-01-01.
+        return ((high << 32) | low) / 10_000_000 - 11644473600
+    except Exception as e:
+        logger.debug(f"Could not read last Group Policy refresh: {e}")
+        return None
 
+def group_policy_is_fresh() -> bool:
+    last_refresh = get_last_group_policy_refresh()
+    return last_refresh is not None and time.time() - last_refresh < CONSTANTS['GPUPDATE_FRESH_SECONDS']
+
+def _run_gpupdate() -> bool:
     try:
-        result = safe_subprocess_run('gpupdate /force', timeout=120)
+        result = run_streaming('gpupdate /force', CONSTANTS['GPUPDATE_TIMEOUT'], GPUPDATE_MATCHERS,
+                               max_timeout=CONSTANTS['GPUPDATE_MAX_TIMEOUT'])
 
-        if result.returncode == 0:
+        if result.ok:
             print("Group Policy updated successfully.")
-            if result.stdout:
-                print(result.stdout)
+        elif result.status == 'timeout':
+            print("Group Policy update timed out.")
+        elif result.status == 'cancelled':
+            print("Group Policy update cancelled.")
         else:
             print("Group Policy update failed.")
-            if result.stderr:
-                print(result.stderr)
+            for line in result.stderr_tail[-10:]:
+                print(line)
+        return result.ok
 
     except Exception as e:
         logger.error(f"Group Policy error: {e}")
         print(f"Group Policy error: {e}")
+        return False
+
+def update_group_policy() -> bool:
+    """Force a Group Policy update unless policy was refreshed within GPUPDATE_FRESH_SECONDS."""
+    print_separator("GROUP POLICY UPDATE")
+    print("Updating Group Policy...")
+
+    outcome = converge([StateItem("Group Policy refresh", group_policy_is_fresh, _run_gpupdate)])
 
     print_separator()
+    return 'failed' not in outcome.values()
+
+# ---------------------------
+# Step scheduler
+# ---------------------------
+
+@dataclass
+class SetupStep:
+    """A setup operation plus the keys of the steps that must finish before it starts."""
+    key: str
+    description: str
+    operation: Callable[[], Optional[bool]]
+    depends_on: Tuple[str, ...] = ()
+
+@dataclass
+class StepResult:
+    """Outcome and timing of a single scheduled step."""
+    key: str
+    description: str
+    ok: bool = False
+    started: float = 0.0
+    finished: float = 0.0
+    error: Optional[str] = None
+    output: str = ""
+    skipped: Optional[str] = None
+    timed_out: bool = False
+    deferred: bool = False
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.finished - self.started)
+
+class _StepOutputRouter(io.TextIOBase):
+    """Stdout proxy that buffers print() output per worker thread so parallel steps don't interleave."""
+
+    def __init__(self, target) -> None:
+        super().__init__()
+        self._target = target
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def begin_capture(self) -> None:
+        self._local.buffer = io.StringIO()
+
+    def share_capture(self, buffer: Optional[io.TextIOBase]) -> None:
+        """Make this thread write into another thread's capture buffer."""
+        self._local.buffer = buffer
+
+    def end_capture(self) -> str:
+        buffer = getattr(self._local, 'buffer', None)
+        self._local.buffer = None
+        return buffer.getvalue() if buffer else ""
+
+    def emit(self, text: str) -> None:
+        """Write directly to the real console, bypassing any capture."""
+        with self._lock:
+            self._target.write(text)
+            self._target.flush()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(text)
+        with self._lock:
+            return self._target.write(text)
+
+    def flush(self) -> None:
+        self._target.flush()
+
+def order_steps(steps: List[SetupStep]) -> List[SetupStep]:
+    """Return steps in a dependency-respecting order; raise ValueError on unknown deps or cycles."""
+    by_key = {step.key: step for step in steps}
+    for step in steps:
+        for dep in step.depends_on:
+            if dep not in by_key:
+                raise ValueError(f"Step '{step.key}' depends on unknown step '{dep}'")
+
+    ordered: List[SetupStep] = []
+    state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+    def visit(step: SetupStep) -> None:
+        if state.get(step.key) == 2:
+            return
+        if state.get(step.key) == 1:
+            raise ValueError(f"Dependency cycle detected at step '{step.key}'")
+        state[step.key] = 1
+        for dep in step.depends_on:
+            visit(by_key[dep])
+        state[step.key] = 2
+        ordered.append(step)
+
+    for step in steps:
+        visit(step)
+    return ordered
+
+def critical_path(steps: List[SetupStep], results: Dict[str, StepResult]) -> Tuple[List[str], float]:
+    """Return the longest chain of dependent steps (by measured duration) and its total time."""
+    best: Dict[str, Tuple[float, List[str]]] = {}
+    for step in order_steps(steps):
+        if step.key not in results:
+            continue
+        chain: Tuple[float, List[str]] = (0.0, [])
+        for dep in step.depends_on:
+            if dep in best and best[dep][0] > chain[0]:
+                chain = best[dep]
+        best[step.key] = (chain[0] + results[step.key].duration, chain[1] + [step.key])
+
+    if not best:
+        return [], 0.0
+    total, path = max(best.values(), key=lambda item: item[0])
+    return path, total
+
+def _call_with_timeout(operation: Callable[[], Optional[bool]], timeout: float,
+                       router: Optional[_StepOutputRouter]) -> Optional[bool]:
+    """Run operation on a helper thread and stop waiting for it after timeout seconds.
+
+    Python threads cannot be killed, so a timed-out operation is abandoned rather
+    than stopped; its own subprocess timeouts still apply.
+    """
+    outcome: Dict[str, object] = {}
+    buffer = getattr(router._local, 'buffer', None) if router else None
+    deadline = current_deadline()
+
+    def target() -> None:
+        if router:
+            router.share_capture(buffer)
+        try:
+            with deadline_scope(deadline):
+                outcome['value'] = operation()
+        except BaseException as e:
+            outcome['error'] = e
+
+    worker = threading.Thread(target=target, name=f"{threading.current_thread().name}-op", daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        raise TimeoutError(f"timed out after {timeout:g}s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('value')
+
+def _run_step(step: SetupStep, router: Optional[_StepOutputRouter],
+              timeout: Optional[float] = None) -> StepResult:
+    """Execute one step, capturing its console output when running under the router."""
+    result = StepResult(step.key, step.description)
+    if router:
+        router.begin_capture()
+    result.started = time.perf_counter()
+    try:
+        with tracer.span(step.description, 'step', step=step.key) as span_attrs, \
+                deadline_scope(time.monotonic() + timeout if timeout else None):
+            if timeout:
+                span_attrs['timeout'] = round(timeout, 1)
+                value = _call_with_timeout(step.operation, timeout, router)
+            else:
+                value = step.operation()
+            # Only an explicit True counts; a step that returns None has not confirmed anything.
+            result.ok = value is True
+            span_attrs['ok'] = result.ok
+    except TimeoutError as e:
+        logger.error(f"Automatic setup step {step.description} {e}")
+        print(f"❌ {step.description} {e}")
+        result.error = str(e)
+        result.timed_out = True
+    except Exception as e:
+        logger.error(f"Automatic setup error - {step.description}: {e}")
+        print(f"❌ Error during: {step.description} -> {e}")
+        result.error = str(e)
+    finally:
+        result.finished = time.perf_counter()
+        if router:
+            result.output = router.end_capture()
+    return result
+
+def run_step_graph(steps: List[SetupStep], max_workers: int = 1, skip: Optional[Dict[str, str]] = None,
+                   on_complete: Optional[Callable[[StepResult], None]] = None,
+                   step_timeout: Optional[float] = None,
+                   budget: Optional['DeadlineBudget'] = None) -> Dict[str, StepResult]:
+    """Run steps on a bounded thread pool, starting each one as soon as its dependencies finish.
+
+    Dependencies only constrain ordering: a step still runs if a dependency failed,
+    matching the old sequential behaviour where every operation was attempted.
+    Steps named in `skip` (key -> reason) count as done without running;
+    `on_complete` is called on the calling thread after each executed step.
+    A step running longer than `step_timeout` seconds is reported as failed.
+    With a `budget`, each step's timeout also comes from its history and the
+    time left, and steps that no longer fit are deferred instead of started.
+    """
+    ordered = order_steps(steps)
+
+    def admit(step: SetupStep) -> Tuple[Optional[float], Optional[StepResult]]:
+        if budget is None:
+            return step_timeout, None
+        timeout, reason = budget.plan(step.key)
+        if reason:
+            logger.info(f"Deferred step {step.key}: {reason}")
+            return None, StepResult(step.key, step.description, skipped=reason, deferred=True)
+        return min(timeout, step_timeout) if step_timeout else timeout, None
+
+    skip = skip or {}
+    results: Dict[str, StepResult] = {
+        step.key: StepResult(step.key, step.description, ok=True, skipped=skip[step.key])
+        for step in ordered if step.key in skip
+    }
+
+    if max_workers <= 1:
+        for i, step in enumerate(ordered, 1):
+            if step.key in skip:
+                print(f"{i} -> {step.description} skipped ({skip[step.key]})\n")
+                continue
+            timeout, deferred = admit(step)
+            if deferred:
+                results[step.key] = deferred
+                print(f"{i} -> {step.description} deferred ({deferred.skipped})\n")
+                continue
+            print(f"{i} -> {step.description}")
+            results[step.key] = _run_step(step, None, timeout)
+            if on_complete:
+                on_complete(results[step.key])
+            print()
+        return results
+
+    for key, reason in skip.items():
+        if key in results:
+            print(f"= Skipped: {results[key].description} ({reason})")
+    remaining = {step.key: set(step.depends_on) - set(skip) for step in ordered if step.key not in skip}
+    by_key = {step.key: step for step in ordered}
+    router = _StepOutputRouter(sys.stdout)
+    original_stdout = sys.stdout
+    sys.stdout = router
+    try:
+        with OutputThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="setup-step") as pool:
+            running = {}
+            while remaining or running:
+                ready = [key for key, deps in remaining.items() if not deps]
+                for key in ready:
+                    del remaining[key]
+                    timeout, deferred = admit(by_key[key])
+                    if deferred:
+                        results[key] = deferred
+                        router.emit(f"= Deferred: {deferred.description} ({deferred.skipped})\n")
+                        for deps in remaining.values():
+                            deps.discard(key)
+                        continue
+                    router.emit(f"▶ Started: {by_key[key].description}\n")
+                    running[pool.submit(_run_step, by_key[key], router, timeout)] = key
+
+                if not running:
+                    if any(not deps for deps in remaining.values()):
+                        continue  # a deferral just released its dependents
+                    if not remaining:
+                        break
+                    raise ValueError("Step graph stalled; unresolved dependencies remain")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    result = future.result()
+                    results[key] = result
+                    mark = "✓" if result.ok else "✗"
+                    router.emit(f"\n{mark} Finished: {result.description} ({result.duration:.1f}s)\n")
+                    if result.output:
+                        router.emit(result.output.rstrip("\n") + "\n")
+                    if on_complete:
+                        on_complete(result)
+                    for deps in remaining.values():
+                        deps.discard(key)
+    finally:
+        sys.stdout = original_stdout
+
+    return results
+
+def print_step_summary(steps: List[SetupStep], results: Dict[str, StepResult], wall_time: float) -> None:
+    """Print the per-step ✓/✗ table, total wall time and the critical path."""
+    print("\nStep summary:")
+    for step in steps:
+        result = results.get(step.key)
+        if result is None:
+            print(f"  - {step.description:<40} not run")
+            continue
+        if result.skipped:
+            print(f"  = {step.description:<40} {'deferred' if result.deferred else 'skipped'} ({result.skipped})")
+            continue
+        mark = "✓" if result.ok else "✗"
+        note = " (timed out)" if result.timed_out else ""
+        print(f"  {mark} {step.description:<40} {result.duration:7.1f}s{note}")
+
+    path, path_time = critical_path(steps, results)
+    print(f"\nWall time:     {wall_time:.1f}s")
+    print(f"Sum of steps:  {sum(r.duration for r in results.values()):.1f}s")
+    if path:
+        print(f"Critical path: {' -> '.join(path)} ({path_time:.1f}s)")
+
+# ---------------------------
+# Checkpoint journal
+# ---------------------------
+
+class CheckpointJournal:
+    """Fsync'd record of finished setup steps, used to resume interrupted runs and size budgets.
+
+    Each line is a JSON object; a torn final line from a crash is ignored on
+    read. Records are appended while a run is in progress; a reset or a
+    finished run compacts the file to per-step duration samples plus the
+    latest record of each step. Parsed records are cached until the file changes.
+    `path` defaults to JOURNAL_FILE in the autoSetup folder.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._cache_key: Optional[Tuple[str, int, int, int]] = None
+        self._cache: List[Dict] = []
+
+    def location(self) -> str:
+        return self.path or os.path.join(get_auto_setup_dir(), CONSTANTS['JOURNAL_FILE'])
+
+    @staticmethod
+    def _stat_key(path: str) -> Optional[Tuple[str, int, int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _records(self) -> List[Dict]:
+        """Parsed records, re-read only when the file's size or mtime has changed. Caller holds the lock."""
+        path = self.location()
+        key = self._stat_key(path)
+        if key is None:
+            self._cache_key, self._cache = None, []
+        elif key != self._cache_key:
+            records = []
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict):
+                        records.append(record)
+            self._cache_key, self._cache = key, records
+        return self._cache
+
+    def _append(self, record: Dict[str, object]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            path = self.location()
+            cached = self._cache_key is not None and self._stat_key(path) == self._cache_key
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if cached:
+                self._cache.append(record)
+                self._cache_key = self._stat_key(path)
+
+    def record(self, result: StepResult) -> None:
+        """Persist a finished step before the next one is reported."""
+        try:
+            self._append({
+                'type': 'step',
+                'step': result.key,
+                'ok': result.ok,
+                'timed_out': result.timed_out,
+                'at': time.time(),
+                'duration': round(result.duration, 3),
+                'error': result.error,
+                'output': result.output[-CONSTANTS['JOURNAL_OUTPUT_LIMIT']:],
+            })
+        except OSError as e:
+            logger.warning(f"Could not write checkpoint journal: {e}")
+
+    def reset(self) -> None:
+        """Forget completed steps, keeping only the duration samples."""
+        try:
+            self._compact(keep_latest=False)
+        except OSError as e:
+            logger.warning(f"Could not reset checkpoint journal: {e}")
+
+    def compact(self) -> None:
+        """Rewrite the journal as duration samples plus the latest record per step."""
+        try:
+            self._compact(keep_latest=True)
+        except OSError as e:
+            logger.warning(f"Could not compact checkpoint journal: {e}")
+
+    def _compact(self, keep_latest: bool) -> None:
+        with self._lock:
+            records = self._records()
+            latest = self._latest(records) if keep_latest else {}
+            kept = {id(record) for record in latest.values()}
+            limit = CONSTANTS['BUDGET_HISTORY']
+            compacted: List[Dict] = [
+                {'type': 'durations', 'step': step, 'samples': samples[-limit:]}
+                for step, samples in self._samples([r for r in records if id(r) not in kept]).items()
+            ]
+            compacted.extend(sorted(latest.values(), key=lambda record: record.get('at', 0)))
+
+            path = self.location()
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for record in compacted:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            self._cache_key, self._cache = self._stat_key(path), compacted
+
+    @staticmethod
+    def _samples(records: List[Dict]) -> Dict[str, List[float]]:
+        history: Dict[str, List[float]] = {}
+        for record in records:
+            if record.get('type') == 'durations':
+                history.setdefault(record['step'], []).extend(record.get('samples', []))
+            elif record.get('type') == 'step':
+                duration = record.get('duration', 0.0)
+                if (record.get('ok') or record.get('timed_out')
+                        or duration >= CONSTANTS['BUDGET_MIN_STEP_SECONDS']):
+                    history.setdefault(record['step'], []).append(duration)
+        return history
+
+    @staticmethod
+    def _latest(records: List[Dict]) -> Dict[str, Dict]:
+        latest: Dict[str, Dict] = {}
+        for record in records:
+            if record.get('type') == 'reset':
+                latest.clear()
+            elif record.get('type') == 'step':
+                latest[record['step']] = record
+        return latest
+
+    def durations(self, limit: Optional[int] = None) -> Dict[str, List[float]]:
+        """Duration samples per step across the whole journal, most recent `limit` kept.
+
+        Timed-out runs count (the step needed at least that long), as do failures
+        that ran for BUDGET_MIN_STEP_SECONDS or more; quicker failures, such as an
+        offline download giving up at once, say nothing about the step's length.
+        """
+        limit = CONSTANTS['BUDGET_HISTORY'] if limit is None else limit
+        try:
+            with self._lock:
+                history = self._samples(self._records())
+        except OSError:
+            return {}
+        return {step: values[-limit:] for step, values in history.items()}
+
+    def completed(self, max_age: Optional[float] = None) -> Dict[str, Dict]:
+        """Return the latest successful, unexpired record per step (later failures cancel success)."""
+        max_age = CONSTANTS['JOURNAL_EXPIRY_SECONDS'] if max_age is None else max_age
+        try:
+            with self._lock:
+                latest = self._latest(self._records())
+        except OSError:
+            return {}
+        now = time.time()
+        return {step: record for step, record in latest.items()
+                if record.get('ok') is True and now - record.get('at', 0) < max_age}
+
+journal = CheckpointJournal()
+
+class DeadlineBudget:
+    """Run-level time budget that turns recorded step durations into per-step timeouts.
+
+    A step's timeout is the BUDGET_PERCENTILE of its recent durations plus
+    BUDGET_MARGIN, capped by the time left in the run; a timed-out run is a
+    sample at its timeout, so the next allowance grows by the margin. A step whose median
+    duration no longer fits in the time left is deferred.
+    """
+
+    def __init__(self, total_seconds: float, history: Dict[str, List[float]]) -> None:
+        self.total_seconds = total_seconds
+        self.history = history
+        self.started = time.monotonic()
+
+    def remaining(self) -> float:
+        return self.total_seconds - (time.monotonic() - self.started)
+
+    def expected(self, key: str) -> float:
+        """Typical duration of the step (median of history, or the minimum slot without history)."""
+        durations = sorted(self.history.get(key, []))
+        if not durations:
+            return CONSTANTS['BUDGET_MIN_STEP_SECONDS']
+        return durations[len(durations) // 2]
+
+    def allowance(self, key: str) -> float:
+        """Timeout the step deserves from its history alone."""
+        durations = sorted(self.history.get(key, []))
+        if not durations:
+            return CONSTANTS['BUDGET_DEFAULT_STEP_SECONDS']
+        rank = max(0, math.ceil(CONSTANTS['BUDGET_PERCENTILE'] * len(durations)) - 1)
+        return max(CONSTANTS['BUDGET_MIN_STEP_SECONDS'], durations[rank] * (1 + CONSTANTS['BUDGET_MARGIN']))
+
+    def plan(self, key: str) -> Tuple[Optional[float], Optional[str]]:
+        """Return (timeout, None) for a step that fits, or (None, reason) for one to defer."""
+        remaining = self.remaining()
+        needed = self.expected(key)
+        if remaining < needed:
+            return None, f"needs ~{needed:.0f}s, {max(remaining, 0):.0f}s of budget left"
+        return min(self.allowance(key), remaining), None
+
+def _format_age(seconds: float) -> str:
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
 
 # ---------------------------
 # Full automation
 # ---------------------------
 
-def run_full_automatic_setup() -> None:
-    """Run all automated setup operations in sequence."""
+def build_setup_steps(facts: Optional[SystemFacts] = None) -> List[SetupStep]:
+    """Declare the automatic setup steps and their ordering constraints."""
+    facts = facts or get_system_facts()
+    return [
+        SetupStep("support", "Installing Support Assistant...", lambda: install_support_assistant(facts)),
+        SetupStep("gpupdate", "Updating Group Policy...", update_group_policy),
+        # Policy retrieval cycles should see the freshly applied Group Policy.
+        SetupStep("sccm", "Triggering SCCM client actions...",
+                  lambda: trigger_sccm_client_cycles(facts=facts), ("gpupdate",)),
+        SetupStep("power", "Optimizing power settings...", optimize_power_settings_and_sleep),
+        SetupStep("printer", "Connecting printer...", connect_printer),
+        SetupStep("symantec", "Updating Symantec...", lambda: update_symantec(facts)),
+    ]
+
+def _fact_label(value: Optional[bool]) -> str:
+    return "unknown" if value is None else ("yes" if value else "no")
+
+def select_steps(steps: List[SetupStep], keys: List[str]) -> List[SetupStep]:
+    """Keep only the steps named in keys, dropping ordering constraints on steps left out."""
+    known = {step.key for step in steps}
+    unknown = [key for key in keys if key not in known]
+    if unknown:
+        raise ValueError(f"Unknown step(s): {', '.join(unknown)}; choose from {', '.join(sorted(known))}")
+    chosen = [step for step in steps if step.key in keys]
+    return [replace(step, depends_on=tuple(dep for dep in step.depends_on if dep in keys)) for step in chosen]
+
+def run_full_automatic_setup(resume: bool = False, keys: Optional[List[str]] = None,
+                             max_workers: Optional[int] = None, step_timeout: Optional[float] = None,
+                             budget_seconds: Optional[float] = None) -> Dict[str, StepResult]:
+    """Run all (or the `keys`) automated setup operations, in parallel where their dependencies allow.
+
+    Resuming is opt-in: with `resume`, steps that succeeded within
+    JOURNAL_EXPIRY_SECONDS (per the checkpoint journal) are skipped; otherwise
+    the journal is reset first and every step runs.
+    `budget_seconds` (default RUN_BUDGET_SECONDS) bounds the whole run.
+    """
     print("=== STARTING AUTOMATIC SETUP ===\n")
 
-    operations = [
-        ("Installing Support Assistant...", install_support_assistant),
-        ("Triggering SCCM client actions...", trigger_sccm_client_cycles),
-        ("Optimizing power settings...", optimize_power_settings_and_sleep),
-        ("Connecting printer...", connect_printer),
-        ("Updating Symantec...", update_symantec),
-        ("Updating Group Policy...", update_group_policy),
-    ]
+    facts = get_system_facts()
+    print(f"System: {facts.manufacturer or 'unknown'} {facts.model}".rstrip()
+          + f" | SCCM client: {_fact_label(facts.sccm_client)} | Symantec: {_fact_label(facts.symantec)}\n")
+    steps = build_setup_steps(facts)
+    if keys:
+        steps = select_steps(steps, keys)
+    skip: Dict[str, str] = {}
+    if resume:
+        now = time.time()
+        skip = {key: f"completed {_format_age(now - record['at'])} ago"
+                for key, record in journal.completed().items()}
+        if skip:
+            print(f"Resuming previous run: {len(skip)} step(s) already completed.\n")
+    else:
+        journal.reset()
+
+    budget = None
+    budget_seconds = budget_seconds or CONSTANTS['RUN_BUDGET_SECONDS']
+    if budget_seconds:
+        budget = DeadlineBudget(budget_seconds, journal.durations())
+        print(f"Time budget: {budget_seconds:.0f}s\n")
+
+    mark = tracer.mark()
+    started = time.perf_counter()
+    with tracer.span("automatic setup", 'run'):
+        results = run_step_graph(steps, max_workers=max_workers or CONSTANTS['MAX_PARALLEL_STEPS'],
+                                 skip=skip, on_complete=journal.record, step_timeout=step_timeout,
+                                 budget=budget)
+    journal.compact()
+    print_step_summary(steps, results, time.perf_counter() - started)
+    tracer.print_slowest(mark)
+
+    try:
+        trace_path = tracer.export_chrome_trace(CONSTANTS['CHROME_TRACE_FILE'], mark)
+        print(f"\nTrace written to {os.path.abspath(trace_path)} (open in chrome://tracing or ui.perfetto.dev)")
+    except OSError as e:
+        logger.warning(f"Could not write Chrome trace: {e}")
+
+    print_separator("AUTOMATIC SETUP COMPLETED")
+    return results
+
+# ---------------------------
+# Fleet mode
+# ---------------------------
+
+# Remote equivalents of the local steps, executed through PowerShell remoting.
+# A script reports failure by throwing; native tools also fail it with a non-zero $LASTEXITCODE.
+_FLEET_SCCM_SCRIPT = "; ".join(
+    f"$r = Invoke-WmiMethod -Namespace root\\ccm -Class SMS_CLIENT -Name TriggerSchedule "
+    f"-ArgumentList '{cycle_id}' -ErrorAction Stop; "
+    f"if ($r.ReturnValue -ne 0) {{ throw \"{name}: ReturnValue $($r.ReturnValue)\" }}"
+    for name, cycle_id in CYCLE_IDS.items()
+)
+
+# Same plan as the local power step: reuse or create Ultimate Performance, else High Performance.
+_FLEET_POWER_SCRIPT = (
+    "$names = @(" + ", ".join(f"'{name}'" for name in CONSTANTS['ULTIMATE_PERFORMANCE_NAMES']) + "); "
+    "$guid = $null; "
+    "foreach ($line in (powercfg /LIST)) { "
+    "if ($line -match '([0-9a-fA-F-]{36})\\s+\\((.*?)\\)' -and "
+    f"($names -contains $matches[2].Trim().ToLower() -or $matches[1] -eq '{CONSTANTS['ULTIMATE_PERFORMANCE_GUID']}')) "
+    "{ $guid = $matches[1]; break } }; "
+    f"if (-not $guid -and ((powercfg /DUPLICATESCHEME {CONSTANTS['ULTIMATE_PERFORMANCE_GUID']}) | Out-String) "
+    "-match '([0-9a-fA-F-]{36})') { $guid = $matches[1] }; "
+    "$active = $false; "
+    "if ($guid) { powercfg /S $guid; $active = $LASTEXITCODE -eq 0 }; "
+    f"if (-not $active) {{ powercfg /S {CONSTANTS['HIGH_PERFORMANCE_GUID']}; "
+    "if ($LASTEXITCODE -ne 0) { throw 'no power scheme could be activated' } }; "
+    "foreach ($setting in " + ", ".join(f"'{alias}-{mode}'" for alias in POWER_SETTING_GUIDS for mode in ('ac', 'dc'))
+    + ") { powercfg /change $setting 0; if ($LASTEXITCODE -ne 0) { throw \"powercfg /change $setting failed\" } }"
+)
+
+FLEET_REMOTE_COMMANDS = {
+    "gpupdate": "gpupdate /force",
+    "sccm": _FLEET_SCCM_SCRIPT,
+    "power": _FLEET_POWER_SCRIPT,
+    "printer": "; ".join(f"rundll32 printui.dll,PrintUIEntry /in /q /n'{queue}'" for queue in printer_queues()),
+    "symantec": f"if (Test-Path '{CONSTANTS['SYMANTEC_PATH']}') {{ & '{CONSTANTS['SYMANTEC_PATH']}' /u }}",
+}
+
+# Inventory host names end up in a PowerShell command line, so only DNS names and IPv4 addresses are allowed.
+_FLEET_HOST_PATTERN = re.compile(r'^[A-Za-z0-9](?:[A-Za-z0-9.-]{0,252}[A-Za-z0-9])?$')
+
+@dataclass
+class FleetHost:
+    """One inventory line: a host name and the transport used to reach it."""
+    name: str
+    transport: str
+
+@dataclass
+class HostOpResult:
+    """Result of one operation on one host; skipped operations count as ok."""
+    ok: bool
+    detail: str = ""
+    skipped: bool = False
+    started: float = 0.0
+    finished: float = 0.0
+
+class HostTransport(ABC):
+    """Runs setup operations against a host; subclass and register in FLEET_TRANSPORTS."""
+
+    name = "base"
+
+    def supports(self, op_key: str) -> bool:
+        """Whether this transport can run op_key; unsupported operations are reported as skipped."""
+        return True
+
+    @abstractmethod
+    async def run_operation(self, host: FleetHost, op_key: str) -> HostOpResult:
+        """Run one operation on host."""
+
+class WinRMTransport(HostTransport):
+    """Execute the remote equivalent of each step with PowerShell Invoke-Command."""
+
+    name = "winrm"
+
+    def supports(self, op_key: str) -> bool:
+        return op_key in FLEET_REMOTE_COMMANDS
+
+    async def run_operation(self, host: FleetHost, op_key: str) -> HostOpResult:
+        script = FLEET_REMOTE_COMMANDS.get(op_key)
+        if script is None:
+            return HostOpResult(False, f"'{op_key}' is not supported remotely")
+        if not _FLEET_HOST_PATTERN.match(host.name):
+            return HostOpResult(False, f"invalid host name '{host.name}'")
+        # `exit` inside a remote ScriptBlock ends the remote pipeline, not this process,
+        # so the ScriptBlock returns its exit code (1 when the script threw) and the
+        # local session exits with it.
+        command = (f"$r = Invoke-Command -ComputerName '{host.name}' -ErrorAction Stop -ScriptBlock {{ "
+                   f"try {{ $output = & {{ {script} }} 2>&1 | Out-String; "
+                   "@{ Output = $output; ExitCode = $LASTEXITCODE } } "
+                   "catch { @{ Output = $_.Exception.Message; ExitCode = 1 } } }; "
+                   "Write-Output $r.Output; exit [int]$r.ExitCode")
+        process = await asyncio.create_subprocess_exec(
+            "powershell", "-NoProfile", "-NonInteractive", "-Command", command,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+            raise
+        output = (stderr or stdout).decode('cp857', errors='replace').strip()
+        return HostOpResult(process.returncode == 0, output.splitlines()[-1] if output else "")
+
+class LocalTransport(HostTransport):
+    """Run the regular in-process step functions on this machine (for 'localhost' entries)."""
+
+    name = "local"
+
+    def supports(self, op_key: str) -> bool:
+        return op_key in {step.key for step in build_setup_steps()}
+
+    async def run_operation(self, host: FleetHost, op_key: str) -> HostOpResult:
+        steps = {step.key: step for step in build_setup_steps()}
+        if op_key not in steps:
+            return HostOpResult(False, f"unknown operation '{op_key}'")
+        outcome = await asyncio.to_thread(steps[op_key].operation)
+        return HostOpResult(outcome is True)
+
+FLEET_TRANSPORTS: Dict[str, Callable[[], HostTransport]] = {
+    WinRMTransport.name: WinRMTransport,
+    LocalTransport.name: LocalTransport,
+}
+
+def load_inventory(path: str) -> List[FleetHost]:
+    """Read `host [transport]` lines; blank lines and '#' comments are ignored."""
+    hosts: List[FleetHost] = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].replace(',', ' ').split()
+            if not fields:
+                continue
+            transport = fields[1].lower() if len(fields) > 1 else CONSTANTS['FLEET_DEFAULT_TRANSPORT']
+            if transport not in FLEET_TRANSPORTS:
+                raise ValueError(f"{path}:{line_no}: unknown transport '{transport}'")
+            if not _FLEET_HOST_PATTERN.match(fields[0]):
+                raise ValueError(f"{path}:{line_no}: invalid host name '{fields[0]}'")
+            if fields[0].lower() in seen:
+                logger.warning(f"Duplicate inventory host ignored: {fields[0]}")
+                continue
+            seen.add(fields[0].lower())
+            hosts.append(FleetHost(fields[0], transport))
+    return hosts
+
+class FleetOrchestrator:
+    """Run the setup operations across many hosts with bounded concurrency.
+
+    Hosts are served first-come first-served from a queue by `max_hosts` workers,
+    and each host runs its operations in dependency order.
+    """
+
+    def __init__(self, hosts: List[FleetHost], op_keys: List[str], max_hosts: Optional[int] = None,
+                 transports: Optional[Dict[str, HostTransport]] = None,
+                 op_timeout: Optional[float] = None) -> None:
+        self.hosts = hosts
+        self.op_keys = op_keys
+        self.max_hosts = max_hosts or CONSTANTS['FLEET_MAX_HOSTS']
+        self.op_timeout = op_timeout or CONSTANTS['FLEET_OP_TIMEOUT']
+        self.transports = transports or {}
+        self.results: Dict[str, Dict[str, HostOpResult]] = {host.name: {} for host in hosts}
+        self.current: Dict[str, str] = {}
+
+    def _transport(self, name: str) -> HostTransport:
+        if name not in self.transports:
+            self.transports[name] = FLEET_TRANSPORTS[name]()
+        return self.transports[name]
+
+    async def _run_host(self, host: FleetHost) -> None:
+        transport = self._transport(host.transport)
+        for op_key in self.op_keys:
+            if not transport.supports(op_key):
+                self.results[host.name][op_key] = HostOpResult(
+                    True, f"not supported over {transport.name}", skipped=True)
+                logger.info(f"Fleet {host.name} - {op_key} skipped: not supported over {transport.name}")
+                continue
+            self.current[host.name] = op_key
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(transport.run_operation(host, op_key), self.op_timeout)
+            except asyncio.TimeoutError:
+                result = HostOpResult(False, f"timed out after {self.op_timeout}s")
+            except Exception as e:
+                result = HostOpResult(False, str(e))
+            result.started, result.finished = started, time.perf_counter()
+            self.results[host.name][op_key] = result
+            if not result.ok:
+                logger.warning(f"Fleet {host.name} - {op_key} failed: {result.detail}")
+        self.current.pop(host.name, None)
+
+    async def _worker(self, queue: "asyncio.Queue[FleetHost]") -> None:
+        while True:
+            try:
+                host = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await self._run_host(host)
+
+    def progress_rows(self) -> List[str]:
+        """Aggregated per-operation counts plus an overall host line."""
+        rows = [f"{'Operation':<12}{'OK':>6}{'Failed':>8}{'Skipped':>9}{'Running':>9}{'Pending':>9}"]
+        for op_key in self.op_keys:
+            done = [r[op_key] for r in self.results.values() if op_key in r]
+            skipped = sum(1 for r in done if r.skipped)
+            ok = sum(1 for r in done if r.ok) - skipped
+            failed = len(done) - ok - skipped
+            running = sum(1 for op in self.current.values() if op == op_key)
+            pending = len(self.hosts) - len(done) - running
+            rows.append(f"{op_key:<12}{ok:>6}{failed:>8}{skipped:>9}{running:>9}{pending:>9}")
+        finished = sum(1 for name, r in self.results.items() if len(r) == len(self.op_keys))
+        rows.append(f"Hosts finished: {finished}/{len(self.hosts)}  active: {len(self.current)}")
+        return rows
+
+    async def _render(self, stop: "asyncio.Event") -> None:
+        drawn = 0
+        live = sys.stdout.isatty()
+        while True:
+            rows = self.progress_rows()
+            if live:
+                if drawn:
+                    print(f"\x1b[{drawn}F", end='')
+                print("\n".join(f"{row}\x1b[K" for row in rows), flush=True)
+                drawn = len(rows)
+            if stop.is_set():
+                if not live:
+                    print("\n".join(rows))
+                return
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop.wait(), CONSTANTS['FLEET_REFRESH_SECONDS'])
+
+    async def run(self, show_progress: bool = True) -> Dict[str, Dict[str, HostOpResult]]:
+        queue: "asyncio.Queue[FleetHost]" = asyncio.Queue()
+        for host in self.hosts:
+            queue.put_nowait(host)
+        stop = asyncio.Event()
+        renderer = asyncio.create_task(self._render(stop)) if show_progress else None
+        try:
+            await asyncio.gather(*(self._worker(queue) for _ in range(min(self.max_hosts, len(self.hosts)))))
+        finally:
+            stop.set()
+            if renderer:
+                await renderer
+        return self.results
+
+    def write_matrix(self, path: str) -> None:
+        """Write a host x operation CSV with ✓/✗/skipped cells, total seconds and failure details."""
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(["host"] + self.op_keys + ["seconds", "errors"])
+            for host in self.hosts:
+                results = self.results[host.name]
+                cells = ["-" if k not in results else "skipped" if results[k].skipped
+                         else "✓" if results[k].ok else "✗" for k in self.op_keys]
+                seconds = sum(r.finished - r.started for r in results.values())
+                errors = "; ".join(f"{k}: {r.detail}" for k, r in results.items() if not r.ok and r.detail)
+                writer.writerow([host.name] + cells + [f"{seconds:.1f}", errors])
+
+def run_fleet_setup(inventory_path: str, output_path: Optional[str] = None,
+                    max_hosts: Optional[int] = None) -> bool:
+    """Run the automatic setup operations on every host in an inventory file."""
+    print_separator("FLEET SETUP")
+    try:
+        hosts = load_inventory(inventory_path)
+    except (OSError, ValueError) as e:
+        logger.error(f"Inventory error: {e}")
+        print(f"❌ Could not read inventory: {e}")
+        print_separator()
+        return False
+
+    if not hosts:
+        print("Inventory is empty.")
+        print_separator()
+        return False
+
+    op_keys = [step.key for step in order_steps(build_setup_steps())]
+    orchestrator = FleetOrchestrator(hosts, op_keys, max_hosts)
+    print(f"Hosts: {len(hosts)}  Concurrency: {orchestrator.max_hosts}  Operations: {', '.join(op_keys)}\n")
+
+    started = time.perf_counter()
+    asyncio.run(orchestrator.run())
+    elapsed = time.perf_counter() - started
+
+    output_path = output_path or os.path.splitext(inventory_path)[0] + "_results.csv"
+    orchestrator.write_matrix(output_path)
+    failed_hosts = [name for name, r in orchestrator.results.items() if not all(x.ok for x in r.values())]
+    skipped = sum(1 for r in orchestrator.results.values() for x in r.values() if x.skipped)
+    print(f"\nCompleted in {elapsed:.1f}s. Failed hosts: {len(failed_hosts)}")
+    if skipped:
+        print(f"Skipped {skipped} operation(s) the host's transport cannot run (see the result matrix)")
+    print(f"Result matrix: {output_path}")
+    print_separator()
+    return not failed_hosts
+
+# ---------------------------
+# Background jobs
+# ---------------------------
+
+# Menu options that can run as background jobs (the others prompt for input or take over the console).
+BACKGROUND_MENU_KEYS = ("2", "3", "4", "5", "6", "7", "9")
+
+# Setup steps each menu option performs. While a job performs a step, no other job
+# or foreground option performing that step may start (no overlapping gpupdate runs).
+MENU_STEP_KEYS: Dict[str, Tuple[str, ...]] = {
+    "1": ("support", "gpupdate", "sccm", "power", "printer", "symantec"),
+    "2": ("support",),
+    "3": ("sccm",),
+    "4": ("power",),
+    "5": ("printer",),
+    "6": ("symantec",),
+    "7": ("gpupdate",),
+    "12": ("sccm",),
+    "13": ("support", "gpupdate", "sccm", "power", "printer", "symantec"),
+}
+
+class _JobOutput(io.TextIOBase):
+    """Keeps the last lines a job printed; a carriage return overwrites the current line like a console."""
+
+    def __init__(self, max_lines: int) -> None:
+        super().__init__()
+        self._lines: deque = deque(maxlen=max_lines)
+        self._partial = ""
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            *complete, self._partial = re.split(r'\r?\n', self._partial + text)
+            for line in complete:
+                line = line.rsplit('\r', 1)[-1]
+                if line.strip():
+                    self._lines.append(line.rstrip())
+            self._partial = self._partial.rsplit('\r', 1)[-1]
+        return len(text)
+
+    def tail(self, count: int) -> List[str]:
+        with self._lock:
+            lines = list(self._lines)
+            if self._partial.strip():
+                lines.append(self._partial.rstrip())
+        return lines[-count:]
+
+@dataclass
+class Job:
+    """A menu operation running in the background.
+
+    status is 'queued', 'running', 'cancelling', 'done', 'failed' or 'cancelled'.
+    """
+    id: int
+    name: str
+    operation: Callable[[], Optional[bool]]
+    output: _JobOutput
+    steps: Tuple[str, ...] = ()
+    status: str = 'queued'
+    submitted: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: str = ""
+    cancel: threading.Event = field(default_factory=threading.Event)
+    future: Optional[object] = None
+    announced: bool = False
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running', 'cancelling')
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+class JobManager:
+    """Runs menu operations on at most `max_concurrent` worker threads while the menu stays usable.
 
-    for i, (description, operation) in enumerate(operations, 1):
-        print(f"{i} -> {description}")
+    Each job's print() output is captured into its own tail buffer. Cancelling
+    sets the job's cancel event: streamed commands are killed, downloads stop,
+    and no new command is started; a command already running without streaming
+    finishes on its own timeout first.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None) -> None:
+        self.max_concurrent = max_concurrent or CONSTANTS['JOB_MAX_CONCURRENT']
+        self.jobs: List[Job] = []
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="job")
+        self._lock = threading.RLock()
+        self._router: Optional[_StepOutputRouter] = None
+        self._original_stdout = None
+
+    def conflict(self, name: str, steps: Tuple[str, ...] = ()) -> Optional[Job]:
+        """The active job with this name or performing any of these setup steps, if there is one."""
+        with self._lock:
+            return next((job for job in self.jobs
+                         if job.active and (job.name == name or set(job.steps) & set(steps))), None)
+
+    def submit(self, name: str, operation: Callable[[], Optional[bool]], steps: Tuple[str, ...] = ()) -> Job:
+        """Queue operation as a job; raises ValueError if an active job has that name or shares a step."""
+        with self._lock:
+            running = self.conflict(name, steps)
+            if running is not None:
+                raise ValueError(f"'{running.name}' is already running in the background (job {running.id})")
+            if self._router is None:
+                self._original_stdout = sys.stdout
+                sys.stdout = self._router = _StepOutputRouter(sys.stdout)
+            job = Job(len(self.jobs) + 1, name, operation, _JobOutput(CONSTANTS['JOB_TAIL_LINES']), steps)
+            self.jobs.append(job)
+        job.future = self._executor.submit(self._run, job)
+        logger.info(f"Background job {job.id} submitted: {name}")
+        return job
+
+    def _run(self, job: Job) -> None:
+        with self._lock:
+            if job.cancel.is_set():
+                job.status, job.finished = 'cancelled', time.monotonic()
+                return
+            job.status, job.started = 'running', time.monotonic()
+        self._router.share_capture(job.output)
         try:
-            operation()
+            with cancel_scope(job.cancel), tracer.span(job.name, 'job'):
+                outcome = job.operation()
+            # An operation that still succeeded after a late cancel keeps its real outcome.
+            status = 'done' if outcome is not False else 'cancelled' if job.cancel.is_set() else 'failed'
+        except OperationCancelled:
+            status = 'cancelled'
         except Exception as e:
-            logger.error(f"Automatic setup error - {description}: {e}")
-            print(f"❌ Error during: {description} -> {e}")
-        print()
+            logger.error(f"Background job error - {job.name}: {e}")
+            print(f"❌ Error during operation: {e}")
+            job.error, status = str(e), 'failed'
+        finally:
+            self._router.share_capture(None)
+        with self._lock:
+            job.status, job.finished = status, time.monotonic()
+        logger.info(f"Background job {job.id} {status} after {job.elapsed:.1f}s: {job.name}")
 
-    print_separator("AUTOMATIC SETUP COMPLETED")
+    def get(self, job_id: int) -> Optional[Job]:
+        return next((job for job in self.jobs if job.id == job_id), None)
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job; False if there is no such active job."""
+        job = self.get(job_id)
+        with self._lock:
+            if job is None or not job.active:
+                return False
+            job.cancel.set()
+            if job.status == 'queued' and job.future.cancel():
+                job.status, job.finished = 'cancelled', time.monotonic()
+            elif job.status == 'running':
+                job.status = 'cancelling'
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for job in self.jobs:
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def take_finished(self) -> List[Job]:
+        """Jobs that finished since the last call (for one-time notices in the menu)."""
+        with self._lock:
+            finished = [job for job in self.jobs if not job.active and not job.announced]
+            for job in finished:
+                job.announced = True
+        return finished
+
+    def shutdown(self) -> None:
+        """Cancel every active job and put stdout back."""
+        for job in self.jobs:
+            if job.active:
+                self.cancel(job.id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._router is not None and sys.stdout is self._router:
+            sys.stdout = self._original_stdout
+
+def _job_mark(job: Job) -> str:
+    return {'done': "✓", 'failed': "✗", 'cancelled': "✗"}.get(job.status, "…")
+
+def show_jobs(manager: JobManager) -> None:
+    """Jobs view: status, elapsed time and output tail per job, with cancel and full-output commands."""
+    while True:
+        print_separator("BACKGROUND JOBS")
+        if not manager.jobs:
+            print("No background jobs.")
+            print_separator()
+            return
+
+        for job in manager.jobs:
+            print(f"{_job_mark(job)} [{job.id}] {job.name:<36} {job.status:<10} {job.elapsed:7.1f}s")
+            lines = [line for line in job.output.tail(CONSTANTS['JOB_TAIL_LINES']) if line.strip(' -')]
+            for line in lines[-CONSTANTS['JOB_VIEW_LINES']:]:
+                print(f"      {line.strip()[:100]}")
+        print_separator()
+
+        command = input("c <id> cancel, o <id> show output, Enter refresh, 0 back: ").strip().lower().split()
+        if command == ["0"]:
+            return
+        if len(command) != 2 or command[0] not in ('c', 'o') or not command[1].isdigit():
+            continue
+        job = manager.get(int(command[1]))
+        if job is None:
+            print(f"No job {command[1]}.")
+        elif command[0] == 'c':
+            print(f"Cancelling job {job.id}..." if manager.cancel(job.id) else f"Job {job.id} is not running.")
+        else:
+            print_separator(f"JOB {job.id} - {job.name}")
+            for line in job.output.tail(CONSTANTS['JOB_TAIL_LINES']):
+                print(line)
+            wait_for_enter()
 
 # ---------------------------
 # Main menu
@@ -608,27 +4966,71 @@ def main_menu() -> None:
         "7": ("Update Group Policy", update_group_policy),
         "8": ("Manual File Copy", None),  # calls copy_file with prompts
         "9": ("Internet Connectivity Test", lambda: check_internet_connection(True)),
-        "10": ("Clear Console", lambda: os.system('cls'))
+        "10": ("Clear Console", lambda: os.system('cls')),
+        "11": ("Fleet Setup (Inventory File)", None),  # calls run_fleet_setup with prompts
+        "12": ("Trigger Selected SCCM Cycles", trigger_selected_sccm_cycles),
+        "13": ("Automatic Setup (Resume Previous Run)", lambda: run_full_automatic_setup(resume=True)),
+        "14": ("Share Package Cache with LAN Peers", serve_package_cache),
+        "15": ("Background Jobs", None),  # calls show_jobs
     }
+    jobs = JobManager()
+    try:
+        _menu_loop(menu_options, jobs)
+    finally:
+        jobs.shutdown()
 
+def _menu_loop(menu_options: Dict[str, Tuple[str, Optional[Callable]]], jobs: JobManager) -> None:
     while True:
+        for job in jobs.take_finished():
+            print(f"{_job_mark(job)} Background job {job.id} {job.status}: {job.name} ({job.elapsed:.1f}s)")
         for key, (description, _) in menu_options.items():
             print(f"{key}. {description}")
         print("0. Exit")
+        counts = jobs.counts()
+        if counts.get('running') or counts.get('queued') or counts.get('cancelling'):
+            print(f"Background: {counts.get('running', 0) + counts.get('cancelling', 0)} running, "
+                  f"{counts.get('queued', 0)} queued (15 to view)")
+        print(f"Add 'b' to run {', '.join(BACKGROUND_MENU_KEYS)} in the background (e.g. 7b).")
 
         choice = input("Your choice: ").strip()
 
-        if choice in menu_options:
+        if choice.lower().endswith('b') and choice[:-1] in menu_options:
+            key = choice[:-1]
+            if key not in BACKGROUND_MENU_KEYS:
+                print(f"Option {key} cannot run in the background.")
+                continue
+            description, operation = menu_options[key]
+            try:
+                job = jobs.submit(description, operation, MENU_STEP_KEYS.get(key, ()))
+                print(f"Started background job {job.id}: {description}")
+            except ValueError as e:
+                print(f"❌ {e}")
+
+        elif choice in menu_options:
             description, operation = menu_options[choice]
+            running = jobs.conflict(description, MENU_STEP_KEYS.get(choice, ()))
+            if running is not None:
+                print(f"✗ '{running.name}' is running in the background (job {running.id}). "
+                      f"Wait for it or cancel it from option 15.")
+                continue
 
             if choice == "8":
-                src = input("Enter source file path: ").strip()
+                src = input("Enter source file or folder path: ").strip()
                 dst = input("Enter destination folder path: ").strip()
                 if src and dst:
-                    copy_file(src, dst)
+                    verify = input("Verify unchanged files by hash? (y/N): ").strip().lower() == 'y'
+                    copy_file(src, dst, verify_hash=verify)
+            elif choice == "11":
+                inventory = input("Enter inventory file path: ").strip()
+                if inventory:
+                    run_fleet_setup(inventory)
+                    wait_for_enter()
+            elif choice == "15":
+                show_jobs(jobs)
             elif operation:
                 try:
-                    operation()
+                    with tracer.span(description, 'menu'):
+                        operation()
                     if choice != "10":
                         wait_for_enter()
                 except Exception as e:
@@ -641,6 +5043,9 @@ def main_menu() -> None:
             break
         elif choice == "0":
             print("Exiting...")
+            jobs.shutdown()
+            stop_prefetch()
+            stop_logging()
             try:
                 os.system('taskkill /f /im cmd.exe')
             except Exception:
@@ -653,13 +5058,163 @@ def main_menu() -> None:
 # Entrypoint
 # ---------------------------
 
-if __name__ == "__main__":
+EXIT_OK = 0
+EXIT_STEP_FAILED = 1
+EXIT_USAGE = 2
+EXIT_TIMEOUT = 3
+EXIT_DEFERRED = 4
+
+def build_arg_parser():
+    """Command-line options for unattended runs; with no options the interactive menu starts."""
+    import argparse
+
+    step_keys = ", ".join(step.key for step in build_setup_steps(SystemFacts()))
+    parser = argparse.ArgumentParser(
+        description="TT automatic workstation setup.",
+        epilog=f"Steps: {step_keys}. Exit codes: {EXIT_OK} all steps succeeded, "
+               f"{EXIT_STEP_FAILED} a step failed, {EXIT_USAGE} invalid arguments, "
+               f"{EXIT_TIMEOUT} a step timed out, {EXIT_DEFERRED} steps were deferred by --budget.")
+    run = parser.add_argument_group("unattended setup")
+    run.add_argument("--all", action="store_true", help="run every setup step")
+    run.add_argument("--steps", metavar="KEYS", help="comma-separated steps to run, e.g. gpupdate,sccm")
+    run.add_argument("--list-steps", action="store_true", help="list step keys and exit")
+    mode = run.add_mutually_exclusive_group()
+    mode.add_argument("--serial", action="store_true", help="run steps one at a time")
+    mode.add_argument("--parallel", type=int, metavar="N",
+                      help=f"run up to N steps at once (default {CONSTANTS['MAX_PARALLEL_STEPS']})")
+    run.add_argument("--step-timeout", type=float, metavar="SECONDS", help="fail any step running longer")
+    run.add_argument("--budget", type=float, metavar="SECONDS",
+                     help="time budget for the whole run; per-step timeouts adapt to past durations")
+    run.add_argument("--wait-cycles", action="store_true",
+                     help="after triggering SCCM cycles, wait until the client logs show them finished")
+    run.add_argument("--resume", action="store_true",
+                     help="skip steps that succeeded in a recent interrupted run")
+    run.add_argument("--json", metavar="PATH", nargs="?", const="-",
+                     help="write results as JSON to PATH, or to stdout with step output moved to stderr")
+
+    tools = parser.add_argument_group("tools")
+    tools.add_argument("--serve-cache", action="store_true", help="share the package cache with LAN peers")
+    tools.add_argument("--write-manifest", metavar="PATH",
+                       help="record the hashes of cached packages in a manifest for TTAS_PATCH_MANIFEST")
+    tools.add_argument("--pin-package", metavar="NAME",
+                       help=f"keep a cached package from eviction ({', '.join(URLS)} or a URL)")
+    tools.add_argument("--unpin-package", metavar="NAME", help="allow a pinned package to be evicted again")
+    tools.add_argument("--make-patch", nargs=3, metavar=("OLD", "NEW", "PATCH"),
+                       help="write a delta patch that turns OLD into NEW")
+    tools.add_argument("--apply-patch", nargs=3, metavar=("OLD", "PATCH", "OUT"),
+                       help="rebuild a file from OLD and a delta patch")
+    return parser
+
+def run_headless(args) -> int:
+    """Run the selected steps without prompts and return the process exit code."""
+    if args.list_steps:
+        for step in build_setup_steps(SystemFacts()):
+            after = f" (after {', '.join(step.depends_on)})" if step.depends_on else ""
+            print(f"{step.key:<10} {step.description}{after}")
+        return EXIT_OK
+
+    keys = [key.strip() for key in args.steps.split(",") if key.strip()] if args.steps else None
+    if keys:
+        try:
+            select_steps(build_setup_steps(SystemFacts()), keys)
+        except ValueError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            return EXIT_USAGE
+    max_workers = 1 if args.serial else args.parallel
+    CONSTANTS['INTERACTIVE'] = False
+    if args.wait_cycles:
+        CONSTANTS['CYCLE_WAIT'] = True
+    started = time.perf_counter()
+    # JSON on stdout must stay parseable, so step chatter moves to stderr.
+    with contextlib.redirect_stdout(sys.stderr) if args.json == "-" else contextlib.nullcontext():
+        results = run_full_automatic_setup(resume=args.resume, keys=keys, max_workers=max_workers,
+                                           step_timeout=args.step_timeout, budget_seconds=args.budget)
+
+    if any(result.timed_out for result in results.values()):
+        exit_code = EXIT_TIMEOUT
+    elif any(not result.ok and not result.deferred for result in results.values()):
+        exit_code = EXIT_STEP_FAILED
+    elif any(result.deferred for result in results.values()):
+        exit_code = EXIT_DEFERRED
+    else:
+        exit_code = EXIT_OK
+
+    if args.json is not None:
+        report = {
+            'ok': exit_code == EXIT_OK,
+            'exit_code': exit_code,
+            'wall_seconds': round(time.perf_counter() - started, 3),
+            'facts': asdict(get_system_facts()),
+            'steps': [{'key': r.key, 'description': r.description, 'ok': r.ok, 'skipped': r.skipped,
+                       'timed_out': r.timed_out, 'deferred': r.deferred, 'error': r.error,
+                       'seconds': round(r.duration, 3)}
+                      for r in results.values()],
+        }
+        text = json.dumps(report, indent=2)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                f.write(text + "\n")
+    return exit_code
+
+def run_patch_tool(args) -> int:
+    """Offline delta patch generation/application for the patch manifest."""
     try:
-        main_menu()
-    except KeyboardInterrupt:
-        print("\n\nProgram terminated by user.")
-        sys.exit(0)
-    except Exception as e:
-        logger.critical(f"Critical error: {e}")
-        print(f"Critical error: {e}")
-        sys.exit(1)
+        if args.make_patch:
+            old_path, new_path, patch_path = args.make_patch
+            stats = make_patch(old_path, new_path, patch_path)
+            print(f"✓ Patch written: {patch_path} ({os.path.getsize(patch_path) / (1024 * 1024):.2f}MB; "
+                  f"{stats['copied'] / (1024 * 1024):.1f}MB reused, {stats['inserted'] / (1024 * 1024):.1f}MB new)")
+            print(json.dumps({'from': _file_sha256(old_path), 'sha256': _file_sha256(patch_path),
+                              'target_sha256': _file_sha256(new_path)}, indent=2))
+        else:
+            old_path, patch_path, out_path = args.apply_patch
+            size, sha256 = apply_patch(old_path, patch_path, out_path)
+            print(f"✓ Rebuilt {out_path} ({size} bytes, sha256 {sha256})")
+    except (OSError, ValueError, struct.error) as e:
+        print(f"✗ Patch failed: {e}", file=sys.stderr)
+        return EXIT_STEP_FAILED
+    return EXIT_OK
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Dispatch command-line options, falling back to the interactive menu."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        if CONSTANTS['PREFETCH']:
+            start_prefetch()
+        try:
+            main_menu()
+        except KeyboardInterrupt:
+            print("\n\nProgram terminated by user.")
+        except Exception as e:
+            logger.critical(f"Critical error: {e}")
+            print(f"Critical error: {e}")
+            return 1
+        finally:
+            stop_prefetch()
+        return 0
+
+    args = build_arg_parser().parse_args(argv)
+    if args.serve_cache:
+        serve_package_cache()
+        return EXIT_OK
+    if args.write_manifest:
+        return EXIT_OK if write_package_manifest(args.write_manifest) else EXIT_STEP_FAILED
+    if args.pin_package or args.unpin_package:
+        ok = pin_package(args.pin_package, True) if args.pin_package else pin_package(args.unpin_package, False)
+        return EXIT_OK if ok else EXIT_USAGE
+    if args.make_patch or args.apply_patch:
+        return run_patch_tool(args)
+    if args.all or args.steps or args.list_steps:
+        try:
+            return run_headless(args)
+        except KeyboardInterrupt:
+            print("\nInterrupted.", file=sys.stderr)
+            return EXIT_STEP_FAILED
+    build_arg_parser().print_usage(sys.stderr)
+    print("Choose --all or --steps, or run without options for the menu.", file=sys.stderr)
+    return EXIT_USAGE
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import email.utils
+import hashlib
+import http.server
+import logging
+import os
+import random
+import re
+import socket
+import sys
+import threading
+from typing import List
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+# Tests log through pytest's capture instead of the writer thread and auto_setup.log.
+main.stop_logging()
+logging.getLogger().handlers[:] = []
+
+
+class RangeOrigin:
+    """Loopback HTTP server for one payload, with HEAD, ETag/Last-Modified, 304 and optional Range support.
+
+    Each entry in `faults` breaks the next ranged GET: 0 drops the connection
+    before any response, n > 0 sends the headers and n body bytes, then drops it.
+    """
+
+    def __init__(self, size: int = 4 * 1024 * 1024, ranges: bool = True, validators: bool = True) -> None:
+        self.payload = random.Random(size).randbytes(size)
+        self.sha256 = hashlib.sha256(self.payload).hexdigest()
+        self.etag = f'"{self.sha256[:16]}"'
+        self.last_modified = 'Sun, 18 Oct 2026 09:00:00 GMT'
+        self.faults: List[int] = []
+        self.ranged_gets = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        origin = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _unchanged(self) -> bool:
+                if 'If-None-Match' in self.headers:
+                    return origin.etag in [tag.strip() for tag in self.headers['If-None-Match'].split(',')]
+                since = self.headers.get('If-Modified-Since')
+                return bool(since) and (email.utils.parsedate_to_datetime(since) >=
+                                        email.utils.parsedate_to_datetime(origin.last_modified))
+
+            def _respond(self, with_body: bool) -> None:
+                if validators and self._unchanged():
+                    with origin._lock:
+                        origin.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', origin.etag)
+                    self.end_headers()
+                    return
+                start, end = 0, len(origin.payload) - 1
+                match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', '')) if ranges else None
+                fault = None
+                if match and with_body:
+                    with origin._lock:
+                        origin.ranged_gets += 1
+                        fault = origin.faults.pop(0) if origin.faults else None
+                if fault == 0:
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                if match:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) if match.group(2) else end
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{len(origin.payload)}')
+                else:
+                    self.send_response(200)
+                if ranges:
+                    self.send_header('Accept-Ranges', 'bytes')
+                if validators:
+                    self.send_header('ETag', origin.etag)
+                    self.send_header('Last-Modified', origin.last_modified)
+                self.send_header('Content-Length', str(end - start + 1))
+                self.end_headers()
+                if not with_body:
+                    return
+                body = memoryview(origin.payload)[start:end + 1]
+                if fault:
+                    body = body[:fault]
+                try:
+                    self.wfile.write(body)
+                    self.wfile.flush()
+                except ConnectionError:
+                    return
+                with origin._lock:
+                    origin.bytes_sent += len(body)
+                if fault:
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+
+            def do_HEAD(self) -> None:
+                self._respond(False)
+
+            def do_GET(self) -> None:
+                self._respond(True)
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/softpaq.exe"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def origin():
+    server = RangeOrigin()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Keep every test's autoSetup folder, journal and caches in tmp_path."""
+    monkeypatch.setitem(main.CONSTANTS, 'AUTO_SETUP_DIR', str(tmp_path / 'autoSetup'))
+    monkeypatch.setitem(main.CONSTANTS, 'PEER_CACHE_PEERS', [])
+    monkeypatch.setitem(main.CONSTANTS, 'PEER_DISCOVERY', False)
+    monkeypatch.setitem(main.CONSTANTS, 'PATCH_MANIFEST', None)
+    monkeypatch.setattr(main.tracer, 'path', None)
+    monkeypatch.setattr(main.journal, 'path', str(tmp_path / 'journal'))
+    for name in ('_package_cache', '_discovered_peers', '_system_facts'):
+        monkeypatch.setattr(main, name, None)
+    main._connectivity_cache.clear()
+    yield tmp_path
@@ -0,0 +1,26 @@
+import main
+
+
+def _record(key, ok, duration, timed_out=False):
+    main.journal.record(main.StepResult(key, key, ok=ok, started=0.0, finished=duration, timed_out=timed_out))
+
+
+def test_allowance_grows_after_a_timeout():
+    for _ in range(5):
+        _record("gpupdate", True, 20.0)
+    before = main.DeadlineBudget(3600, main.journal.durations()).allowance("gpupdate")
+
+    _record("gpupdate", False, before, timed_out=True)
+    after = main.DeadlineBudget(3600, main.journal.durations()).allowance("gpupdate")
+
+    assert before == 25.0
+    assert after == before * (1 + main.CONSTANTS["BUDGET_MARGIN"])
+
+
+def test_quick_failures_are_not_samples():
+    _record("support", True, 120.0)
+    for _ in range(5):
+        _record("support", False, 0.2)
+    _record("support", False, 90.0)
+
+    assert main.journal.durations()["support"] == [120.0, 90.0]
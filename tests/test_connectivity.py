@@ -0,0 +1,61 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    """getaddrinfo stand-in: every name resolves to a local listener; 'slow' waits for `release`."""
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(8)
+    release = threading.Event()
+    lookups = []
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        lookups.append(host)
+        if host == 'slow':
+            release.wait(10)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', listener.getsockname())]
+
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+    yield release, lookups
+    release.set()
+    listener.close()
+
+
+def test_dns_lookup_is_bounded(resolver):
+    started = time.monotonic()
+    probe = main.probe_endpoint('slow', 80, timeout=0.2)
+
+    assert time.monotonic() - started < 2
+    assert not probe.ok and 'timed out' in probe.error
+
+
+def test_probes_do_not_hold_the_lock(resolver):
+    release, lookups = resolver
+    reports = {}
+
+    def probe(name, target):
+        reports[name] = main.probe_connectivity([target], timeout=10)
+
+    first = threading.Thread(target=probe, args=('first', ('slow', 80)))
+    first.start()
+    while 'slow' not in lookups:
+        time.sleep(0.01)
+    second = threading.Thread(target=probe, args=('second', ('slow', 80)))
+    second.start()
+
+    # Another target is probed while the slow one is still resolving.
+    assert main.probe_connectivity([('fast', 80)]).ok
+    assert first.is_alive() and second.is_alive()
+
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert reports['first'].ok and reports['second'] is reports['first']
+    assert lookups.count('slow') == 1
@@ -0,0 +1,50 @@
+import pytest
+
+import main
+from bench.simulation import SimulatedWindows
+
+
+def test_converge_applies_only_what_differs():
+    state = {"a": False, "b": True}
+    applied = []
+
+    def item(name):
+        def apply():
+            applied.append(name)
+            state[name] = True
+        return main.StateItem(name, lambda: state[name], apply)
+
+    assert main.converge([item("a"), item("b")]) == {"a": "applied", "b": "unchanged"}
+    assert main.converge([item("a"), item("b")]) == {"a": "unchanged", "b": "unchanged"}
+    assert applied == ["a"]
+
+
+@pytest.fixture
+def powercfg():
+    """Simulated powercfg that keeps real scheme and timeout state; records every command line."""
+    system = SimulatedWindows(time_scale=0)
+    commands = []
+
+    def backend(command, timeout, encoding):
+        commands.append(command)
+        return system(command, timeout, encoding)
+
+    previous = main.set_command_backend(backend)
+    yield system, commands
+    main.set_command_backend(previous)
+
+
+def test_power_settings_converge_and_then_stay_put(powercfg):
+    system, commands = powercfg
+
+    assert main.optimize_power_settings_and_sleep()
+    assert any("/change" in command for command in commands)
+    schemes, active = dict(system.schemes), system.active
+    assert all(value == 0 for value in system.timeouts[active].values())
+
+    commands.clear()
+    assert main.optimize_power_settings_and_sleep()
+
+    # Only reads the second time: no new plan, no scheme switch, no timeout writes.
+    assert [command.split()[1].upper() for command in commands] == ["/LIST", "/QUERY"]
+    assert system.schemes == schemes and system.active == active
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def tree(tmp_path):
+    src = tmp_path / "src"
+    (src / "drivers" / "audio").mkdir(parents=True)
+    (src / "empty" / "nested").mkdir(parents=True)
+    (src / "setup.ini").write_text("[setup]\n")
+    (src / "drivers" / "audio" / "driver.inf").write_bytes(os.urandom(5000))
+    return src
+
+
+def _copy(src, dst, verify_hash=False):
+    return main._copy_tree(str(src), str(dst), verify_hash, workers=4)
+
+
+def test_second_run_skips_unchanged_files(tree, tmp_path):
+    dst = tmp_path / "dst"
+
+    first = _copy(tree, dst)
+    second = _copy(tree, dst)
+
+    assert (first.copied, first.skipped) == (2, 0)
+    assert (second.copied, second.skipped, second.bytes_copied) == (0, 2, 0)
+    assert (dst / "drivers" / "audio" / "driver.inf").read_bytes() == \
+        (tree / "drivers" / "audio" / "driver.inf").read_bytes()
+
+
+def test_hash_verification_recopies_same_size_same_mtime_changes(tree, tmp_path):
+    dst = tmp_path / "dst"
+    _copy(tree, dst)
+    target = dst / "setup.ini"
+    stat = target.stat()
+    target.write_text("[SETUP]\n")
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert _copy(tree, dst).copied == 0
+    assert _copy(tree, dst, verify_hash=True).copied == 1
+    assert target.read_text() == "[setup]\n"
+
+
+def test_large_files_are_streamed_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setitem(main.CONSTANTS, "COPY_LARGE_FILE", 1024)
+    monkeypatch.setitem(main.CONSTANTS, "COPY_CHUNK_SIZE", 256)
+    src = tmp_path / "big.bin"
+    src.write_bytes(os.urandom(10_000))
+    os.utime(src, (1_700_000_000, 1_700_000_000))
+    dst = tmp_path / "out" / "big.bin"
+    chunks = []
+
+    main._copy_one(str(src), str(dst), src.stat().st_size, chunks.append)
+
+    assert dst.read_bytes() == src.read_bytes()
+    assert len(chunks) == 40 and sum(chunks) == 10_000
+    assert dst.stat().st_mtime == src.stat().st_mtime
+    assert not (tmp_path / "out" / "big.bin.ttcopy").exists()
+
+
+def test_empty_directories_are_recreated(tree, tmp_path):
+    dst = tmp_path / "dst"
+
+    _copy(tree, dst)
+
+    assert (dst / "empty" / "nested").is_dir()
+
+
+def test_symlinked_directories_are_skipped_with_a_warning(tree, tmp_path, caplog):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "secret.txt").write_text("x")
+    try:
+        os.symlink(outside, tree / "link", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("cannot create symlinks here")
+
+    stats = _copy(tree, tmp_path / "dst")
+
+    assert stats.copied == 2
+    assert not (tmp_path / "dst" / "link").exists()
+    assert "symlinked directory" in caplog.text
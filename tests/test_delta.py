@@ -0,0 +1,65 @@
+import hashlib
+import json
+import random
+
+import pytest
+
+import main
+
+
+def _versions(size=3 * 1024 * 1024):
+    """An old file and a new one that shares most of it: edits, an insertion, a deletion and a new tail."""
+    rng = random.Random(23)
+    old = rng.randbytes(size)
+    new = (b"MZ-v2" + old[5:700_000] + rng.randbytes(40_000) + old[700_000:1_500_000]
+           + old[1_600_000:] + rng.randbytes(10_000))
+    return old, new
+
+
+def test_make_and_apply_round_trip(tmp_path):
+    old, new = _versions()
+    (tmp_path / "old.exe").write_bytes(old)
+    (tmp_path / "new.exe").write_bytes(new)
+
+    stats = main.make_patch(str(tmp_path / "old.exe"), str(tmp_path / "new.exe"), str(tmp_path / "v2.patch"))
+    size, sha256 = main.apply_patch(str(tmp_path / "old.exe"), str(tmp_path / "v2.patch"), str(tmp_path / "out.exe"))
+
+    assert (tmp_path / "out.exe").read_bytes() == new
+    assert (size, sha256) == (len(new), hashlib.sha256(new).hexdigest())
+    assert stats['copied'] + stats['inserted'] == len(new)
+    assert (tmp_path / "v2.patch").stat().st_size < len(new) // 10
+
+
+def test_patch_for_another_base_is_rejected(tmp_path):
+    old, new = _versions()
+    (tmp_path / "old.exe").write_bytes(old)
+    (tmp_path / "new.exe").write_bytes(new)
+    (tmp_path / "other.exe").write_bytes(new[:len(old)])
+    main.make_patch(str(tmp_path / "old.exe"), str(tmp_path / "new.exe"), str(tmp_path / "v2.patch"))
+
+    with pytest.raises(ValueError):
+        main.apply_patch(str(tmp_path / "other.exe"), str(tmp_path / "v2.patch"), str(tmp_path / "out.exe"))
+    assert not (tmp_path / "out.exe").exists()
+    assert not (tmp_path / "out.exe.tmp").exists()
+
+
+def test_cached_package_is_updated_from_a_manifest_patch(origin, tmp_path, monkeypatch):
+    old = origin.payload[:1_000_000] + bytes(4096) + origin.payload[1_000_000:-4096]
+    (tmp_path / "old.exe").write_bytes(old)
+    (tmp_path / "new.exe").write_bytes(origin.payload)
+    main.make_patch(str(tmp_path / "old.exe"), str(tmp_path / "new.exe"), str(tmp_path / "v2.patch"))
+    old_sha256 = hashlib.sha256(old).hexdigest()
+    manifest = {'packages': {origin.url: {'sha256': origin.sha256, 'size': len(origin.payload), 'patches': [
+        {'from': old_sha256, 'url': 'v2.patch',
+         'sha256': hashlib.sha256((tmp_path / "v2.patch").read_bytes()).hexdigest()}]}}}
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+    monkeypatch.setitem(main.CONSTANTS, 'PATCH_MANIFEST', str(tmp_path / "manifest.json"))
+    monkeypatch.setitem(main.CONSTANTS, 'CACHE_REVALIDATE_SECONDS', 0)
+
+    cache = main.get_package_cache()
+    cache.store(origin.url, str(tmp_path / "old.exe"), main.DownloadResult(True, size=len(old), sha256=old_sha256))
+    assert cache.fetch(origin.url, str(tmp_path / "installer.exe"))
+
+    assert (tmp_path / "installer.exe").read_bytes() == origin.payload
+    assert origin.bytes_sent == 0
+    assert cache.lookup(origin.url)['sha256'] == origin.sha256
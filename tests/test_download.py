@@ -0,0 +1,113 @@
+import hashlib
+import os
+import time
+
+import main
+from conftest import RangeOrigin
+
+
+def test_segmented_download_matches_payload(origin, tmp_path):
+    target = str(tmp_path / 'package.exe')
+
+    result = main.fetch_file(origin.url, target, segments=4)
+
+    assert result.ok
+    assert result.sha256 == origin.sha256
+    assert origin.ranged_gets == 4
+    with open(target, 'rb') as f:
+        assert f.read() == origin.payload
+    assert not os.path.exists(target + '.part')
+    assert not os.path.exists(target + '.part.json')
+
+
+def test_segment_is_retried_after_refused_request(origin, tmp_path):
+    target = str(tmp_path / 'package.exe')
+    origin.faults = [0]
+
+    result = main.fetch_file(origin.url, target, segments=4)
+
+    assert result.ok
+    assert result.sha256 == origin.sha256
+    assert origin.ranged_gets == 5
+
+
+def test_failed_download_resumes_from_committed_segments(origin, tmp_path, monkeypatch):
+    target = str(tmp_path / 'package.exe')
+    monkeypatch.setitem(main.CONSTANTS, 'DOWNLOAD_RETRIES', 1)
+    origin.faults = [0]
+
+    assert not main.fetch_file(origin.url, target, segments=4).ok
+    assert os.path.exists(target + '.part')
+    assert os.path.exists(target + '.part.json')
+
+    origin.bytes_sent = 0
+    result = main.fetch_file(origin.url, target, segments=4)
+
+    assert result.ok
+    assert result.sha256 == origin.sha256
+    assert origin.bytes_sent < len(origin.payload)
+    with open(target, 'rb') as f:
+        assert f.read() == origin.payload
+
+
+def test_segment_is_retried_after_connection_drops_mid_body(origin, tmp_path):
+    target = str(tmp_path / 'package.exe')
+    origin.faults = [1000]
+
+    result = main.fetch_file(origin.url, target, segments=4)
+
+    assert result.ok
+    assert result.sha256 == origin.sha256
+    assert origin.ranged_gets == 5
+
+
+def test_partial_download_without_validators_is_not_resumed(tmp_path, monkeypatch):
+    origin = RangeOrigin(validators=False)
+    try:
+        target = str(tmp_path / 'package.exe')
+        monkeypatch.setitem(main.CONSTANTS, 'DOWNLOAD_RETRIES', 1)
+        origin.faults = [0]
+        assert not main.fetch_file(origin.url, target, segments=4).ok
+        assert os.path.exists(target + '.part')
+
+        # The origin publishes a new build of the same size; nothing tells the client.
+        origin.payload = bytes(reversed(origin.payload))
+        result = main.fetch_file(origin.url, target, segments=4)
+
+        assert result.ok
+        with open(target, 'rb') as f:
+            assert f.read() == origin.payload
+        assert result.sha256 == hashlib.sha256(origin.payload).hexdigest()
+    finally:
+        origin.close()
+
+
+def test_segment_requests_use_the_callers_time_cap_and_close_the_session(origin, tmp_path, monkeypatch):
+    timeouts = []
+    sessions = []
+    new_session = main.new_download_session
+
+    def recording_session(pool_size=1):
+        session = new_session(pool_size)
+        get, close = session.get, session.close
+
+        def recording_get(*args, **kwargs):
+            if 'Range' in kwargs.get('headers', {}):
+                timeouts.append(kwargs['timeout'])
+            return get(*args, **kwargs)
+
+        def recording_close():
+            sessions.append('closed')
+            close()
+
+        session.get, session.close = recording_get, recording_close
+        return session
+
+    monkeypatch.setattr(main, 'new_download_session', recording_session)
+    monkeypatch.setitem(main.CONSTANTS, 'DOWNLOAD_TIMEOUT', 30)
+
+    with main.deadline_scope(time.monotonic() + 5):
+        assert main.fetch_file(origin.url, str(tmp_path / 'package.exe'), segments=4).ok
+
+    assert len(timeouts) == 4 and all(timeout <= 5 for timeout in timeouts)
+    assert sessions == ['closed']
@@ -0,0 +1,57 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+
+
+def test_a_failed_collector_keeps_the_other_facts_and_is_retried(monkeypatch):
+    calls = []
+    model_reads = iter([OSError("registry busy"), "EliteBook 840 G8"])
+
+    def manufacturer():
+        calls.append("manufacturer")
+        return {"manufacturer": "hp"}
+
+    def model():
+        calls.append("model")
+        value = next(model_reads)
+        if isinstance(value, Exception):
+            raise value
+        return {"model": value}
+
+    monkeypatch.setattr(main, "FACT_COLLECTORS", {"manufacturer": manufacturer, "model": model})
+
+    facts = main.get_system_facts()
+    assert facts.manufacturer == "hp" and facts.model == ""
+    assert facts.missing == ["model"]
+
+    facts = main.get_system_facts()
+    assert facts.manufacturer == "hp" and facts.model == "EliteBook 840 G8"
+    assert facts.missing == []
+    assert calls == ["manufacturer", "model", "model"]
+
+    # Complete facts come from the cache, in memory or on disk.
+    main._system_facts = None
+    assert main.get_system_facts().model == "EliteBook 840 G8"
+    assert calls == ["manufacturer", "model", "model"]
+
+
+def test_concurrent_callers_collect_once(monkeypatch):
+    calls = []
+    gate = threading.Event()
+
+    def manufacturer():
+        calls.append("manufacturer")
+        gate.wait(1)
+        return {"manufacturer": "hp"}
+
+    monkeypatch.setattr(main, "FACT_COLLECTORS", {"manufacturer": manufacturer})
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(main.get_system_facts) for _ in range(4)]
+        time.sleep(0.1)
+        gate.set()
+        results = [future.result() for future in futures]
+
+    assert calls == ["manufacturer"]
+    assert {facts.manufacturer for facts in results} == {"hp"}
@@ -0,0 +1,170 @@
+import asyncio
+import csv
+import random
+import time
+from typing import List, Optional, Set, Tuple
+
+import pytest
+
+import main
+
+
+class FakeHostTransport(main.HostTransport):
+    """Simulated host with configurable latency and failures, for exercising the orchestrator on one box."""
+
+    name = "fake"
+
+    def __init__(self, latency: Tuple[float, float] = (0.01, 0.03), failures: Set[Tuple[str, str]] = frozenset(),
+                 unsupported: Set[str] = frozenset(), seed: Optional[int] = 0) -> None:
+        self.latency = latency
+        self.failures = failures
+        self.unsupported = unsupported
+        self._random = random.Random(seed)
+        self.calls: List[Tuple[str, str, float, float]] = []
+
+    def supports(self, op_key: str) -> bool:
+        return op_key not in self.unsupported
+
+    async def run_operation(self, host: main.FleetHost, op_key: str) -> main.HostOpResult:
+        started = time.perf_counter()
+        await asyncio.sleep(self._random.uniform(*self.latency))
+        ok = (host.name, op_key) not in self.failures
+        self.calls.append((host.name, op_key, started, time.perf_counter()))
+        return main.HostOpResult(ok, "" if ok else "simulated failure")
+
+
+OPS = ["support", "gpupdate", "power"]
+
+
+def _run(transport, hosts=6, max_hosts=3):
+    fleet = [main.FleetHost(f"pc{i}", transport.name) for i in range(hosts)]
+    orchestrator = main.FleetOrchestrator(fleet, OPS, max_hosts, transports={transport.name: transport})
+    asyncio.run(orchestrator.run(show_progress=False))
+    return orchestrator
+
+
+def test_results_are_aggregated_per_host_and_operation(tmp_path):
+    transport = FakeHostTransport(failures={("pc2", "power"), ("pc4", "gpupdate")})
+    orchestrator = _run(transport)
+
+    rows = orchestrator.progress_rows()
+    assert rows[1].split() == ["support", "6", "0", "0", "0", "0"]
+    assert rows[2].split() == ["gpupdate", "5", "1", "0", "0", "0"]
+    assert rows[3].split() == ["power", "5", "1", "0", "0", "0"]
+    assert rows[-1].startswith("Hosts finished: 6/6")
+
+    # Never more than max_hosts hosts in flight at once.
+    events = sorted([(start, 1) for _, _, start, _ in transport.calls] +
+                    [(end, -1) for _, _, _, end in transport.calls])
+    in_flight = peak = 0
+    for _, delta in events:
+        in_flight += delta
+        peak = max(peak, in_flight)
+    assert peak <= 3
+
+    path = tmp_path / "results.csv"
+    orchestrator.write_matrix(str(path))
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        matrix = {row["host"]: row for row in csv.DictReader(f)}
+    assert matrix["pc2"]["power"] == "✗" and matrix["pc2"]["errors"] == "power: simulated failure"
+    assert matrix["pc0"]["power"] == "✓" and matrix["pc0"]["errors"] == ""
+
+
+def test_operations_the_transport_cannot_run_are_skipped(tmp_path):
+    transport = FakeHostTransport(unsupported={"support"})
+    orchestrator = _run(transport, hosts=2)
+
+    assert all(call[1] != "support" for call in transport.calls)
+    assert all(results["support"].skipped and results["support"].ok
+               for results in orchestrator.results.values())
+    assert orchestrator.progress_rows()[1].split() == ["support", "0", "0", "2", "0", "0"]
+
+    path = tmp_path / "results.csv"
+    orchestrator.write_matrix(str(path))
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        assert [row["support"] for row in csv.DictReader(f)] == ["skipped", "skipped"]
+
+
+def test_winrm_does_not_support_local_only_steps():
+    transport = main.WinRMTransport()
+    assert not transport.supports("support")
+    assert all(transport.supports(key) for key in main.FLEET_REMOTE_COMMANDS)
+
+
+def test_winrm_exits_locally_with_the_remote_exit_code(monkeypatch):
+    commands = []
+
+    class Process:
+        returncode = 3
+
+        async def communicate(self):
+            return b"", b"gpupdate failed"
+
+    async def create_subprocess_exec(*args, **kwargs):
+        commands.append(args[-1])
+        return Process()
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", create_subprocess_exec)
+    result = asyncio.run(main.WinRMTransport().run_operation(main.FleetHost("pc1", "winrm"), "gpupdate"))
+
+    assert not result.ok and result.detail == "gpupdate failed"
+    script_block, local = commands[0].rsplit("};", 1)
+    assert "exit" not in script_block
+    assert local.strip().endswith("exit [int]$r.ExitCode")
+
+
+def test_host_transport_is_abstract():
+    with pytest.raises(TypeError):
+        main.HostTransport()
+
+
+def test_remote_power_uses_the_same_plan_as_the_local_step():
+    script = main.FLEET_REMOTE_COMMANDS["power"]
+
+    assert f"/DUPLICATESCHEME {main.CONSTANTS['ULTIMATE_PERFORMANCE_GUID']}" in script
+    assert script.index(main.CONSTANTS["ULTIMATE_PERFORMANCE_GUID"]) < script.index(main.CONSTANTS["HIGH_PERFORMANCE_GUID"])
+    for name in main.CONSTANTS["ULTIMATE_PERFORMANCE_NAMES"]:
+        assert f"'{name}'" in script
+
+
+def test_remote_sccm_failures_are_not_hidden_behind_a_null_exit_code():
+    script = main.FLEET_REMOTE_COMMANDS["sccm"]
+
+    assert script.count("-ErrorAction Stop") == len(main.CYCLE_IDS)
+    assert script.count("ReturnValue -ne 0) { throw") == len(main.CYCLE_IDS)
+
+
+def _remote_command(monkeypatch, host):
+    commands = []
+
+    class Process:
+        returncode = 0
+
+        async def communicate(self):
+            return b"", b""
+
+    async def create_subprocess_exec(*args, **kwargs):
+        commands.append(args[-1])
+        return Process()
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", create_subprocess_exec)
+    result = asyncio.run(main.WinRMTransport().run_operation(main.FleetHost(host, "winrm"), "sccm"))
+    return result, commands
+
+
+def test_thrown_remote_errors_become_exit_code_one(monkeypatch):
+    _, (command,) = _remote_command(monkeypatch, "pc1.corp.example")
+
+    assert "-ComputerName 'pc1.corp.example'" in command
+    assert "catch { @{ Output = $_.Exception.Message; ExitCode = 1 } }" in command
+
+
+def test_host_names_cannot_inject_powershell(monkeypatch, tmp_path):
+    result, commands = _remote_command(monkeypatch, "pc1;Remove-Item")
+
+    assert not result.ok and commands == []
+
+    inventory = tmp_path / "hosts.txt"
+    inventory.write_text("pc1\npc2'$(calc)\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="invalid host name"):
+        main.load_inventory(str(inventory))
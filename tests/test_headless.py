@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def steps(monkeypatch, tmp_path):
+    """Three fake steps; a test sets outcomes[key] to make one fail."""
+    monkeypatch.chdir(tmp_path)
+    outcomes = {"gpupdate": True, "sccm": True, "power": True}
+
+    def step(key):
+        def operation():
+            print(f"running {key}")
+            return outcomes[key]
+        return main.SetupStep(key, f"Running {key}...", operation)
+
+    monkeypatch.setattr(main, "build_setup_steps", lambda facts=None: [step(key) for key in outcomes])
+    monkeypatch.setattr(main, "get_system_facts", lambda refresh=False: main.SystemFacts(manufacturer="hp"))
+    monkeypatch.setitem(main.CONSTANTS, "RUN_BUDGET_SECONDS", 0)
+    monkeypatch.setitem(main.CONSTANTS, "CHROME_TRACE_FILE", "trace.json")
+    monkeypatch.setitem(main.CONSTANTS, "INTERACTIVE", main.CONSTANTS.get("INTERACTIVE"))
+    monkeypatch.setitem(main.CONSTANTS, "CYCLE_WAIT", False)
+    return outcomes
+
+
+def test_all_steps_ok_exits_zero(steps):
+    assert main.main(["--all"]) == main.EXIT_OK
+
+
+def test_a_failed_step_exits_with_step_failed(steps):
+    steps["sccm"] = False
+
+    assert main.main(["--all", "--serial"]) == main.EXIT_STEP_FAILED
+
+
+def test_only_the_selected_steps_run(steps, capsys):
+    assert main.main(["--steps", "power"]) == main.EXIT_OK
+
+    out = capsys.readouterr().out
+    assert "running power" in out and "running sccm" not in out
+
+
+def test_unknown_step_is_a_usage_error(steps, capsys):
+    assert main.main(["--steps", "gpupdate,bogus"]) == main.EXIT_USAGE
+
+    captured = capsys.readouterr()
+    assert "bogus" in captured.err
+    assert "running" not in captured.out + captured.err
+
+
+def test_json_to_stdout_keeps_progress_on_stderr(steps, capsys):
+    steps["power"] = False
+
+    assert main.main(["--all", "--json", "-"]) == main.EXIT_STEP_FAILED
+
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert report["ok"] is False and report["exit_code"] == main.EXIT_STEP_FAILED
+    assert {step["key"]: step["ok"] for step in report["steps"]} == {"gpupdate": True, "sccm": True, "power": False}
+    assert report["facts"]["manufacturer"] == "hp"
+    assert "running gpupdate" in captured.err and "AUTOMATIC SETUP" in captured.err
+
+
+def test_json_to_a_file(steps, tmp_path):
+    assert main.main(["--all", "--json", str(tmp_path / "report.json")]) == main.EXIT_OK
+
+    report = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+    assert report["ok"] is True and len(report["steps"]) == 3
+
+
+def test_no_mode_is_a_usage_error(capsys):
+    assert main.main(["--serial"]) == main.EXIT_USAGE
+    assert "--all" in capsys.readouterr().err
@@ -0,0 +1,75 @@
+import threading
+
+import main
+
+
+def test_jobs_sharing_a_step_are_refused(monkeypatch):
+    release = threading.Event()
+    jobs = main.JobManager(max_concurrent=2)
+    try:
+        first = jobs.submit("Update Group Policy", release.wait, ("gpupdate",))
+
+        try:
+            jobs.submit("Automatic Setup", lambda: True, ("support", "gpupdate"))
+        except ValueError as e:
+            assert f"job {first.id}" in str(e)
+        else:
+            raise AssertionError("overlapping gpupdate job was accepted")
+        assert jobs.conflict("Trigger Selected SCCM Cycles", ("sccm",)) is None
+        assert jobs.conflict("Automatic Setup", main.MENU_STEP_KEYS["1"]) is first
+    finally:
+        release.set()
+        first.future.result(timeout=5)
+        jobs.shutdown()
+
+    assert first.status == 'done'
+    assert jobs.conflict("Update Group Policy", ("gpupdate",)) is None
+
+
+def test_concurrent_fetches_of_one_url_download_once(origin, tmp_path):
+    cache = main.get_package_cache()
+    results = []
+
+    def fetch(name):
+        results.append(cache.fetch(origin.url, str(tmp_path / name)))
+
+    threads = [threading.Thread(target=fetch, args=(f"copy{i}.exe",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert results == [True, True, True]
+    assert origin.bytes_sent == len(origin.payload)
+    for i in range(3):
+        with open(tmp_path / f"copy{i}.exe", 'rb') as f:
+            assert f.read() == origin.payload
+
+
+def test_prints_from_threads_a_job_starts_stay_in_the_job_output(capsys):
+    def operation():
+        print("job thread")
+        with main.OutputThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda i: print(f"worker {i}"), range(4)))
+        return True
+
+    jobs = main.JobManager(max_concurrent=1)
+    try:
+        job = jobs.submit("Connect Printer", operation)
+        job.future.result(timeout=5)
+    finally:
+        jobs.shutdown()
+
+    lines = [line for line in job.output.tail(10) if line]
+    assert lines[0] == "job thread"
+    assert sorted(lines[1:]) == [f"worker {i}" for i in range(4)]
+    assert "worker" not in capsys.readouterr().out
+
+
+def test_pool_workers_inherit_the_output_scope():
+    buffer = main.io.StringIO()
+    with main.output_scope(buffer), main.OutputThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(lambda: print("cached", file=main.current_output())).result()
+
+    assert buffer.getvalue() == "cached\n"
+    assert main.current_output() is main.sys.stdout
@@ -0,0 +1,70 @@
+import builtins
+import json
+import os
+
+import main
+
+
+def _record(key, ok, duration):
+    main.journal.record(main.StepResult(key, key, ok=ok, started=0.0, finished=duration))
+
+
+def _lines():
+    with open(main.journal.location(), encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_default_journal_lives_in_the_auto_setup_folder(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main.journal, "path", None)
+
+    _record("gpupdate", True, 12.0)
+
+    assert main.journal.location() == os.path.join(main.get_auto_setup_dir(), main.CONSTANTS["JOURNAL_FILE"])
+    assert os.path.exists(main.journal.location())
+    assert not (tmp_path / main.CONSTANTS["JOURNAL_FILE"]).exists()
+
+
+def test_compaction_keeps_samples_and_the_latest_record_per_step(monkeypatch):
+    monkeypatch.setitem(main.CONSTANTS, "BUDGET_HISTORY", 3)
+    for duration in (10.0, 11.0, 12.0, 13.0, 14.0):
+        _record("gpupdate", True, duration)
+    _record("power", True, 3.0)
+    _record("power", False, 0.1)
+    durations, completed = main.journal.durations(), main.journal.completed()
+
+    main.journal.compact()
+
+    assert main.journal.durations() == durations == {"gpupdate": [12.0, 13.0, 14.0], "power": [3.0]}
+    assert main.journal.completed().keys() == completed.keys() == {"gpupdate"}
+    assert len(_lines()) == 4
+
+
+def test_reset_forgets_completed_steps_but_keeps_durations():
+    _record("gpupdate", True, 20.0)
+    _record("gpupdate", True, 30.0)
+
+    main.journal.reset()
+    _record("gpupdate", True, 40.0)
+
+    assert main.journal.durations() == {"gpupdate": [20.0, 30.0, 40.0]}
+    main.journal.reset()
+    assert main.journal.completed() == {}
+    assert [record["type"] for record in _lines()] == ["durations"]
+
+
+def test_unchanged_journal_is_not_reread(monkeypatch):
+    _record("gpupdate", True, 20.0)
+    main.journal.durations()
+    opened = []
+    real_open = builtins.open
+    monkeypatch.setattr(builtins, "open", lambda file, *args, **kwargs: opened.append(file) or real_open(file, *args, **kwargs))
+
+    main.journal.durations()
+    main.journal.completed()
+    assert opened == []
+
+    with real_open(main.journal.location(), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"type": "step", "step": "power", "ok": True, "at": 0, "duration": 5.0}) + "\n")
+    assert main.journal.durations()["power"] == [5.0]
+    assert opened == [main.journal.location()]
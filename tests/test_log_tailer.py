@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+
+import main
+
+
+def _record(message):
+    return f'<![LOG[{message}]LOG]!><time="10:15:30.123-180" date="10-18-2026" component="PolicyAgent">\r\n'
+
+
+def _append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def test_cmtrace_records_are_read_whole_across_appends(tmp_path):
+    log = tmp_path / "PolicyAgent.log"
+    log.write_text(_record("old entry"), encoding='utf-8')
+    tailer = main.LogTailer(str(log))
+    tailer.seek_end()
+
+    record = _record("Politika değerlendirmesi tamamlandı").encode('utf-8')
+    split = record.index('ğ'.encode('utf-8')) + 1  # inside the two-byte 'ğ'
+    _append(log, record[:split])
+    assert tailer.read_records() == []
+    _append(log, record[split:])
+
+    (message, stamp), = tailer.read_records()
+    assert message == "Politika değerlendirmesi tamamlandı"
+    assert stamp is not None
+
+
+def test_rotated_log_is_read_from_the_start(tmp_path):
+    log = tmp_path / "PolicyAgent.log"
+    log.write_text(_record("before rotation"), encoding='utf-8')
+    tailer = main.LogTailer(str(log))
+    tailer.seek_end()
+
+    # The client renames the full log to .lo_ and starts a new one, which has
+    # already grown past the old offset by the time we look again.
+    os.replace(log, tmp_path / "PolicyAgent.lo_")
+    log.write_text(_record("first in new file") + _record("PolicyEvaluationComplete"), encoding='utf-8')
+
+    assert [message for message, _ in tailer.read_records()] == ["first in new file", "PolicyEvaluationComplete"]
+    assert tailer.read_records() == []
+
+
+def test_tail_of_a_split_record_is_not_read_as_plain_lines(tmp_path):
+    log = tmp_path / "PolicyAgent.log"
+    record = _record("written while we armed").encode('utf-8')
+    middle = record.index(b']LOG]')
+    log.write_bytes(_record("old entry").encode('utf-8') + record[:middle])
+    tailer = main.LogTailer(str(log))
+    tailer.seek_end()
+
+    _append(log, record[middle:])
+    assert tailer.read_records() == []
+
+    _append(log, _record("PolicyEvaluationComplete").encode('utf-8'))
+    assert [message for message, _ in tailer.read_records()] == ["PolicyEvaluationComplete"]
+
+
+def test_cycle_watcher_sees_completions_written_while_it_waits(tmp_path):
+    markers = {"{A}": ("PolicyAgent.log", r"PolicyEvaluationComplete"),
+               "{B}": ("InventoryAgent.log", r"Inventory: Cycle completed")}
+    for log in ("PolicyAgent.log", "InventoryAgent.log"):
+        (tmp_path / log).write_text(_record("PolicyEvaluationComplete"), encoding='utf-8')
+    watcher = main.CycleWatcher({"Policy": "{A}", "Inventory": "{B}"}, str(tmp_path), markers)
+    watcher.arm()
+
+    def client():
+        time.sleep(0.1)
+        _append(tmp_path / "PolicyAgent.log", _record("Policy download started").encode('utf-8'))
+        time.sleep(0.1)
+        record = _record("PolicyEvaluationComplete").encode('utf-8')
+        _append(tmp_path / "PolicyAgent.log", record[:20])
+        time.sleep(0.1)
+        _append(tmp_path / "PolicyAgent.log", record[20:])
+
+    writer = threading.Thread(target=client)
+    writer.start()
+    seen = []
+    assert not watcher.wait(1.0, seen.append, poll_interval=0.02)
+    writer.join()
+
+    assert [completion.name for completion in seen] == ["Policy"]
+    assert list(watcher.pending) == ["Inventory"]
+
+    _append(tmp_path / "InventoryAgent.log", _record("Inventory: Cycle completed").encode('utf-8'))
+    assert watcher.wait(1.0, seen.append, poll_interval=0.02)
+    assert [completion.name for completion in seen] == ["Policy", "Inventory"]
@@ -0,0 +1,40 @@
+import logging
+import threading
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    monkeypatch.setitem(main.CONSTANTS, 'LOG_FILE', str(tmp_path / 'auto_setup.log'))
+    main.setup_logging()
+    handler = logging.getLogger().handlers[0]
+    yield tmp_path / 'auto_setup.log', handler
+    main.stop_logging()
+    logging.getLogger().handlers[:] = []
+
+
+def _returns(call):
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    thread.join(2)
+    return not thread.is_alive()
+
+
+def test_errors_are_on_disk_when_logging_returns(writer):
+    path, _ = writer
+    main.logger.error("disk full")
+
+    assert "disk full" in path.read_text(encoding='utf-8')
+
+
+def test_errors_after_stop_do_not_hang(writer):
+    _, handler = writer
+    main.stop_logging()
+
+    assert _returns(lambda: main.logger.error("during shutdown"))
+    # A handler someone kept a reference to must not wait for the stopped writer either.
+    record = logging.LogRecord("main", logging.ERROR, __file__, 1, "late", None, None)
+    assert _returns(lambda: handler.handle(record))
@@ -0,0 +1,90 @@
+import os
+
+import main
+
+
+def _fetch(origin, tmp_path, name='installer.exe'):
+    dest = str(tmp_path / name)
+    assert main.get_package_cache().fetch(origin.url, dest)
+    with open(dest, 'rb') as f:
+        assert f.read() == origin.payload
+    return dest
+
+
+def _blob(origin):
+    return main.get_package_cache().object_path(origin.sha256)
+
+
+def test_installer_is_a_copy_not_a_link_to_the_blob(origin, tmp_path):
+    dest = _fetch(origin, tmp_path)
+
+    with open(dest, 'r+b') as f:
+        f.write(b'patched by the installer')
+
+    assert not os.path.samefile(dest, _blob(origin))
+    assert main.get_package_cache().lookup(origin.url) is not None
+    _fetch(origin, tmp_path, 'again.exe')
+
+
+def test_same_size_corruption_is_detected_and_downloaded_again(origin, tmp_path):
+    _fetch(origin, tmp_path)
+    blob = _blob(origin)
+    stat = os.stat(blob)
+    with open(blob, 'r+b') as f:
+        f.write(b'\0' * 16)
+    # Keep size and mtime so only the content check can notice.
+    os.utime(blob, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    origin.bytes_sent = 0
+    _fetch(origin, tmp_path, 'again.exe')
+
+    assert origin.bytes_sent == len(origin.payload)
+
+
+def test_modified_blob_is_rehashed_on_lookup(origin, tmp_path):
+    _fetch(origin, tmp_path)
+    with open(_blob(origin), 'r+b') as f:
+        f.write(b'\0' * 16)
+
+    assert main.get_package_cache().lookup(origin.url) is None
+    assert not os.path.exists(_blob(origin))
+
+
+def test_pinned_package_survives_eviction(origin, tmp_path):
+    cache = main.get_package_cache()
+    _fetch(origin, tmp_path)
+    assert main.pin_package(origin.url)
+
+    cache.max_bytes = 0
+    assert cache.evict() == []
+    assert cache.lookup(origin.url) is not None
+
+    assert main.pin_package(origin.url, pinned=False)
+    assert cache.evict() == [origin.url]
+
+
+def test_unchanged_origin_answers_304_and_nothing_is_downloaded(origin, tmp_path, monkeypatch):
+    monkeypatch.setitem(main.CONSTANTS, 'CACHE_REVALIDATE_SECONDS', 0)
+    _fetch(origin, tmp_path)
+    entry = main.get_package_cache().lookup(origin.url)
+    assert entry['etag'] == origin.etag and entry['last_modified'] == origin.last_modified
+
+    origin.bytes_sent = 0
+    _fetch(origin, tmp_path, 'again.exe')
+
+    assert origin.not_modified == 1
+    assert origin.bytes_sent == 0
+
+
+def test_changed_origin_is_downloaded_again(origin, tmp_path, monkeypatch):
+    monkeypatch.setitem(main.CONSTANTS, 'CACHE_REVALIDATE_SECONDS', 0)
+    _fetch(origin, tmp_path)
+    origin.etag = '"new-build"'
+    origin.last_modified = 'Mon, 19 Oct 2026 09:00:00 GMT'
+
+    origin.bytes_sent = 0
+    _fetch(origin, tmp_path, 'again.exe')
+
+    assert origin.not_modified == 0
+    assert origin.bytes_sent == len(origin.payload)
+    assert main.get_package_cache().lookup(origin.url)['etag'] == '"new-build"'
@@ -0,0 +1,73 @@
+import hashlib
+import json
+
+import pytest
+
+import main
+
+
+def _peer(tmp_path, name, url, payload):
+    """Start a peer cache whose index maps url to payload, whatever the origin serves."""
+    cache = main.PackageCache(str(tmp_path / name))
+    blob = tmp_path / f'{name}.bin'
+    blob.write_bytes(payload)
+    cache.store(url, str(blob), main.DownloadResult(True, size=len(payload),
+                                                    sha256=hashlib.sha256(payload).hexdigest()))
+    return main.PeerCacheServer(cache, port=0, host='127.0.0.1', discovery_port=0).start()
+
+
+@pytest.fixture
+def peers(origin, tmp_path, monkeypatch):
+    evil = b'MZ' + bytes(len(origin.payload) - 2)
+    started = [_peer(tmp_path, 'evil', origin.url, evil), _peer(tmp_path, 'honest', origin.url, origin.payload)]
+    monkeypatch.setitem(main.CONSTANTS, 'PEER_CACHE_PEERS', [f'127.0.0.1:{peer.port}' for peer in started])
+    yield started
+    for peer in started:
+        peer.close()
+
+
+def _fetch(origin, tmp_path):
+    dest = tmp_path / 'installer.exe'
+    assert main.get_package_cache().fetch(origin.url, str(dest))
+    assert dest.read_bytes() == origin.payload
+
+
+def test_peer_copies_are_not_trusted_without_an_independent_hash(origin, peers, tmp_path):
+    _fetch(origin, tmp_path)
+
+    assert origin.bytes_sent == len(origin.payload)
+    assert all(peer.bytes_served == 0 for peer in peers)
+
+
+def test_manifest_hash_selects_the_matching_peer_copy(origin, peers, tmp_path, monkeypatch):
+    manifest = tmp_path / 'manifest.json'
+    manifest.write_text(json.dumps({'packages': {origin.url: {'sha256': origin.sha256}}}))
+    monkeypatch.setitem(main.CONSTANTS, 'PATCH_MANIFEST', str(manifest))
+
+    _fetch(origin, tmp_path)
+
+    evil, honest = peers
+    assert origin.bytes_sent == 0
+    assert evil.bytes_served == 0
+    assert honest.bytes_served == len(origin.payload)
+
+
+def test_origin_digest_headers_are_parsed():
+    digest = hashlib.sha256(b'package').digest()
+    encoded = main.base64.b64encode(digest).decode('ascii')
+
+    assert main._header_sha256({'repr-digest': f'sha-512=:AAAA:, sha-256=:{encoded}:'}) == digest.hex()
+    assert main._header_sha256({'digest': f'SHA-256={encoded}'}) == digest.hex()
+    assert main._header_sha256({'digest': 'SHA-256=not-base64!'}) is None
+
+
+def test_written_manifest_lists_cached_packages_and_keeps_patches(origin, tmp_path):
+    _fetch(origin, tmp_path)
+    manifest = tmp_path / 'manifest.json'
+    patch = {'from': '0' * 64, 'url': 'old-to-new.patch', 'sha256': '1' * 64}
+    manifest.write_text(json.dumps({'packages': {origin.url: {'sha256': '2' * 64, 'patches': [patch]}}}))
+
+    assert main.write_package_manifest(str(manifest))
+
+    package = json.loads(manifest.read_text())['packages'][origin.url]
+    assert package == {'sha256': origin.sha256, 'size': len(origin.payload), 'patches': [patch]}
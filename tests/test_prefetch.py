@@ -0,0 +1,20 @@
+import sys
+
+import main
+
+
+def test_prefetch_output_stays_on_its_own_thread(origin, monkeypatch, capsys):
+    monkeypatch.setitem(main.URLS, 'HP_SUPPORT', origin.url)
+    monkeypatch.setattr(main, 'get_system_facts', lambda: main.SystemFacts(manufacturer='hp'))
+    monkeypatch.setattr(main, 'check_internet_connection', lambda *args, **kwargs: True)
+    stdout = sys.stdout
+
+    prefetch = main.SupportPrefetch().start()
+    assert sys.stdout is stdout
+    print("menu output")
+    prefetch._thread.join(30)
+
+    assert prefetch.status == "ready"
+    assert "Downloading" in prefetch.output and "menu output" not in prefetch.output
+    assert capsys.readouterr().out == "menu output\n"
+    assert main.get_package_cache().lookup(origin.url)["sha256"] == origin.sha256
@@ -0,0 +1,137 @@
+import subprocess
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import pytest
+
+import main
+
+
+class FakeSpooler(main.PrinterBackend):
+    """In-memory spooler for exercising provisioning: a driver download costs `driver_latency`
+    the first time, a connection `connect_latency`, and queues in `failing` always fail."""
+
+    name = "fake"
+
+    def __init__(self, drivers: Dict[str, str], connected: Tuple[str, ...] = (),
+                 installed: Tuple[str, ...] = (), connect_latency: float = 0.05,
+                 driver_latency: float = 0.3, failing: Tuple[str, ...] = ()) -> None:
+        self.drivers = dict(drivers)
+        self.connected = list(connected)
+        self.installed = set(installed)
+        self.connect_latency = connect_latency
+        self.driver_latency = driver_latency
+        self.failing = {queue.lower() for queue in failing}
+        self.calls: List[Tuple[str, float, float, bool]] = []
+        self.enumerations = 0
+        self._lock = threading.Lock()
+
+    def connections(self) -> List[str]:
+        with self._lock:
+            self.enumerations += 1
+            return list(self.connected)
+
+    def installed_drivers(self) -> List[str]:
+        with self._lock:
+            return list(self.installed)
+
+    def queue_drivers(self, queues: List[str]) -> Dict[str, str]:
+        return {queue: self.drivers[queue] for queue in queues if queue in self.drivers}
+
+    def connect(self, queue: str, timeout: float) -> None:
+        started = time.perf_counter()
+        driver = self.drivers.get(queue)
+        with self._lock:
+            download = driver is not None and driver not in self.installed
+        latency = self.connect_latency + (self.driver_latency if download else 0.0)
+        if latency > timeout:
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired(f"connect {queue}", timeout)
+        time.sleep(latency)
+        with self._lock:
+            self.calls.append((queue, started, time.perf_counter(), download))
+            if queue.lower() in self.failing:
+                raise RuntimeError(f"simulated failure connecting {queue}")
+            if driver:
+                self.installed.add(driver)
+            self.connected.append(queue)
+
+
+@pytest.fixture
+def printui(monkeypatch):
+    """printui stand-in that exits 0 like the real one; queues in `refused` never get a connection."""
+    connections, refused = [], set()
+
+    def backend(command, timeout, encoding):
+        queue = command.split('/n"', 1)[1].rstrip('"')
+        if queue not in refused:
+            connections.append(queue)
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    previous = main.set_command_backend(backend)
+    monkeypatch.setattr(main, "get_printer_connections", lambda: list(connections))
+    yield refused
+    main.set_command_backend(previous)
+
+
+def test_spooler_connect_checks_the_connection_list(printui):
+    printui.add(r"\\print01\Floor2")
+
+    main.SpoolerBackend().connect(r"\\print01\Floor1", timeout=5)
+    with pytest.raises(RuntimeError):
+        main.SpoolerBackend().connect(r"\\print01\Floor2", timeout=5)
+
+
+DRIVERS = {
+    r"\\print01\Floor1": "HP Universal",
+    r"\\print01\Floor2": "HP Universal",
+    r"\\print01\Floor3": "HP Universal",
+    r"\\print02\Labels": "Zebra",
+}
+
+
+def _by_queue(spooler):
+    return {queue: (started, finished, download) for queue, started, finished, download in spooler.calls}
+
+
+def test_queues_sharing_a_missing_driver_follow_the_first_one():
+    spooler = FakeSpooler(DRIVERS, installed=("Zebra",))
+
+    results = main.provision_printers(list(DRIVERS), backend=spooler, max_workers=4)
+
+    assert all(result.status == "connected" for result in results)
+    calls = _by_queue(spooler)
+    leader = calls[r"\\print01\Floor1"]
+    assert leader[2] is True
+    for follower in (r"\\print01\Floor2", r"\\print01\Floor3"):
+        assert calls[follower][2] is False
+        assert calls[follower][0] >= leader[1]
+    # A queue whose driver is already installed does not wait for the leader.
+    assert calls[r"\\print02\Labels"][0] < leader[1]
+
+
+def test_followers_still_connect_when_the_leader_fails():
+    spooler = FakeSpooler(DRIVERS, installed=("Zebra",), failing=(r"\\print01\Floor1",))
+
+    results = {result.queue: result for result in main.provision_printers(list(DRIVERS), backend=spooler)}
+
+    assert results[r"\\print01\Floor1"].status == "failed"
+    assert results[r"\\print01\Floor2"].ok and results[r"\\print01\Floor3"].ok
+    calls = _by_queue(spooler)
+    assert calls[r"\\print01\Floor2"][2] and calls[r"\\print01\Floor3"][2]
+
+
+def test_existing_connections_are_read_once_and_left_alone():
+    spooler = FakeSpooler(DRIVERS, connected=(r"\\print01\Floor1",), installed=("HP Universal", "Zebra"))
+
+    results = main.provision_printers(list(DRIVERS), backend=spooler)
+
+    assert results[0].status == "present"
+    assert spooler.enumerations == 1
+    assert r"\\print01\Floor1" not in _by_queue(spooler)
+
+
+def test_printer_backend_is_abstract():
+    with pytest.raises(TypeError):
+        main.PrinterBackend()
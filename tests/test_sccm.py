@@ -0,0 +1,59 @@
+import types
+
+import main
+
+
+def test_selected_cycles_share_one_wmi_session(monkeypatch):
+    sessions = []
+
+    def wmi_session(cycles):
+        sessions.append(dict(cycles))
+        return [main.CycleResult(name, cycle_id, True, "wmi") for name, cycle_id in cycles.items()]
+
+    answers = iter(["1, 3", "n"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    monkeypatch.setattr(main, "get_system_facts", lambda: main.SystemFacts(sccm_client=True))
+    monkeypatch.setattr(main, "_trigger_cycles_wmi", wmi_session)
+
+    main.trigger_selected_sccm_cycles()
+
+    names = list(main.CYCLE_IDS)
+    assert sessions == [{names[0]: main.CYCLE_IDS[names[0]], names[2]: main.CYCLE_IDS[names[2]]}]
+
+
+def test_a_nonzero_return_value_is_a_failed_trigger(monkeypatch):
+    rejected = main.CYCLE_IDS[list(main.CYCLE_IDS)[1]]
+
+    class Client:
+        def TriggerSchedule(self, cycle_id):
+            return (1 if cycle_id == rejected else 0,)
+
+    monkeypatch.setitem(main.sys.modules, "pythoncom",
+                        types.SimpleNamespace(CoInitialize=lambda: None, CoUninitialize=lambda: None))
+    monkeypatch.setattr(main, "wmi", types.SimpleNamespace(WMI=lambda namespace: types.SimpleNamespace(SMS_Client=Client())))
+    monkeypatch.setitem(main.CONSTANTS, "CYCLE_SLEEP_TIME", 0)
+
+    results = main.trigger_cycles_batched(main.CYCLE_IDS)
+
+    assert [r.ok for r in results] == [r.cycle_id != rejected for r in results]
+    assert next(r for r in results if not r.ok).error == "ReturnValue 1"
+
+
+def test_no_per_cycle_processes_when_no_wmi_session_opens(monkeypatch):
+    commands = []
+
+    def unavailable(cycles):
+        raise RuntimeError("WMI unavailable")
+
+    def run(command, *args, **kwargs):
+        commands.append(command)
+        return main.subprocess.CompletedProcess(command, 1, "", "powershell missing")
+
+    monkeypatch.setattr(main, "_trigger_cycles_wmi", unavailable)
+    monkeypatch.setattr(main, "safe_subprocess_run", run)
+
+    results = main.trigger_cycles_batched(main.CYCLE_IDS)
+
+    assert len(commands) == 1
+    assert not any(r.ok for r in results) and len(results) == len(main.CYCLE_IDS)
+    assert all(r.error == "powershell missing" for r in results)
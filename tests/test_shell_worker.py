@@ -0,0 +1,98 @@
+import os
+import subprocess
+
+import pytest
+
+import main
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="exercises the POSIX shell backend")
+
+
+@pytest.fixture
+def worker():
+    shell = main.ShellWorker("posix")
+    yield shell
+    shell.close()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setitem(main.CONSTANTS, "SHELL_WORKER_POOL_SIZE", 1)
+    main.enable_shell_worker(True, "posix")
+    yield main._shell_pool
+    main.enable_shell_worker(False)
+
+
+def test_output_between_markers_is_returned_verbatim(worker):
+    result = worker.run("printf 'one\\ntwo\\n'; printf 'S%s\\n' fake-marker; printf 'no newline'", 5, "utf-8")
+
+    assert result.stdout == "one\ntwo\nSfake-marker\nno newline"
+    assert result.returncode == 0
+
+
+def test_exit_codes_and_stderr_are_kept_per_command(worker):
+    failed = worker.run("echo oops >&2; exit 7", 5, "utf-8")
+    passed = worker.run("echo fine", 5, "utf-8")
+
+    assert (failed.returncode, failed.stdout, failed.stderr) == (7, "", "oops\n")
+    assert (passed.returncode, passed.stdout, passed.stderr) == (0, "fine\n", "")
+    assert worker.alive()
+
+
+def test_commands_cannot_change_the_worker_state(worker, tmp_path):
+    worker.run(f"cd {tmp_path}; export TTAS_LEAK=1", 5, "utf-8")
+
+    assert worker.run("pwd; echo ${TTAS_LEAK:-unset}", 5, "utf-8").stdout.split() == [os.getcwd(), "unset"]
+
+
+def test_output_is_decoded_with_the_callers_encoding(worker):
+    assert worker.run("printf '\\207\\n'", 5, "cp857").stdout == "ç\n"
+
+
+def test_timeout_kills_the_worker(worker):
+    with pytest.raises(subprocess.TimeoutExpired):
+        worker.run("sleep 10", 0.3, "utf-8")
+
+    worker.process.wait(timeout=5)
+    assert not worker.alive()
+
+
+def test_timed_out_worker_is_replaced(pool):
+    with pytest.raises(subprocess.TimeoutExpired):
+        main.safe_subprocess_run("sleep 10", timeout=0.3, encoding="utf-8")
+
+    result = main.safe_subprocess_run("echo again", encoding="utf-8")
+    assert result.stdout == "again\n"
+
+
+def test_dead_worker_falls_back_to_a_fresh_process(pool, monkeypatch, tmp_path):
+    worker = pool.acquire()
+    pool.release(worker)
+    worker.close()
+    monkeypatch.setattr(main.ShellWorker, "alive", lambda self: True)
+    marker = tmp_path / "runs"
+
+    result = main._run_in_shell_worker(f"echo ran >> {marker}", 5, "utf-8")
+
+    assert result is None
+    assert not marker.exists()
+
+
+def test_worker_dying_mid_command_is_not_retried(pool, tmp_path):
+    marker = tmp_path / "runs"
+
+    result = main.safe_subprocess_run(f"echo ran >> {marker}; kill -9 $$", encoding="utf-8")
+
+    assert result.returncode != 0
+    assert marker.read_text() == "ran\n"
+
+
+def test_cmd_backend_refuses_commands_that_change_shell_state():
+    worker = main.ShellWorker.__new__(main.ShellWorker)
+    worker.backend = "cmd"
+
+    assert worker.accepts("powercfg /LIST")
+    assert worker.accepts('wmic /namespace:\\\\root\\ccm path sms_client call TriggerSchedule "x"')
+    assert not worker.accepts("cd /d C:\\Windows")
+    assert not worker.accepts("echo x & set FOO=1")
+    assert not worker.accepts("exit 3")
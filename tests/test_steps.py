@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+import main
+
+
+def _run(operation):
+    steps = [main.SetupStep("step", "Running step...", operation)]
+    return main.run_step_graph(steps)["step"]
+
+
+def test_only_an_explicit_true_counts_as_success():
+    assert _run(lambda: True).ok
+    assert not _run(lambda: None).ok
+    assert not _run(lambda: False).ok
+
+
+def test_support_assistant_reports_failure_when_offline(monkeypatch):
+    monkeypatch.setattr(main, "check_internet_connection", lambda *args: False)
+
+    assert main.install_support_assistant(main.SystemFacts()) is False
+
+
+def test_support_assistant_reports_a_failed_download(monkeypatch):
+    monkeypatch.setattr(main, "check_internet_connection", lambda *args: True)
+    monkeypatch.setattr(main.PackageCache, "fetch", lambda *args, **kwargs: False)
+
+    assert main.install_support_assistant(main.SystemFacts()) is False
+
+
+def _graph(monkeypatch, calls, outcome):
+    steps = [main.SetupStep("step", "Running step...", lambda: calls.append(1) or outcome)]
+    monkeypatch.setattr(main, "build_setup_steps", lambda facts=None: steps)
+    monkeypatch.setattr(main, "get_system_facts", main.SystemFacts)
+    monkeypatch.setitem(main.CONSTANTS, "RUN_BUDGET_SECONDS", 0)
+    monkeypatch.setitem(main.CONSTANTS, "CHROME_TRACE_FILE", "trace.json")
+
+
+def test_resume_is_opt_in(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    _graph(monkeypatch, calls, True)
+
+    main.run_full_automatic_setup()
+    main.run_full_automatic_setup()
+    assert len(calls) == 2
+
+    main.run_full_automatic_setup(resume=True)
+    assert len(calls) == 2
+
+
+def test_unconfirmed_steps_are_not_skipped_on_resume(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    _graph(monkeypatch, calls, None)
+
+    main.run_full_automatic_setup()
+    main.run_full_automatic_setup(resume=True)
+
+    assert len(calls) == 2
+    assert main.journal.completed() == {}
+
+
+def _timed(events, key, seconds, lines=()):
+    def operation():
+        events.append((key, "start", time.perf_counter()))
+        for line in lines:
+            print(f"{key}: {line}")
+            time.sleep(seconds / max(1, len(lines)))
+        if not lines:
+            time.sleep(seconds)
+        events.append((key, "end", time.perf_counter()))
+        return True
+    return operation
+
+
+def _at(events, key, kind):
+    return next(t for k, what, t in events if k == key and what == kind)
+
+
+def test_dependents_wait_for_every_dependency_while_independent_steps_overlap():
+    events = []
+    steps = [main.SetupStep("slow", "Slow...", _timed(events, "slow", 0.2)),
+             main.SetupStep("fast", "Fast...", _timed(events, "fast", 0.05)),
+             main.SetupStep("after", "After...", _timed(events, "after", 0.01), ("slow", "fast"))]
+
+    results = main.run_step_graph(steps, max_workers=3)
+
+    assert all(result.ok for result in results.values())
+    assert _at(events, "fast", "start") < _at(events, "slow", "end")
+    assert _at(events, "after", "start") >= max(_at(events, "slow", "end"), _at(events, "fast", "end"))
+
+
+def test_no_more_than_max_workers_steps_run_at_once():
+    events = []
+    steps = [main.SetupStep(f"s{i}", f"Step {i}...", _timed(events, f"s{i}", 0.1)) for i in range(5)]
+
+    main.run_step_graph(steps, max_workers=2)
+
+    in_flight = peak = 0
+    for _, kind, _ in sorted(events, key=lambda event: event[2]):
+        in_flight += 1 if kind == "start" else -1
+        peak = max(peak, in_flight)
+    assert peak == 2
+
+
+def test_parallel_step_output_is_grouped_per_step(capsys):
+    events = []
+    steps = [main.SetupStep(key, f"{key}...", _timed(events, key, 0.15, ["one", "two", "three"]))
+             for key in ("left", "right")]
+
+    results = main.run_step_graph(steps, max_workers=2)
+
+    for key in ("left", "right"):
+        assert results[key].output == f"{key}: one\n{key}: two\n{key}: three\n"
+    out = capsys.readouterr().out
+    for key in ("left", "right"):
+        block = f"{key}: one\n{key}: two\n{key}: three\n"
+        assert block in out
+
+
+def test_critical_path_follows_the_longest_dependency_chain():
+    events = []
+    steps = [main.SetupStep("slow", "Slow...", _timed(events, "slow", 0.2)),
+             main.SetupStep("fast", "Fast...", _timed(events, "fast", 0.05)),
+             main.SetupStep("after", "After...", _timed(events, "after", 0.05), ("slow", "fast"))]
+
+    results = main.run_step_graph(steps, max_workers=2)
+    path, total = main.critical_path(steps, results)
+
+    assert path == ["slow", "after"]
+    assert total == pytest.approx(results["slow"].duration + results["after"].duration)
@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+import main
+
+
+class ChunkedPipe:
+    """Pipe that hands out the given chunks one read at a time, then EOF."""
+
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+
+    def read1(self, size):
+        return self.chunks.pop(0) if self.chunks else b""
+
+
+def _lines(*chunks):
+    sink = queue.Queue()
+    main._pump_decoded(ChunkedPipe(*chunks), 'stdout', 'utf-8', sink, threading.Event())
+    lines = []
+    while True:
+        _, line, _ = sink.get_nowait()
+        if line is None:
+            return lines
+        lines.append(line)
+
+
+def test_crlf_split_across_reads_is_one_line_break():
+    assert _lines(b"line one\r", b"\nline two\r\n") == ["line one", "line two"]
+
+
+def test_carriage_returns_still_end_progress_lines():
+    assert _lines(b"10%\r20%\r", b"30%\n", b"done\r") == ["10%", "20%", "30%", "done"]
+
+
+posix_only = pytest.mark.skipif(os.name == "nt", reason="runs POSIX shell commands")
+
+
+def _stream(command, timeout, *matchers, max_timeout=None):
+    started = time.monotonic()
+    result = main.run_streaming(command, timeout, list(matchers), max_timeout=max_timeout,
+                                encoding="utf-8", echo=False)
+    return result, time.monotonic() - started
+
+
+@posix_only
+def test_success_matcher_returns_without_waiting_for_exit():
+    result, elapsed = _stream("echo starting; echo DONE; sleep 5", 10, main.OutputMatcher("DONE", "success"))
+
+    assert (result.status, result.matched) == ("success", "DONE")
+    assert result.stdout_tail == ["starting", "DONE"]
+    assert elapsed < 2
+
+
+@posix_only
+def test_failure_matcher_returns_early_with_a_failure():
+    result, elapsed = _stream("echo 'policy could not be updated' >&2; sleep 5", 10,
+                              main.OutputMatcher("could not", "failure"))
+
+    assert result.status == "failure"
+    assert result.stderr_tail == ["policy could not be updated"]
+    assert elapsed < 2
+
+
+@posix_only
+def test_progress_lines_push_the_deadline_out():
+    result, _ = _stream("echo working; sleep 0.5; echo working; sleep 0.5; echo finished", 0.7,
+                        main.OutputMatcher("working", "progress", extend=1.0), max_timeout=5)
+
+    assert (result.status, result.returncode) == ("exited", 0)
+    assert result.stdout_tail[-1] == "finished"
+
+
+@posix_only
+def test_progress_cannot_extend_past_max_timeout():
+    result, elapsed = _stream("while true; do echo working; sleep 0.1; done", 0.3,
+                              main.OutputMatcher("working", "progress", extend=10), max_timeout=0.8)
+
+    assert result.status == "timeout"
+    assert 0.7 < elapsed < 2
+
+
+@posix_only
+def test_timeout_kills_the_process_tree():
+    result, elapsed = _stream("sleep 30 & echo $!; wait", 0.5)
+
+    assert result.status == "timeout"
+    assert result.returncode is not None and result.returncode < 0
+    assert elapsed < 3
+    if os.path.isdir("/proc"):
+        assert not _running(int(result.stdout_tail[0]))
+
+
+def _running(pid):
+    """Whether pid is still a live (non-zombie) process, allowing a moment for the kill to land."""
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                if f.read().split(") ", 1)[1].startswith("Z"):
+                    return False
+        except FileNotFoundError:
+            return False
+        time.sleep(0.05)
+    return True
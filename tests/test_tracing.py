@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    return main.Tracer(str(tmp_path / "trace.jsonl"))
+
+
+def test_finished_spans_are_appended_as_json_lines(tracer):
+    with tracer.span("powercfg /LIST", "command", command="powercfg /LIST") as attrs:
+        attrs["exit_code"] = 0
+    with pytest.raises(RuntimeError):
+        with tracer.span("download", "download"):
+            raise RuntimeError("connection reset")
+
+    with open(tracer.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["name"] for record in records] == ["powercfg /LIST", "download"]
+    assert records[0]["category"] == "command" and records[0]["exit_code"] == 0
+    assert records[0]["command"] == "powercfg /LIST"
+    assert records[0]["thread"] == threading.current_thread().name
+    assert records[0]["duration"] >= 0 and records[0]["start"] > 0
+    assert records[1]["error"] == "connection reset"
+
+
+def test_chrome_trace_has_complete_events_per_thread(tracer, tmp_path):
+    def worker():
+        with tracer.span("gpupdate", "step"):
+            time.sleep(0.01)
+
+    mark = tracer.mark()
+    with tracer.span("automatic setup", "run"):
+        with tracer.span("sc query ccmexec", "command", exit_code=0):
+            time.sleep(0.01)
+        thread = threading.Thread(target=worker, name="setup-step_0")
+        thread.start()
+        thread.join()
+
+    path = tracer.export_chrome_trace(str(tmp_path / "trace.json"), mark)
+    with open(path, encoding="utf-8") as f:
+        trace = json.load(f)
+
+    events = {event["name"]: event for event in trace["traceEvents"] if event["ph"] == "X"}
+    assert set(events) == {"automatic setup", "sc query ccmexec", "gpupdate"}
+    outer, inner = events["automatic setup"], events["sc query ccmexec"]
+    # Nested spans share a thread and sit inside their parent on the timeline.
+    assert inner["tid"] == outer["tid"] != events["gpupdate"]["tid"]
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert all(isinstance(event["ts"], int) and isinstance(event["dur"], int) for event in events.values())
+    assert inner["args"] == {"exit_code": "0"}
+
+    names = {event["tid"]: event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+    assert names[events["gpupdate"]["tid"]] == "setup-step_0"
+    assert names[outer["tid"]] == threading.current_thread().name
+
+
+def test_export_only_covers_spans_after_the_mark(tracer, tmp_path):
+    with tracer.span("earlier run", "run"):
+        pass
+    mark = tracer.mark()
+    with tracer.span("this run", "run"):
+        pass
+
+    with open(tracer.export_chrome_trace(str(tmp_path / "trace.json"), mark), encoding="utf-8") as f:
+        assert [e["name"] for e in json.load(f)["traceEvents"] if e["ph"] == "X"] == ["this run"]
+
+
+def test_slowest_spans_are_listed_longest_first_without_the_run_span(tracer, capsys):
+    for name, duration in (("fast", 0.1), ("slowest", 3.0), ("middle", 1.5), ("slow", 2.0)):
+        tracer._finish(main.Span(name, "command", time.time(), duration, attrs={"exit_code": 0}))
+    tracer._finish(main.Span("automatic setup", "run", time.time(), 10.0))
+
+    tracer.print_slowest(limit=3)
+
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert lines[0] == "Slowest operations:"
+    assert [line.split()[2] for line in lines[1:]] == ["slowest", "slow", "middle"]
+    assert lines[1].split()[0] == "3.00s" and "exit 0" in lines[1]